@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from corsheaders.defaults import default_headers
@@ -24,11 +25,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tasks.middleware.MetricsMiddleware',
+    'tasks.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tasks.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -43,6 +47,7 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
     'x-csrf-token',
     'x-csrf',
     'x-xsrf',
+    'x-profile',
     ]
 CORS_ALLOWED_ORIGINS =  [
     "http://localhost:3000",
@@ -66,6 +71,69 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'tasks.CustomUser'
 
+# Per-process cache by default; use a shared backend (Redis/Memcached) with several
+# workers so dashboard invalidation reaches every process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+DASHBOARD_STATS_CACHE_TTL = 60  # seconds
+
+# Fraction of requests timed by PerformanceMiddleware; 0 disables it entirely
+PERFORMANCE_SAMPLE_RATE = 0.0
+# Sampled requests slower than this are logged with their full query list
+PERFORMANCE_SLOW_REQUEST_MS = 1000
+
+# Per-route request metrics served at /api/metrics
+METRICS_ENABLED = True
+# Shared directory for multi-worker servers (e.g. gunicorn); empty it before starting the workers
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_INTERVAL = 5  # seconds between each worker's writes to that directory
+
+# Staff can profile any request with an X-Profile: 1 header or ?profile=1
+PROFILING_ENABLED = True
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_MAX_PROFILES = 50  # oldest profiles are deleted beyond this
+
+# Board and notification push to WebSocket clients of the ASGI server (backend.asgi).
+# The in-memory layer serves one process; use 'tasks.realtime.PostgresChannelLayer'
+# when several processes or hosts serve WebSockets
+REALTIME_CHANNEL_LAYER = 'tasks.realtime.InMemoryChannelLayer'
+
+# Notifications are written by a background thread; duplicate events within
+# this window are written once. 0 writes them inline after each commit
+NOTIFICATION_COALESCE_SECONDS = 2.0
+
+# ActivityLog entries are buffered and bulk-inserted by a background thread;
+# False saves each entry synchronously after its transaction commits. Test runs
+# write synchronously, so no thread writes outside the test's transaction
+ACTIVITY_LOG_BUFFERED = sys.argv[1:2] != ['test']
+ACTIVITY_LOG_BATCH_SIZE = 500  # entries per INSERT, and the size that triggers an early flush
+ACTIVITY_LOG_FLUSH_INTERVAL = 1.0  # seconds
+ACTIVITY_LOG_MAX_BUFFERED = 10000  # entries waiting beyond this are dropped and counted
+# prune_activity_log removes entries older than this; on PostgreSQL the table is
+# partitioned by month and the command also creates this many months ahead
+ACTIVITY_LOG_RETENTION_DAYS = 365
+ACTIVITY_LOG_PARTITIONS_AHEAD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tasks.performance': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'tasks.realtime': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'tasks.notifications': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'tasks.activity': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'tasks.outbox': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        # AUTH_LOG_LEVEL=DEBUG logs the outcome of every login attempt (never the credentials)
+        'tasks.auth': {'handlers': ['console'], 'level': os.environ.get('AUTH_LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -119,6 +187,14 @@ EMAIL_HOST_PASSWORD = 'qmxcoeignpacexkf'  # Use an App Password, not your main p
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+EMAIL_TIMEOUT = 30  # seconds, so a stalled SMTP server cannot hold the outbox worker forever
+
+# Emails are queued in the OutboundEmail table and sent by `manage.py send_outbound_email`
+OUTBOX_BATCH_SIZE = 50  # emails claimed and sent over one SMTP connection
+OUTBOX_LEASE_SECONDS = 300  # claimed emails are retried after this if their worker dies
+OUTBOX_MAX_ATTEMPTS = 5  # failed emails are dead-lettered after this many attempts
+OUTBOX_RETRY_BASE_SECONDS = 30  # backoff doubles from this after each failure
+OUTBOX_RETRY_MAX_SECONDS = 3600
 
 
 
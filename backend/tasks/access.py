@@ -0,0 +1,40 @@
+from django.db.models import Exists, OuterRef
+
+from .models import Project, ProjectAccess, Task, TaskAssignment
+
+# Which ProjectAccess rows make a project visible to each role
+PROJECT_ACCESS_VIA = {
+    'MANAGER': ['CREATOR', 'ASSIGNED'],
+    'COLLABORATOR': ['ASSIGNED', 'CLIENT'],
+    'CLIENT': ['ASSIGNED', 'CLIENT'],
+}
+
+
+def _project_access(user, project_ref):
+    return Exists(ProjectAccess.objects.filter(
+        user=user,
+        project=project_ref,
+        via__in=PROJECT_ACCESS_VIA[user.role]
+    ))
+
+
+def visible_projects(user):
+    """Projects the user may see, as an indexed EXISTS filter instead of a DISTINCT join"""
+    if user.role == 'ADMIN':
+        return Project.objects.all()
+    if user.role not in PROJECT_ACCESS_VIA:
+        return Project.objects.none()
+    return Project.objects.filter(_project_access(user, OuterRef('pk')))
+
+
+def visible_tasks(user):
+    """Tasks the user may see: collaborators only see tasks assigned to them"""
+    if user.role == 'ADMIN':
+        return Task.objects.all()
+    if user.role == 'COLLABORATOR':
+        return Task.objects.filter(
+            Exists(TaskAssignment.objects.filter(user=user, task=OuterRef('pk')))
+        )
+    if user.role not in PROJECT_ACCESS_VIA:
+        return Task.objects.none()
+    return Task.objects.filter(_project_access(user, OuterRef('project_id')))
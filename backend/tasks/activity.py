@@ -0,0 +1,181 @@
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+
+from .metrics import ACTIVITY_LOG_ENTRIES
+from .models import ActivityLog
+
+logger = logging.getLogger('tasks.activity')
+
+# Category of an action by its prefix, e.g. TASK_MOVED is a TASK entry
+ACTION_CATEGORIES = {
+    'LOGIN': 'AUTH', 'LOGOUT': 'AUTH', 'PASSWORD': 'AUTH',
+    'PROJECT': 'PROJECT',
+    'TASK': 'TASK', 'TASKS': 'TASK', 'COMMENT': 'TASK',
+}
+
+
+def category_for(action):
+    return ACTION_CATEGORIES.get(action.split('_', 1)[0], 'SYSTEM')
+
+
+def severity_for(action):
+    """ERROR for *_ERROR actions, which the dashboard counts as system issues"""
+    return 'ERROR' if action.endswith('_ERROR') else 'INFO'
+
+
+class ActivityBuffer:
+    """
+    In-process buffer of ActivityLog rows written with bulk_create.
+
+    A background thread flushes every ACTIVITY_LOG_FLUSH_INTERVAL seconds,
+    or as soon as ACTIVITY_LOG_BATCH_SIZE entries are waiting, and once more
+    when the process exits. Beyond ACTIVITY_LOG_MAX_BUFFERED waiting entries
+    new ones are dropped rather than let memory grow without bound. A batch
+    the database fails to take goes back to the front of the buffer, as far
+    as that limit allows, for the next flush. Flushed, dropped and failed
+    entries are counted in `stats` and in the activity_log_entries_total
+    metric. With ACTIVITY_LOG_BUFFERED = False every entry is saved on the
+    spot, and one the database fails to take is counted as failed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = deque()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.worker = None
+        self.stats = {'flushed': 0, 'dropped': 0, 'failed': 0}
+
+    def count(self, outcome, amount):
+        if amount:
+            with self.lock:
+                self.stats[outcome] += amount
+            ACTIVITY_LOG_ENTRIES.inc(amount, outcome=outcome)
+
+    def append(self, entry):
+        if not getattr(settings, 'ACTIVITY_LOG_BUFFERED', True):
+            written, unsaved = self.write([entry])
+            self.count('failed', len(unsaved))
+            return
+        with self.lock:
+            dropped = len(self.entries) >= getattr(settings, 'ACTIVITY_LOG_MAX_BUFFERED', 10000)
+            if not dropped:
+                self.entries.append(entry)
+            waiting = len(self.entries)
+        if dropped:
+            self.count('dropped', 1)
+            return
+        self.start()
+        if waiting >= getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 500):
+            self.wakeup.set()
+
+    def start(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, name='activity-log-writer', daemon=True)
+                self.worker.start()
+                atexit.register(self.flush)
+
+    def stop(self):
+        """Stop the writer thread, if running, and write everything still waiting"""
+        with self.lock:
+            worker, self.worker = self.worker, None
+        if worker is not None:
+            self.stopping.set()
+            self.wakeup.set()
+            worker.join()
+            self.stopping.clear()
+        return self.flush()
+
+    def run(self):
+        while not self.stopping.is_set():
+            self.wakeup.wait(getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 1.0))
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing the activity log failed')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything waiting, a batch at a time; returns the number written"""
+        batch_size = getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 500)
+        written = 0
+        while True:
+            with self.lock:
+                batch = [self.entries.popleft() for _ in range(min(batch_size, len(self.entries)))]
+            if not batch:
+                return written
+            batch_written, unsaved = self.write(batch)
+            written += batch_written
+            if unsaved:
+                # Leave the rest for the next flush rather than retry a failing database now
+                self.requeue(unsaved)
+                return written
+
+    def write(self, batch):
+        """
+        Save a batch. Returns the number written and the entries left unsaved
+        because the database failed; entries whose task or project is gone are
+        counted as failed instead.
+        """
+        try:
+            ActivityLog.objects.bulk_create(batch)
+        except IntegrityError:
+            # A referenced task or project was deleted meanwhile: save what still can be
+            written = 0
+            for index, entry in enumerate(batch):
+                try:
+                    with transaction.atomic():
+                        entry.save()
+                    written += 1
+                except IntegrityError:
+                    self.count('failed', 1)
+                except DatabaseError:
+                    logger.exception('Writing %s activity log entries failed', len(batch) - index)
+                    self.count('flushed', written)
+                    return written, batch[index:]
+            self.count('flushed', written)
+            return written, []
+        except DatabaseError:
+            logger.exception('Writing %s activity log entries failed', len(batch))
+            return 0, batch
+        self.count('flushed', len(batch))
+        return len(batch), []
+
+    def requeue(self, entries):
+        """Put unsaved entries back in front of the waiting ones, within ACTIVITY_LOG_MAX_BUFFERED"""
+        with self.lock:
+            room = max(getattr(settings, 'ACTIVITY_LOG_MAX_BUFFERED', 10000) - len(self.entries), 0)
+            self.entries.extendleft(reversed(entries[:room]))
+        lost = len(entries) - min(room, len(entries))
+        if lost:
+            logger.error('Dropped %s unsaved activity log entries, the buffer is full', lost)
+        self.count('failed', lost)
+
+
+activity_buffer = ActivityBuffer()
+
+
+def log_activity(user, action, description='', project=None, task=None, request=None,
+                 severity=None, category=None):
+    """
+    Record an audit entry once the current transaction commits, so rolled
+    back actions leave no trace. `project` and `task` are instances or ids,
+    the category defaults to the one of the action's prefix and the severity
+    to the one of its suffix.
+    The entry is timestamped now, not when the buffer is flushed.
+    """
+    entry = ActivityLog(
+        user=user, action=action, description=description,
+        category=category or category_for(action), severity=severity or severity_for(action),
+        project_id=getattr(project, 'pk', project), task_id=getattr(task, 'pk', task),
+        ip_address=request.META.get('REMOTE_ADDR') if request is not None else None,
+    )
+    transaction.on_commit(lambda: activity_buffer.append(entry))
@@ -1,9 +1,17 @@
+import json
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from .models import (
     CustomUser, Project, ProjectAssignment, Task, TaskAssignment, 
-    TaskComment, ActivityLog, Notification, PasswordResetCode
+    TaskComment, ActivityLog, Notification, PasswordResetCode,
+    ProjectTaskCounters, ProjectAccess, RequestProfile, OutboundEmail
 )
+from .outbox import requeue_dead
 
 @admin.register(CustomUser)
 class CustomUserAdmin(BaseUserAdmin):
@@ -65,6 +73,18 @@ class TaskAdmin(admin.ModelAdmin):
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+@admin.register(ProjectTaskCounters)
+class ProjectTaskCountersAdmin(admin.ModelAdmin):
+    list_display = ('project', 'total', 'todo', 'in_progress', 'in_review', 'done', 'updated_at')
+    search_fields = ('project__name',)
+    readonly_fields = ('total', 'todo', 'in_progress', 'in_review', 'done', 'updated_at')
+
+@admin.register(ProjectAccess)
+class ProjectAccessAdmin(admin.ModelAdmin):
+    list_display = ('user', 'project', 'via')
+    list_filter = ('via',)
+    search_fields = ('user__email', 'project__name')
+
 @admin.register(ProjectAssignment)
 class ProjectAssignmentAdmin(admin.ModelAdmin):
     list_display = ('user', 'project', 'role_in_project', 'assigned_by', 'assigned_at')
@@ -85,10 +105,14 @@ class TaskCommentAdmin(admin.ModelAdmin):
 
 @admin.register(ActivityLog)
 class ActivityLogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'action', 'created_at', 'ip_address')
-    list_filter = ('action', 'created_at')
-    search_fields = ('user__email', 'action', 'description')
-    date_hierarchy = 'created_at'
+    list_display = ('user', 'action', 'category', 'severity', 'created_at', 'ip_address')
+    # Fixed choices and date ranges use the (category|severity, created_at) indexes;
+    # date_hierarchy and a DISTINCT action filter would scan the whole table
+    list_filter = ('category', 'severity', 'created_at')
+    # Exact email and action prefix instead of substring matches over every description
+    search_fields = ('=user__email', '^action')
+    list_select_related = ('user',)
+    show_full_result_count = False
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -102,4 +126,65 @@ class PasswordResetCodeAdmin(admin.ModelAdmin):
     list_display = ('user', 'code', 'created_at', 'is_used')
     list_filter = ('is_used', 'created_at')
     search_fields = ('user__email', 'code')
-    readonly_fields = ('code',)
\ No newline at end of file
+    readonly_fields = ('code',)
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_dead_letters']
+    
+    @admin.action(description='Retry dead-lettered emails')
+    def retry_dead_letters(self, request, queryset):
+        requeued = requeue_dead(queryset)
+        self.message_user(request, f'{requeued} emails queued again')
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'user', 'status_code', 'duration_ms', 'query_count', 'download')
+    list_filter = ('route', 'status_code', 'created_at')
+    search_fields = ('path', 'user__email')
+    date_hierarchy = 'created_at'
+    fields = (
+        'created_at', 'user', 'method', 'path', 'route', 'status_code', 'duration_ms',
+        'query_count', 'download', 'top_functions', 'sql'
+    )
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        return [
+            path(
+                '<int:profile_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='tasks_requestprofile_download'
+            ),
+        ] + super().get_urls()
+    
+    def download_view(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        try:
+            stats = open(profile.stats_path, 'rb')
+        except FileNotFoundError:
+            raise Http404('Profile file is missing')
+        return FileResponse(stats, as_attachment=True, filename=f'profile-{profile.pk}.prof')
+    
+    @admin.display(description='Profile')
+    def download(self, obj):
+        url = reverse('admin:tasks_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">Download .prof</a>', url)
+    
+    @admin.display(description='Top functions')
+    def top_functions(self, obj):
+        return format_html('<pre>{}</pre>', obj.stats_summary())
+    
+    @admin.display(description='SQL')
+    def sql(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.queries, indent=2))
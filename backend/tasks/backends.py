@@ -1,28 +1,45 @@
-print("Custom EmailBackend loaded!")  # To confirm it loads at Django startup
+import logging
 
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 
+from .metrics import AUTH_ATTEMPTS
+
+# Debug records of each attempt's outcome, off unless the level is lowered to DEBUG
+logger = logging.getLogger('tasks.auth')
+
 class EmailBackend(ModelBackend):
+    """
+    Authenticate by email and password with exactly one password hash per
+    attempt. An unknown email hashes the password with the default hasher
+    anyway, so it takes as long as a wrong password and response times do not
+    reveal which emails have accounts. A correct password stored with
+    outdated hasher settings is rehashed and saved by check_password, which
+    keeps every stored hash at the cost the unknown-email path assumes.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
         identifier = kwargs.get('email') or username
-        print(f"[AUTH BACKEND] EmailBackend called with identifier={identifier}, password={password}")
         if identifier is None or password is None:
-            print("No identifier or password provided")
-            return None
+            return self.record('missing_credentials')
         try:
-            user = UserModel.objects.get(**{UserModel.USERNAME_FIELD: identifier})
-            print(f"User found: {user.email}, is_active: {user.is_active}")
+            user = UserModel._default_manager.get_by_natural_key(identifier)
         except UserModel.DoesNotExist:
-            print("User not found in database")
-            return None
-        if user.check_password(password):
-            print("Password correct!")
-        else:
-            print("Password INCORRECT!")
-        if user.check_password(password) and self.user_can_authenticate(user):
-            print("User authenticated and active.")
-            return user
-        print("User authentication failed (wrong password or inactive).")
+            UserModel().set_password(password)
+            return self.record('unknown_user')
+        if not user.check_password(password):
+            return self.record('bad_password', user)
+        if not self.user_can_authenticate(user):
+            return self.record('inactive', user)
+        self.record('success', user)
+        return user
+
+    def record(self, outcome, user=None):
+        AUTH_ATTEMPTS.inc(outcome=outcome)
+        user_id = user.pk if user is not None else None
+        logger.debug(
+            'auth outcome=%s user_id=%s', outcome, user_id,
+            extra={'auth_outcome': outcome, 'auth_user_id': user_id}
+        )
         return None
@@ -0,0 +1,412 @@
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .access import visible_projects, visible_tasks
+from .activity import category_for, severity_for
+from .kanban import KANBAN_COLUMNS, POSITION_GAP
+from .models import (
+    MAX_PROJECTS_PER_USER, MAX_TASKS_PER_PROJECT, ActivityLog, CustomUser, Notification,
+    PasswordResetCode, Project, ProjectAccess, ProjectAssignment, ProjectTaskCounters, Task,
+    TaskAssignment, TaskComment
+)
+from .search import index_comments, index_projects, index_tasks
+
+BENCHMARK_EMAIL_DOMAIN = 'bench.example'
+ROLES = ['ADMIN', 'MANAGER', 'COLLABORATOR', 'CLIENT']
+ACTIVITY_ACTIONS = [
+    'LOGIN', 'LOGOUT', 'PROJECT_CREATED', 'TASK_CREATED', 'TASK_UPDATED',
+    'TASK_MOVED', 'COMMENT_ADDED', 'LOGIN_ERROR', 'EMAIL_ERROR',
+]
+BATCH_SIZE = 1000
+
+
+def benchmark_users():
+    return CustomUser.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+
+
+def seed_benchmark_data(users_per_role=10, projects_per_manager=3, tasks_per_project=50,
+                        comments_per_task=2, notifications_per_user=30, activity_per_user=30,
+                        password='benchmark', seed=0):
+    """
+    Insert a deterministic synthetic data set with bulk_create.
+
+    Every row derives from `seed`, so two runs produce the same data. Project
+    and task assignments stay within MAX_PROJECTS_PER_USER and
+    MAX_TASKS_PER_PROJECT. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    created = Counter()
+
+    with transaction.atomic():
+        # Hash the shared password once rather than once per user
+        password_hash = make_password(password)
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                email=f'{role.lower()}{i}@{BENCHMARK_EMAIL_DOMAIN}', role=role,
+                first_name=role.title(), last_name=str(i), password=password_hash,
+                is_staff=role == 'ADMIN'
+            )
+            for role in ROLES for i in range(users_per_role)
+        ], batch_size=BATCH_SIZE)
+        users = defaultdict(list)
+        for user in benchmark_users().order_by('id'):
+            users[user.role].append(user)
+        created['users'] = sum(len(role_users) for role_users in users.values())
+
+        # Clients take projects in turn so every client has some
+        clients = users['CLIENT']
+        slots = [(manager, i) for manager in users['MANAGER'] for i in range(projects_per_manager)]
+        projects = Project.objects.bulk_create([
+            Project(
+                name=f'Project {manager.last_name}-{i}', description=f'Benchmark project {i}',
+                created_by=manager, client=clients[index % len(clients)],
+                status=rng.choice(Project.STATUS_CHOICES)[0],
+                start_date=(now - timedelta(days=rng.randint(0, 90))).date(),
+                end_date=(now + timedelta(days=rng.randint(1, 90))).date(),
+                budget=Decimal(rng.randint(1000, 100000))
+            )
+            for index, (manager, i) in enumerate(slots)
+        ], batch_size=BATCH_SIZE)
+        created['projects'] = len(projects)
+
+        # Each collaborator joins up to the project limit
+        project_assignments = []
+        members = defaultdict(list)
+        for collaborator in users['COLLABORATOR']:
+            for project in rng.sample(projects, min(MAX_PROJECTS_PER_USER, len(projects))):
+                project_assignments.append(ProjectAssignment(
+                    project=project, user=collaborator, assigned_by=project.created_by,
+                    role_in_project='COLLABORATOR'
+                ))
+                members[project.id].append(collaborator)
+        ProjectAssignment.objects.bulk_create(project_assignments, batch_size=BATCH_SIZE)
+        created['project_assignments'] = len(project_assignments)
+
+        # bulk_create skips the Project and ProjectAssignment signals
+        index_projects(projects)
+        ProjectAccess.grant(
+            [(project.created_by_id, project.id, 'CREATOR') for project in projects]
+            + [(project.client_id, project.id, 'CLIENT') for project in projects]
+            + [(a.user_id, a.project_id, 'ASSIGNED') for a in project_assignments]
+        )
+
+        tasks = []
+        for project_index, project in enumerate(projects):
+            column_sizes = Counter()
+            for i in range(tasks_per_project):
+                task_status = rng.choice(Task.STATUS_CHOICES)[0]
+                column_sizes[task_status] += 1
+                tasks.append(Task(
+                    title=f'Task {project_index}-{i}', description=f'Benchmark task {i} of {project.name}',
+                    project=project, created_by=project.created_by, status=task_status,
+                    priority=rng.choice(Task.PRIORITY_CHOICES)[0],
+                    due_date=now + timedelta(days=rng.randint(-30, 60)),
+                    completed_at=now if task_status == 'DONE' else None,
+                    estimated_hours=Decimal(rng.randint(1, 40)),
+                    position=column_sizes[task_status] * POSITION_GAP
+                ))
+        Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
+        index_tasks(tasks)
+        created['tasks'] = len(tasks)
+        ProjectTaskCounters.rebuild([project.id for project in projects])
+
+        # One assignee per task among the project members still under the task limit
+        load = Counter()
+        task_assignments = []
+        for task in tasks:
+            candidates = [
+                member for member in members[task.project_id]
+                if load[(member.id, task.project_id)] < MAX_TASKS_PER_PROJECT
+            ]
+            if candidates:
+                member = rng.choice(candidates)
+                load[(member.id, task.project_id)] += 1
+                task_assignments.append(TaskAssignment(
+                    task=task, user=member, assigned_by=task.created_by
+                ))
+        TaskAssignment.objects.bulk_create(task_assignments, batch_size=BATCH_SIZE)
+        created['task_assignments'] = len(task_assignments)
+
+        project_by_id = {project.id: project for project in projects}
+        comments = []
+        for task in tasks:
+            authors = members[task.project_id] + [project_by_id[task.project_id].created_by]
+            comments += [
+                TaskComment(task=task, user=rng.choice(authors), content=f'Comment {i} on {task.title}')
+                for i in range(comments_per_task)
+            ]
+        TaskComment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        index_comments(comments)
+        created['comments'] = len(comments)
+
+        all_users = [user for role in ROLES for user in users[role]]
+        notifications = []
+        activity = []
+        for user in all_users:
+            for i in range(notifications_per_user):
+                task = rng.choice(tasks) if tasks else None
+                notifications.append(Notification(
+                    user=user, title=f'Notification {i}', message=f'Benchmark notification {i}',
+                    notification_type=rng.choice(Notification.TYPE_CHOICES)[0],
+                    is_read=rng.random() < 0.5,
+                    task=task, project_id=task.project_id if task else None
+                ))
+            for i in range(activity_per_user):
+                action = rng.choice(ACTIVITY_ACTIONS)
+                activity.append(ActivityLog(
+                    user=user, action=action, category=category_for(action),
+                    severity=severity_for(action),
+                    description=f'Benchmark activity {i}',
+                    ip_address=f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}'
+                ))
+        Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        ActivityLog.objects.bulk_create(activity, batch_size=BATCH_SIZE)
+        created['notifications'] = len(notifications)
+        created['activity_logs'] = len(activity)
+
+    return dict(created)
+
+
+def _first_id(queryset):
+    return queryset.order_by('id').values_list('id', flat=True).first()
+
+
+def _url_kwargs(**kwargs):
+    # Routes whose fixture is missing for a role are skipped
+    return None if None in kwargs.values() else kwargs
+
+
+def _no_body(user, password):
+    return {}, None
+
+
+def _reset_code_body(user, password):
+    code = PasswordResetCode.objects.create(user=user).code
+    return {}, {'email': user.email, 'code': code, 'password': password}
+
+
+def _bulk_tasks_body(user, password):
+    project_id = _first_id(visible_projects(user))
+    if project_id is None:
+        return {}, None
+    due_date = (timezone.now() + timedelta(days=7)).isoformat()
+    return {}, [
+        {'title': f'Bulk {i}', 'description': '...', 'project': project_id, 'due_date': due_date}
+        for i in range(10)
+    ]
+
+
+def _move_task_body(user, password):
+    # Always a real status change, so every run takes the same write path
+    task = visible_tasks(user).order_by('id').only('id', 'status').first()
+    if task is None:
+        return None, None
+    column = KANBAN_COLUMNS[(KANBAN_COLUMNS.index(task.status) + 1) % len(KANBAN_COLUMNS)]
+    return {'pk': task.id}, {'status': column}
+
+
+# Request made against each route: (method, build(user, password) -> (url kwargs, body))
+BENCHMARK_ROUTES = {
+    'token_obtain_pair': ('post', lambda user, password: ({}, {'email': user.email, 'password': password})),
+    'token_refresh': ('post', lambda user, password: ({}, {'refresh': str(RefreshToken.for_user(user))})),
+    'forgot_password': ('post', lambda user, password: ({}, {'email': user.email})),
+    'verify_code': ('post', _reset_code_body),
+    'change_password': ('post', _reset_code_body),
+    'dashboard_stats': ('get', _no_body),
+    'recent_tasks': ('get', _no_body),
+    'active_projects': ('get', _no_body),
+    'user_list': ('get', _no_body),
+    'user_detail': ('get', lambda user, password: ({'pk': user.pk}, None)),
+    'available_users': ('get', _no_body),
+    'project_list': ('get', _no_body),
+    'project_detail': ('get', lambda user, password: (
+        _url_kwargs(pk=_first_id(visible_projects(user))), None
+    )),
+    'kanban_board': ('get', lambda user, password: (
+        _url_kwargs(project_id=_first_id(visible_projects(user))), None
+    )),
+    'task_list': ('get', _no_body),
+    'task_detail': ('get', lambda user, password: (
+        _url_kwargs(pk=_first_id(visible_tasks(user))), None
+    )),
+    'task_move': ('post', _move_task_body),
+    'task_bulk_create': ('post', _bulk_tasks_body),
+    'notification_list': ('get', _no_body),
+    'unread_notification_count': ('get', _no_body),
+    'bulk_read_notifications': ('post', lambda user, password: ({}, {'before': timezone.now().isoformat()})),
+    'bulk_dismiss_notifications': ('post', lambda user, password: (
+        {}, {'ids': list(user.notifications.order_by('id').values_list('id', flat=True)[:10])}
+    )),
+    'mark_notification_read': ('post', lambda user, password: (
+        _url_kwargs(notification_id=_first_id(user.notifications.all())), {}
+    )),
+    'search': ('get', lambda user, password: ({}, {'q': 'benchmark task'})),
+    'metrics': ('get', _no_body),
+}
+
+
+def route_names(urlpatterns):
+    return [pattern.name for pattern in urlpatterns if isinstance(pattern, URLPattern) and pattern.name]
+
+
+def sql_template(sql):
+    """Replace the literals of a SQL statement so repeated queries compare equal"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'\((?:\?, )*\?\)', '(...)', sql)
+
+
+def queries_by_template(captured):
+    """Captured queries grouped by template, most repeated first"""
+    return Counter(sql_template(query['sql']) for query in captured).most_common()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+
+def request_route(client, user, name, token, password='benchmark'):
+    """
+    Make the benchmark request of one route as `user` inside a rolled-back
+    transaction, so write routes leave the data untouched.
+
+    Returns (response, captured queries, seconds), or None when the role has
+    no fixture for the route.
+    """
+    method, build = BENCHMARK_ROUTES[name]
+    with transaction.atomic():
+        try:
+            kwargs, body = build(user, password)
+            if kwargs is None or (method == 'post' and body is None):
+                return None
+            url = reverse(name, kwargs=kwargs)
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = getattr(client, method)(
+                    url, body, format='json', HTTP_AUTHORIZATION=f'Bearer {token}'
+                )
+                elapsed = time.perf_counter() - start
+        finally:
+            transaction.set_rollback(True)
+    return response, ctx.captured_queries, elapsed
+
+
+def run_benchmark(users, routes, iterations=20, warmup=2, password='benchmark', host='localhost'):
+    """
+    Request every route as every user and return latency, query and size figures.
+
+    Each request runs in a transaction that is rolled back, so write routes
+    can be measured repeatedly against the same data and runs stay comparable.
+    """
+    results = []
+    skipped = []
+    client = APIClient(HTTP_HOST=host)
+    # Never send real mail from a benchmark
+    with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+        for user in users:
+            token = str(RefreshToken.for_user(user).access_token)
+            for name in routes:
+                if name not in BENCHMARK_ROUTES:
+                    skipped.append({'route': name, 'role': user.role, 'reason': 'no benchmark request defined'})
+                    continue
+                timings, queries, sizes, status_codes = [], [], [], Counter()
+                for iteration in range(warmup + iterations):
+                    measured = request_route(client, user, name, token, password)
+                    if measured is None:
+                        break
+                    if iteration < warmup:
+                        continue
+                    response, captured, elapsed = measured
+                    timings.append(elapsed * 1000)
+                    queries.append(len(captured))
+                    sizes.append(len(response.content))
+                    status_codes[response.status_code] += 1
+
+                if not timings:
+                    skipped.append({'route': name, 'role': user.role, 'reason': 'no fixture visible to role'})
+                    continue
+                results.append({
+                    'route': name,
+                    'role': user.role,
+                    'method': BENCHMARK_ROUTES[name][0].upper(),
+                    'status': {str(code): count for code, count in sorted(status_codes.items())},
+                    'p50_ms': round(percentile(timings, 0.50), 3),
+                    'p95_ms': round(percentile(timings, 0.95), 3),
+                    'mean_ms': round(sum(timings) / len(timings), 3),
+                    'queries': max(queries),
+                    'bytes': max(sizes),
+                })
+    return {
+        'database': connection.vendor,
+        'iterations': iterations,
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+# Login attempts measured by run_login_benchmark: (name, email, password)
+LOGIN_SCENARIOS = [
+    ('success', f'login@{BENCHMARK_EMAIL_DOMAIN}', 'benchmark'),
+    ('bad_password', f'login@{BENCHMARK_EMAIL_DOMAIN}', 'wrong password'),
+    ('unknown_user', f'nobody@{BENCHMARK_EMAIL_DOMAIN}', 'benchmark'),
+]
+
+
+def run_login_benchmark(iterations=10, warmup=1):
+    """
+    Logins per second through the configured authentication backends, on one
+    core, for a correct password, a wrong one and an unknown email.
+
+    Each figure is also expressed in password hashes: the CPU time of a login
+    divided by that of one hash with the default hasher, so a login path that
+    hashes twice shows up as 2. Runs in a rolled-back transaction with a user
+    of its own.
+    """
+    hasher = get_hasher()
+    with transaction.atomic():
+        CustomUser.objects.create_user(email=LOGIN_SCENARIOS[0][1], password=LOGIN_SCENARIOS[0][2])
+        start = time.process_time()
+        for _ in range(iterations):
+            hasher.encode('benchmark', hasher.salt())
+        hash_seconds = max(time.process_time() - start, 1e-9) / iterations
+
+        results = []
+        for name, email, password in LOGIN_SCENARIOS:
+            for _ in range(warmup):
+                authenticate(None, username=email, password=password)
+            wall, cpu = time.perf_counter(), time.process_time()
+            for _ in range(iterations):
+                authenticate(None, username=email, password=password)
+            # Guard against a zero reading from a clock coarser than a very fast hasher
+            wall, cpu = time.perf_counter() - wall, max(time.process_time() - cpu, 1e-9)
+            results.append({
+                'scenario': name,
+                'logins_per_second': round(iterations / wall, 2),
+                'logins_per_cpu_second': round(iterations / cpu, 2),
+                'mean_ms': round(wall / iterations * 1000, 3),
+                'hashes_per_login': round(cpu / iterations / hash_seconds, 2),
+            })
+        transaction.set_rollback(True)
+    return {
+        'hasher': hasher.algorithm,
+        'hash_ms': round(hash_seconds * 1000, 3),
+        'iterations': iterations,
+        'results': results,
+    }
+
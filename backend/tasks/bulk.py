@@ -0,0 +1,121 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+from rest_framework import serializers
+
+from .access import visible_projects
+from .dashboard import invalidate_dashboards
+from .models import MAX_TASKS_PER_PROJECT, ProjectTaskCounters, Task, TaskAssignment
+from .notifications import notify
+from .realtime import publish_task
+from .search import index_tasks
+
+User = get_user_model()
+
+MAX_BULK_TASKS = 1000
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    """One task of a bulk import; relations are plain ids resolved for the whole batch"""
+    project = serializers.IntegerField()
+    assigned_to = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False
+    )
+
+    class Meta:
+        model = Task
+        fields = [
+            'title', 'description', 'priority', 'due_date',
+            'estimated_hours', 'project', 'assigned_to'
+        ]
+
+
+def bulk_create_tasks(user, items, atomic=False):
+    """
+    Validate and insert a batch of tasks with their assignments.
+
+    Returns (created, errors): created is a list of {index, id, skipped_assignees}
+    and errors a list of {index, errors}. With atomic=True nothing is written if
+    any item is invalid. Assignees that do not exist or are over the per-project
+    task limit are skipped, as TaskCreateSerializer does.
+    """
+    errors = []
+    valid = []
+    for index, item in enumerate(items):
+        serializer = TaskBulkItemSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    # Projects the user cannot see are rejected with the rest of the batch in one query
+    project_ids = set(visible_projects(user).filter(
+        id__in={data['project'] for _, data in valid}
+    ).values_list('id', flat=True))
+    accepted = []
+    for index, data in valid:
+        if data['project'] in project_ids:
+            accepted.append((index, data))
+        else:
+            errors.append({'index': index, 'errors': {'project': ['Project not found.']}})
+    errors.sort(key=lambda error: error['index'])
+
+    if atomic and errors:
+        return [], errors
+
+    # Existing per-project task load of every requested assignee, as one grouped query
+    assignee_ids = {user_id for _, data in accepted for user_id in data.get('assigned_to', [])}
+    existing_users = set(User.objects.filter(id__in=assignee_ids).values_list('id', flat=True))
+    load = Counter({
+        (row['user_id'], row['task__project_id']): row['n']
+        for row in TaskAssignment.objects.filter(
+            user_id__in=existing_users, task__project_id__in=project_ids
+        ).values('user_id', 'task__project_id').annotate(n=Count('id')).order_by()
+    })
+
+    tasks = []
+    planned_assignees = []
+    for index, data in accepted:
+        assigned_to = data.pop('assigned_to', [])
+        project_id = data.pop('project')
+        tasks.append(Task(project_id=project_id, created_by=user, **data))
+        assignees, skipped = [], []
+        for user_id in dict.fromkeys(assigned_to):
+            key = (user_id, project_id)
+            if user_id in existing_users and load[key] < MAX_TASKS_PER_PROJECT:
+                load[key] += 1
+                assignees.append(user_id)
+            else:
+                skipped.append(user_id)
+        planned_assignees.append((assignees, skipped))
+
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks)
+        TaskAssignment.objects.bulk_create([
+            TaskAssignment(task=task, user_id=user_id, assigned_by=user)
+            for task, (assignees, _) in zip(tasks, planned_assignees)
+            for user_id in assignees
+        ])
+        index_tasks(tasks)
+        # bulk_create skips Task.save and the signals, so keep the derived data in step here
+        ProjectTaskCounters.apply_deltas(ProjectTaskCounters.task_deltas(
+            (task.project_id, task.status, 1) for task in tasks
+        ))
+        invalidate_dashboards(user_ids={
+            user_id for assignees, _ in planned_assignees for user_id in assignees
+        })
+        for project_id in {task.project_id for task in tasks}:
+            invalidate_dashboards(project_id=project_id)
+        for task, (assignees, _) in zip(tasks, planned_assignees):
+            publish_task(task, 'created')
+            if assignees:
+                notify('TASK_ASSIGNED', task=task, users=assignees, actor=user)
+
+    created = [
+        {'index': index, 'id': task.id, 'skipped_assignees': skipped}
+        for (index, _), task, (_, skipped) in zip(accepted, tasks, planned_assignees)
+    ]
+    return created, errors
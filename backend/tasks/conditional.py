@@ -0,0 +1,154 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, Q, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+
+from .access import visible_projects, visible_tasks
+from .dashboard import get_dashboard_stats
+from .models import Project, ProjectAssignment, Task, TaskAssignment, TaskComment
+
+User = get_user_model()
+
+
+def users_modified(tasks=None, projects=None):
+    """
+    Newest updated_at of the users nested in a response about `tasks` and/or
+    `projects`, as an aggregate next to the others: their creators, clients,
+    assignees, assigners and commenters
+    """
+    shown = []
+    if tasks is not None:
+        task_ids = tasks.order_by().values('pk')
+        shown += [
+            Task.objects.filter(pk__in=task_ids).values('created_by'),
+            TaskAssignment.objects.filter(task__in=task_ids).values('user'),
+            TaskAssignment.objects.filter(task__in=task_ids).values('assigned_by'),
+            TaskComment.objects.filter(task__in=task_ids).values('user'),
+        ]
+    if projects is not None:
+        project_ids = projects.order_by().values('pk')
+        shown += [
+            Project.objects.filter(pk__in=project_ids).values('created_by'),
+            Project.objects.filter(pk__in=project_ids).values('client'),
+            ProjectAssignment.objects.filter(project__in=project_ids).values('user'),
+            ProjectAssignment.objects.filter(project__in=project_ids).values('assigned_by'),
+        ]
+    condition = Q()
+    for user_ids in shown:
+        condition |= Q(pk__in=user_ids)
+    return Max(Subquery(User.objects.filter(condition).order_by('-updated_at').values('updated_at')[:1]))
+
+
+def due_state(prefix=''):
+    """
+    What is_overdue and days_until_due depend on besides the rows: today's
+    date, and how many open tasks are past due, which moves when one falls due
+    """
+    now = timezone.now()
+    return {
+        'today': now.date(),
+        'overdue': Count(
+            f'{prefix}pk',
+            filter=Q(**{f'{prefix}due_date__lt': now}) & ~Q(**{f'{prefix}status': 'DONE'})
+        ),
+    }
+
+
+def task_queryset_state(queryset):
+    """Newest updated_at and row count of tasks, their projects' and users' edits, and due dates"""
+    due = due_state()
+    today = due.pop('today')
+    state = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('pk'),
+        projects_modified=Max('project__updated_at'),
+        users_modified=users_modified(tasks=queryset),
+        **due,
+    )
+    return {**state, 'today': today}
+
+
+def project_state(view, request, pk=None, project_id=None):
+    """A project and its tasks: what the detail view and the Kanban board show"""
+    due = due_state('tasks__')
+    today = due.pop('today')
+    projects = visible_projects(request.user).filter(pk=pk or project_id)
+    state = projects.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        tasks_modified=Max('tasks__updated_at'),
+        task_count=Count('tasks'),
+        users_modified=users_modified(Task.objects.filter(project__in=projects.values('pk')), projects),
+        **due,
+    )
+    return {**state, 'today': today}
+
+
+def task_list_state(view, request):
+    return task_queryset_state(view.get_queryset())
+
+
+def recent_tasks_state(view, request):
+    return task_queryset_state(visible_tasks(request.user))
+
+
+def active_projects_state(view, request):
+    projects = visible_projects(request.user).filter(status='ACTIVE')
+    return projects.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        tasks_modified=Max('tasks__updated_at'),
+        count=Count('pk', distinct=True),
+        task_count=Count('tasks'),
+        users_modified=users_modified(projects=projects),
+    )
+
+
+def dashboard_stats_state(view, request):
+    # The numbers are cached already, so the validator is the numbers themselves.
+    # The view renders view.stats rather than fetching them a second time
+    view.stats = get_dashboard_stats(request.user)
+    return {'stats': view.stats}
+
+
+def make_etag(request, state):
+    """Weak ETag of a view's state as seen by this user, URL and renderer"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    payload = json.dumps(
+        [request.user.pk, request.user.role, request.get_full_path(),
+         renderer.format if renderer else None, state],
+        sort_keys=True, default=str,
+    )
+    return f'W/"{hashlib.md5(payload.encode()).hexdigest()}"'
+
+
+def conditional_get(state_func):
+    """
+    Answer a view's GET with 304 Not Modified while its data is unchanged.
+
+    `state_func(view, request, *args, **kwargs)` returns a dict describing the
+    data the response is built from, typically the MAX(updated_at) and COUNT(*)
+    of the visible rows: new and edited rows move the maximum, deletes and
+    visibility changes move the count. The ETag hashes that state. Comments
+    and assignments touch their task's or project's updated_at, see signals;
+    nested projects and users and the due-date fields are part of the state
+    too. There is no Last-Modified: a timestamp misses deletes and lost
+    access, and If-Modified-Since alone would answer 304 to those.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            state = state_func(self, request, *args, **kwargs)
+            etag = make_etag(request, state)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                # Clients may keep the copy but must revalidate before using it
+                response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .access import visible_projects, visible_tasks
+from .expressions import SubqueryAggregate
+from .metrics import CACHE_REQUESTS
+from .models import (
+    ActivityLog, Project, ProjectAccess, ProjectTaskCounters, Task, TaskAssignment
+)
+
+User = get_user_model()
+
+DASHBOARD_CACHE_PREFIX = 'dashboard_stats'
+ADMIN_CACHE_KEY = f'{DASHBOARD_CACHE_PREFIX}:admin'
+
+
+def _fetch(user, **stats):
+    """Evaluate every stat of a dashboard in a single SELECT anchored on the user row"""
+    return User.objects.filter(pk=user.pk).values(**stats).get()
+
+
+def _admin_stats(user):
+    counters = ProjectTaskCounters.objects.all()
+    return _fetch(
+        user,
+        total_users=SubqueryAggregate(User.objects.all()),
+        active_projects=SubqueryAggregate(Project.objects.filter(status='ACTIVE')),
+        total_tasks=SubqueryAggregate(counters, 'SUM', 'total'),
+        completed_tasks=SubqueryAggregate(counters, 'SUM', 'done'),
+        system_issues=SubqueryAggregate(ActivityLog.objects.filter(
+            severity='ERROR',
+            created_at__gte=timezone.now() - timedelta(days=7)
+        )),
+    )
+
+
+def _manager_stats(user):
+    user_projects = visible_projects(user)
+    counters = ProjectTaskCounters.objects.filter(project__in=user_projects)
+    return _fetch(
+        user,
+        managed_projects=SubqueryAggregate(user_projects),
+        active_projects=SubqueryAggregate(user_projects.filter(status='ACTIVE')),
+        team_tasks=SubqueryAggregate(counters, 'SUM', 'total'),
+        completed_tasks=SubqueryAggregate(counters, 'SUM', 'done'),
+        overdue_tasks=SubqueryAggregate(Task.objects.filter(
+            project__in=user_projects,
+            due_date__lt=timezone.now(),
+            status__in=['TODO', 'IN_PROGRESS']
+        )),
+    )
+
+
+def _collaborator_stats(user):
+    return visible_tasks(user).aggregate(
+        my_tasks=models.Count('pk'),
+        completed_tasks=models.Count('pk', filter=Q(status='DONE')),
+        in_progress=models.Count('pk', filter=Q(status='IN_PROGRESS')),
+        pending_tasks=models.Count('pk', filter=Q(status='TODO')),
+        overdue_tasks=models.Count('pk', filter=Q(
+            due_date__lt=timezone.now(),
+            status__in=['TODO', 'IN_PROGRESS']
+        )),
+    )
+
+
+def _client_stats(user):
+    stats = visible_projects(user).aggregate(
+        my_projects=models.Count('pk'),
+        active_projects=models.Count('pk', filter=Q(status='ACTIVE')),
+        completed_projects=models.Count('pk', filter=Q(status='COMPLETED')),
+        total_tasks=models.Sum('task_counters__total'),
+        pending_review=models.Sum('task_counters__in_review'),
+    )
+    # SUM over no projects is NULL
+    stats['total_tasks'] = stats['total_tasks'] or 0
+    stats['pending_review'] = stats['pending_review'] or 0
+    return stats
+
+
+ROLE_STATS = {
+    'ADMIN': _admin_stats,
+    'MANAGER': _manager_stats,
+    'COLLABORATOR': _collaborator_stats,
+    'CLIENT': _client_stats,
+}
+
+
+def dashboard_cache_key(user):
+    # Admin numbers are global, so every admin shares one entry
+    if user.role == 'ADMIN':
+        return ADMIN_CACHE_KEY
+    return f'{DASHBOARD_CACHE_PREFIX}:{user.pk}'
+
+
+def get_dashboard_stats(user):
+    """Role dashboard numbers, served from the cache for a short TTL"""
+    compute = ROLE_STATS.get(user.role)
+    if compute is None:
+        return {}
+    key = dashboard_cache_key(user)
+    stats = cache.get(key)
+    CACHE_REQUESTS.inc(cache=DASHBOARD_CACHE_PREFIX, result='miss' if stats is None else 'hit')
+    if stats is None:
+        stats = compute(user)
+        cache.set(key, stats, getattr(settings, 'DASHBOARD_STATS_CACHE_TTL', 60))
+    return stats
+
+
+def invalidate_dashboards(user_ids=(), project_id=None, task_id=None):
+    """Drop the cached dashboards of everyone who can see the project or task once the write commits"""
+    user_ids = set(user_ids)
+    if project_id is not None:
+        user_ids.update(
+            ProjectAccess.objects.filter(project_id=project_id).values_list('user_id', flat=True)
+        )
+    if task_id is not None:
+        user_ids.update(
+            TaskAssignment.objects.filter(task_id=task_id).values_list('user_id', flat=True)
+        )
+    keys = [ADMIN_CACHE_KEY] + [f'{DASHBOARD_CACHE_PREFIX}:{user_id}' for user_id in user_ids]
+    # Deleting after commit stops a concurrent request from re-caching pre-write numbers
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class SubqueryAggregate(models.Subquery):
+    """Scalar ``(SELECT AGG(column) FROM (subquery))`` usable next to other subqueries"""
+    template = '(SELECT COALESCE(%(function)s(%(column)s), 0) FROM (%(subquery)s) _agg)'
+    output_field = models.IntegerField()
+
+    def __init__(self, queryset, function='COUNT', column=None):
+        if column is None:
+            queryset, column = queryset.values('pk'), '*'
+        else:
+            queryset, column = queryset.values(agg_value=models.F(column)), 'agg_value'
+        super().__init__(queryset.order_by(), function=function, column=column)
@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task
+from .pagination import keyset_filter, reverse_ordering
+from .realtime import publish_task
+
+# Column order on the board follows the task status choices
+KANBAN_COLUMNS = [status for status, _ in Task.STATUS_CHOICES]
+
+# Cards within a column, with the primary key as the final tie-breaker
+CARD_ORDERING = ['position', '-created_at', '-id']
+
+# Room left between neighbouring cards, so a move can usually take a midpoint
+POSITION_GAP = 1024
+MAX_POSITION = 2 ** 31 - 1
+
+
+def get_board_tasks(project):
+    """Load every task of a project with its card relations in one pass"""
+    return Task.objects.filter(project=project).with_board_relations()
+
+
+def bucket_tasks_by_status(tasks):
+    """Split an ordered iterable of tasks into Kanban columns, keeping the order"""
+    columns = {status: [] for status in KANBAN_COLUMNS}
+    for task in tasks:
+        columns.setdefault(task.status, []).append(task)
+    return columns
+
+
+def _card_key(task):
+    return [task.position, task.created_at, task.id]
+
+
+def _free_position(previous, following):
+    """A position strictly between two neighbours, or None when there is no room"""
+    low = previous.position if previous is not None else None
+    high = following.position if following is not None else None
+    if high is None:
+        position = POSITION_GAP if low is None else low + POSITION_GAP
+        return position if position <= MAX_POSITION else None
+    if low is None:
+        return high // 2 if high > 0 else None
+    if high - low < 2:
+        return None
+    return (low + high) // 2
+
+
+def _rebalance_column(column, task, previous, following):
+    """
+    Spread a column out to even gaps with one bulk_update and return the
+    position of the moved task within it.
+    """
+    cards = list(column.order_by(*CARD_ORDERING).only('id', 'project_id', 'position', 'created_at'))
+    if previous is not None:
+        index = next(i for i, card in enumerate(cards) if card.id == previous.id) + 1
+    elif following is not None:
+        index = next(i for i, card in enumerate(cards) if card.id == following.id)
+    else:
+        index = len(cards)
+
+    now = timezone.now()
+    changed = []
+    for i, card in enumerate(cards[:index] + [None] + cards[index:]):
+        position = (i + 1) * POSITION_GAP
+        if card is None:
+            task_position = position
+        elif card.position != position:
+            card.position = position
+            card.updated_at = now
+            changed.append(card)
+    Task.objects.bulk_update(changed, ['position', 'updated_at'], batch_size=500)
+    for card in changed:
+        publish_task(card, 'updated', ['position', 'updated_at'])
+    return task_position
+
+
+def move_task(task, status, after=None, before=None, actor=None):
+    """
+    Move a card to `status`, directly after `after` and/or before `before`,
+    on behalf of `actor`.
+
+    Positions are sparse, so the task usually takes the midpoint of its new
+    neighbours and the move writes one row. Only when two neighbours are
+    adjacent is the target column renumbered. Returns (task, rebalanced).
+    """
+    with transaction.atomic():
+        task = Task.objects.select_for_update().get(pk=task.pk)
+        column = Task.objects.filter(project_id=task.project_id, status=status).exclude(pk=task.pk)
+
+        # Resolve whichever neighbour was not given from the column order
+        previous, following = after, before
+        if previous is not None and following is None:
+            following = column.filter(
+                keyset_filter(CARD_ORDERING, _card_key(previous))
+            ).order_by(*CARD_ORDERING).first()
+        elif following is not None and previous is None:
+            previous = column.filter(
+                keyset_filter(CARD_ORDERING, _card_key(following), reverse=True)
+            ).order_by(*reverse_ordering(CARD_ORDERING)).first()
+        elif previous is None and following is None:
+            previous = column.order_by(*reverse_ordering(CARD_ORDERING)).first()
+
+        position = _free_position(previous, following)
+        rebalanced = position is None
+        if rebalanced:
+            position = _rebalance_column(column, task, previous, following)
+
+        task.status = status
+        task.position = position
+        task.actor = actor
+        # Task.save keeps completed_at and the project counters in step with the status
+        task.save(update_fields=['status', 'position', 'completed_at', 'updated_at'])
+    return task, rebalanced
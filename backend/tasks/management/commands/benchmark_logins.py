@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from tasks.benchmark import run_login_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Measure logins per second on one core through the authentication backends, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        report = json.dumps(run_login_benchmark(options['iterations'], options['warmup']), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        else:
+            self.stdout.write(report)
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from tasks.models import ActivityLog
+from tasks.partitions import (
+    add_months, create_partitions, is_partitioned, month_start, remove_partitions_before
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete ActivityLog entries older than the retention period. On a partitioned '
+        'PostgreSQL table whole months are dropped and upcoming months are created; '
+        'elsewhere rows are deleted in chunks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'ACTIVITY_LOG_RETENTION_DAYS', 365),
+                            help='Keep entries this many days old or younger')
+        parser.add_argument('--detach', action='store_true',
+                            help='Detach expired partitions for archiving instead of dropping them')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows per DELETE for what partitions do not cover')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+
+        if is_partitioned(connection):
+            created = create_partitions(
+                connection, now,
+                add_months(month_start(now), getattr(settings, 'ACTIVITY_LOG_PARTITIONS_AHEAD', 3))
+            )
+            removed = remove_partitions_before(connection, cutoff, detach=options['detach'])
+            action = 'Detached' if options['detach'] else 'Dropped'
+            for name in removed:
+                self.stdout.write(f'{action} {name}')
+            for name in created:
+                self.stdout.write(f'Created {name}')
+
+        # The rest of the cutoff month, the default partition, or the whole table on other databases
+        deleted = 0
+        expired = ActivityLog.objects.filter(created_at__lt=cutoff).order_by()
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            # created_at lets PostgreSQL prune partitions
+            deleted += ActivityLog.objects.filter(id__in=ids, created_at__lt=cutoff).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} entries older than {cutoff:%Y-%m-%d %H:%M}'
+        ))
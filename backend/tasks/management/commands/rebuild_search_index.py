@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tasks.models import Project, SearchEntry, Task, TaskComment
+from tasks.search import FTS_TABLE, index_comments, index_projects, index_tasks
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search entries of every project, task and comment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        sources = [
+            (Project.objects.only('id', 'name', 'description'), index_projects),
+            (Task.objects.only('id', 'project_id', 'title', 'description'), index_tasks),
+            (TaskComment.objects.select_related('task').only(
+                'id', 'task_id', 'content', 'task__project_id'
+            ), index_comments),
+        ]
+        indexed = 0
+        with transaction.atomic():
+            SearchEntry.objects.all().delete()
+            for queryset, index in sources:
+                batch = []
+                for obj in queryset.order_by('id').iterator(chunk_size=batch_size):
+                    batch.append(obj)
+                    if len(batch) >= batch_size:
+                        indexed += len(index(batch))
+                        batch = []
+                indexed += len(index(batch))
+            if connection.vendor == 'sqlite':
+                # Also repairs an FTS table that drifted from its content table
+                with connection.cursor() as cursor:
+                    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} objects'))
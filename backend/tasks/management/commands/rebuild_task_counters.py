@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import Project, ProjectTaskCounters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized per-project task counters from the tasks table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the counters with the real data and fail on drift'
+        )
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help='Limit to this project id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        project_ids = Project.objects.order_by('id').values_list('id', flat=True)
+        if options['projects']:
+            project_ids = project_ids.filter(id__in=options['projects'])
+        project_ids = list(project_ids)
+
+        batch_size = options['batch_size']
+        drifted = []
+        for start in range(0, len(project_ids), batch_size):
+            drifted += ProjectTaskCounters.rebuild(
+                project_ids[start:start + batch_size],
+                write=not options['verify']
+            )
+
+        for project_id in drifted:
+            self.stdout.write(f'Project {project_id}: counters out of sync')
+
+        if options['verify']:
+            if drifted:
+                raise CommandError(f'{len(drifted)} of {len(project_ids)} projects have drifted counters')
+            self.stdout.write(self.style.SUCCESS(f'All {len(project_ids)} project counters match'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt counters for {len(project_ids)} projects ({len(drifted)} corrected)'
+            ))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import urls
+from tasks.benchmark import ROLES, benchmark_users, route_names, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Request every API route as each role and report latency, query count and response size as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--role', action='append', dest='roles', choices=ROLES,
+                            help='Limit to this role (repeatable)')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Limit to this URL name (repeatable)')
+        parser.add_argument('--password', default='benchmark', help='Password the data was seeded with')
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request')
+        parser.add_argument('--output', help='Write the report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        # One user per role, the first one seed_benchmark_data generated
+        users = []
+        for role in options['roles'] or ROLES:
+            user = benchmark_users().filter(role=role).order_by('id').first()
+            if user is None:
+                raise CommandError(f'No {role} benchmark user, run seed_benchmark_data first')
+            users.append(user)
+
+        routes = route_names(urls.urlpatterns)
+        if options['routes']:
+            unknown = set(options['routes']) - set(routes)
+            if unknown:
+                raise CommandError(f'Unknown routes: {", ".join(sorted(unknown))}')
+            routes = [name for name in routes if name in options['routes']]
+
+        report = run_benchmark(
+            users, routes,
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            password=options['password'],
+            host=options['host'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(report["results"])} results to {options["output"]}'))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.benchmark import BENCHMARK_EMAIL_DOMAIN, benchmark_users, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic data set for load benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users per role')
+        parser.add_argument('--projects-per-manager', type=int, default=3)
+        parser.add_argument('--tasks-per-project', type=int, default=50)
+        parser.add_argument('--comments-per-task', type=int, default=2)
+        parser.add_argument('--notifications-per-user', type=int, default=30)
+        parser.add_argument('--activity-per-user', type=int, default=30)
+        parser.add_argument('--password', default='benchmark', help='Password of every generated user')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--flush', action='store_true',
+            help=f'Delete previously generated @{BENCHMARK_EMAIL_DOMAIN} users and their data first'
+        )
+
+    def handle(self, *args, **options):
+        existing = benchmark_users()
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError('Benchmark data already exists, pass --flush to regenerate it')
+            existing.delete()
+
+        created = seed_benchmark_data(
+            users_per_role=options['users'],
+            projects_per_manager=options['projects_per_manager'],
+            tasks_per_project=options['tasks_per_project'],
+            comments_per_task=options['comments_per_task'],
+            notifications_per_user=options['notifications_per_user'],
+            activity_per_user=options['activity_per_user'],
+            password=options['password'],
+            seed=options['seed'],
+        )
+        for model, count in created.items():
+            self.stdout.write(f'{model}: {count}')
+        self.stdout.write(self.style.SUCCESS('Benchmark data generated'))
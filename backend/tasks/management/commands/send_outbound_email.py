@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tasks.outbox import deliver_outbox, requeue_dead
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound emails in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send what is due now and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Emails per SMTP connection (default: OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait when nothing is due')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Queue dead-lettered emails again before sending')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f'Requeued {requeue_dead()} dead-lettered emails')
+
+        attempted = 0
+        while True:
+            close_old_connections()
+            batch = deliver_outbox(options['batch_size'])
+            attempted += batch
+            if options['once']:
+                # Drain what is due, then stop
+                if batch:
+                    continue
+                break
+            if not batch:
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Attempted {attempted} emails'))
@@ -0,0 +1,202 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, str(labels[name])) for name in self.labelnames)
+        with self.registry.lock:
+            samples = self.registry.samples[self.name]
+            samples[key] = samples.get(key, 0) + amount
+        self.registry.changed()
+
+    def merge(self, current, value):
+        return (current or 0) + value
+
+    def expose(self, samples):
+        for labels, value in sorted(samples.items()):
+            yield f'{self.name}{_format_labels(labels)} {_format_value(value)}'
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        self.buckets = tuple(buckets)
+        super().__init__(registry, name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = tuple((name, str(labels[name])) for name in self.labelnames)
+        with self.registry.lock:
+            samples = self.registry.samples[self.name]
+            # Per-bucket counts, then the +Inf count and the sum
+            sample = samples.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+                    break
+            else:
+                sample[-2] += 1
+            sample[-1] += value
+        self.registry.changed()
+
+    def merge(self, current, value):
+        if current is None:
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def expose(self, samples):
+        for labels, sample in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, sample):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}'
+            count = cumulative + sample[-2]
+            yield f'{self.name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}'
+            yield f'{self.name}_sum{_format_labels(labels)} {_format_value(sample[-1])}'
+            yield f'{self.name}_count{_format_labels(labels)} {count}'
+
+
+class MetricsRegistry:
+    """
+    In-process metric store rendered in the Prometheus text format.
+
+    With METRICS_MULTIPROCESS_DIR set, every process also writes its samples
+    to its own file there (at most every METRICS_FLUSH_INTERVAL seconds and
+    before each scrape), and a scrape sums the files of all workers. Empty
+    the directory before starting the workers, as with prometheus_client.
+    """
+
+    def __init__(self, multiprocess_dir=None):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.samples = defaultdict(dict)
+        self.multiprocess_dir = multiprocess_dir
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def get_multiprocess_dir(self):
+        if self.multiprocess_dir is not None:
+            return self.multiprocess_dir
+        return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+    def changed(self):
+        directory = self.get_multiprocess_dir()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if directory and time.monotonic() - self.last_flush >= interval:
+            self.flush(directory)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(map(list, labels)), value] for labels, value in samples.items()]
+                for name, samples in self.samples.items()
+            }
+
+    def flush(self, directory):
+        self.last_flush = time.monotonic()
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        # Write then rename so a scrape never reads half a file
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Samples of every metric, summed over all worker processes when enabled"""
+        directory = self.get_multiprocess_dir()
+        if not directory:
+            with self.lock:
+                return {name: dict(samples) for name, samples in self.samples.items()}
+        self.flush(directory)
+        merged = defaultdict(dict)
+        for path in sorted(glob.glob(os.path.join(directory, 'metrics-*.json'))):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, samples in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for labels, value in samples:
+                    key = tuple(map(tuple, labels))
+                    merged[name][key] = metric.merge(merged[name].get(key), value)
+        return merged
+
+    def expose(self):
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.expose(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = Counter(
+    REGISTRY, 'http_requests_total', 'HTTP requests by URL name, method and status code',
+    ['route', 'method', 'status']
+)
+REQUEST_DURATION = Histogram(
+    REGISTRY, 'http_request_duration_seconds', 'HTTP request latency by URL name',
+    ['route', 'method'], DURATION_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    REGISTRY, 'http_request_db_queries', 'Database queries per HTTP request by URL name',
+    ['route'], QUERY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    REGISTRY, 'cache_requests_total', 'Response cache lookups by cache and result',
+    ['cache', 'result']
+)
+AUTH_ATTEMPTS = Counter(
+    REGISTRY, 'auth_attempts_total', 'EmailBackend authentication attempts by outcome',
+    ['outcome']
+)
+ACTIVITY_LOG_ENTRIES = Counter(
+    REGISTRY, 'activity_log_entries_total', 'Buffered ActivityLog entries by outcome',
+    ['outcome']
+)
+OUTBOUND_EMAILS = Counter(
+    REGISTRY, 'outbound_emails_total', 'Outbox email delivery attempts by outcome',
+    ['outcome']
+)
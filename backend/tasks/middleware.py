@@ -0,0 +1,227 @@
+import cProfile
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import REQUEST_DURATION, REQUEST_QUERIES, REQUESTS
+from .profiling import save_profile
+
+logger = logging.getLogger('tasks.performance')
+
+# Timings of the sampled request being handled in this thread or task, if any
+_current_timings = ContextVar('request_timings', default=None)
+
+
+class TimedSerializerMixin:
+    """
+    Count a serializer's to_representation() as serializer time of the
+    sampled request. Mixed into the API's serializers; nested serializers and
+    list items of an outer one are part of its time.
+    """
+
+    def to_representation(self, instance):
+        timings = _current_timings.get()
+        if timings is None or timings.serializing:
+            return super().to_representation(instance)
+        timings.serializing = True
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializer += time.perf_counter() - start
+            timings.serializing = False
+
+
+class RequestTimings:
+    """SQL, serializer and render time of one request, in seconds"""
+
+    def __init__(self):
+        self.queries = []
+        self.sql = 0.0
+        self.serializer = 0.0
+        self.serializing = False
+        self.render = 0.0
+        self.render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.sql += duration
+            self.queries.append((context['connection'].alias, sql, duration))
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def end_render(self, response):
+        if self.render_started is not None:
+            self.render += time.perf_counter() - self.render_started
+
+
+class PerformanceMiddleware:
+    """
+    Time SQL, serialization and rendering for a sample of requests and report
+    them in a Server-Timing header and one structured log line per request.
+
+    PERFORMANCE_SAMPLE_RATE is the fraction of requests measured; at 0 the
+    middleware removes itself at startup. Sampled requests slower than
+    PERFORMANCE_SLOW_REQUEST_MS are logged as warnings with every query.
+    Serializer time is that of serializers with TimedSerializerMixin and
+    includes any SQL they trigger.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0.0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.slow_request_ms = getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 1000)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={timings.sql * 1000:.1f};desc="{len(timings.queries)} queries"',
+            f'serializer;dur={timings.serializer * 1000:.1f}',
+            f'render;dur={timings.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        self.log(request, response, timings, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook returns
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.start_render()
+            response.add_post_render_callback(timings.end_render)
+        return response
+
+    def log(self, request, response, timings, total):
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.url_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sql_ms': round(timings.sql * 1000, 1),
+            'queries': len(timings.queries),
+            'serializer_ms': round(timings.serializer * 1000, 1),
+            'render_ms': round(timings.render * 1000, 1),
+        }
+        if total * 1000 < self.slow_request_ms:
+            logger.info(json.dumps(record))
+            return
+        record['slow'] = True
+        record['query_log'] = [
+            {'db': alias, 'sql': sql, 'ms': round(duration * 1000, 2)}
+            for alias, sql, duration in timings.queries
+        ]
+        logger.warning(json.dumps(record))
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook that only counts queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status code and query count of every request per URL
+    name for the /api/metrics endpoint. Disabled by METRICS_ENABLED = False.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        # URL names keep the label set bounded, unlike raw paths
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or 'unnamed') if match else 'unmatched'
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        REQUEST_DURATION.observe(duration, route=route, method=request.method)
+        REQUEST_QUERIES.observe(queries.count, route=route)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request with cProfile when a staff user asks for it with an
+    ``X-Profile: 1`` header or ``?profile=1``. The stats and the request's SQL
+    are stored for the RequestProfile admin and the response carries
+    ``X-Profile-Id``. Other users' profiles are thrown away, and with
+    PROFILING_ENABLED = False the middleware is not installed at all.
+    """
+    header = 'HTTP_X_PROFILE'
+    query_param = 'profile'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.META.get(self.header) != '1' and request.GET.get(self.query_param) != '1':
+            return self.get_response(request)
+
+        # API requests carry a JWT, which DRF only reads inside the view, so the
+        # request is profiled first and its user checked once DRF has set it
+        timings = RequestTimings()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_staff:
+            return response
+        profile = save_profile(profiler, request, response, user, timings, duration)
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
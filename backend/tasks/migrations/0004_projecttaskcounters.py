@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_task_counters(apps, schema_editor):
+    Project = apps.get_model('tasks', 'Project')
+    ProjectTaskCounters = apps.get_model('tasks', 'ProjectTaskCounters')
+    projects = Project.objects.order_by().annotate(
+        n_total=Count('tasks'),
+        n_todo=Count('tasks', filter=Q(tasks__status='TODO')),
+        n_in_progress=Count('tasks', filter=Q(tasks__status='IN_PROGRESS')),
+        n_in_review=Count('tasks', filter=Q(tasks__status='IN_REVIEW')),
+        n_done=Count('tasks', filter=Q(tasks__status='DONE')),
+    )
+    ProjectTaskCounters.objects.bulk_create([
+        ProjectTaskCounters(
+            project_id=project.id,
+            total=project.n_total,
+            todo=project.n_todo,
+            in_progress=project.n_in_progress,
+            in_review=project.n_in_review,
+            done=project.n_done,
+        )
+        for project in projects.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_customuser_is_online_customuser_last_login_ip_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectTaskCounters',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='task_counters', serialize=False, to='tasks.project')),
+                ('total', models.IntegerField(default=0)),
+                ('todo', models.IntegerField(default=0)),
+                ('in_progress', models.IntegerField(default=0)),
+                ('in_review', models.IntegerField(default=0)),
+                ('done', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_task_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_project_access(apps, schema_editor):
+    Project = apps.get_model('tasks', 'Project')
+    ProjectAssignment = apps.get_model('tasks', 'ProjectAssignment')
+    ProjectAccess = apps.get_model('tasks', 'ProjectAccess')
+    rows = []
+    for project_id, created_by_id, client_id in Project.objects.values_list('id', 'created_by_id', 'client_id').iterator():
+        rows.append(ProjectAccess(user_id=created_by_id, project_id=project_id, via='CREATOR'))
+        rows.append(ProjectAccess(user_id=client_id, project_id=project_id, via='CLIENT'))
+    for project_id, user_id in ProjectAssignment.objects.values_list('project_id', 'user_id').iterator():
+        rows.append(ProjectAccess(user_id=user_id, project_id=project_id, via='ASSIGNED'))
+    ProjectAccess.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_projecttaskcounters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('via', models.CharField(choices=[('CREATOR', 'Creator'), ('ASSIGNED', 'Assigned'), ('CLIENT', 'Client')], max_length=20)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='tasks.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'project', 'via')},
+            },
+        ),
+        migrations.RunPython(backfill_project_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:27
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_category_and_severity(apps, schema_editor):
+    ActivityLog = apps.get_model('tasks', 'ActivityLog')
+    # The one full scan: "system issues" used to be any action containing "error"
+    ActivityLog.objects.filter(action__icontains='error').update(severity='ERROR')
+    categories = {
+        'AUTH': ['LOGIN', 'LOGOUT', 'PASSWORD'],
+        'PROJECT': ['PROJECT'],
+        'TASK': ['TASK', 'TASKS', 'COMMENT'],
+    }
+    for category, prefixes in categories.items():
+        prefix_filter = Q()
+        for prefix in prefixes:
+            prefix_filter |= Q(action=prefix) | Q(action__startswith=f'{prefix}_')
+        ActivityLog.objects.filter(prefix_filter).update(category=category)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_activitylog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='category',
+            field=models.CharField(choices=[('AUTH', 'Authentication'), ('PROJECT', 'Project'), ('TASK', 'Task'), ('SYSTEM', 'System')], default='SYSTEM', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='severity',
+            field=models.CharField(choices=[('INFO', 'Info'), ('WARNING', 'Warning'), ('ERROR', 'Error')], default='INFO', max_length=10),
+        ),
+        migrations.RunPython(backfill_category_and_severity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['category', 'created_at'], name='activity_category_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['severity', 'created_at'], name='activity_severity_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['created_at'], name='activity_created_idx'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+# The DDL is written out here rather than imported from tasks.partitions, so
+# this migration does the same on every database whatever that module becomes
+TABLE = 'tasks_activitylog'
+OLD_TABLE = f'{TABLE}_unpartitioned'
+SEQUENCE = f'{TABLE}_partitioned_id_seq'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_activity_log(apps, schema_editor):
+    """
+    Turn the plain ActivityLog table into one partitioned by month, keeping its
+    rows, columns, indexes and foreign keys. The primary key becomes
+    (id, created_at), as PostgreSQL requires the partition key in every
+    unique constraint. Other databases keep the plain table and the
+    chunked-delete retention.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    now = timezone.now()
+    months_ahead = getattr(settings, 'ACTIVITY_LOG_PARTITIONS_AHEAD', 3)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s', [TABLE])
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [TABLE]
+        )
+        primary_key, = cursor.fetchone()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT MIN(created_at), MAX(id) FROM {TABLE}')
+        oldest, max_id = cursor.fetchone()
+
+        # Index names are unique per schema, so free them for the new table
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX {name} RENAME TO {name}_unpartitioned')
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        # The identity column stays with the old table, so ids come from a sequence of our own
+        cursor.execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+        cursor.execute('SELECT setval(%s, %s, %s)', [SEQUENCE, max_id or 1, max_id is not None])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+
+        month, last = month_start(oldest or now), add_months(month_start(now), months_ahead)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {TABLE}_p{month.year:04d}{month.month:02d} PARTITION OF {TABLE} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)]
+            )
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}')
+        cursor.execute(f'DROP TABLE {OLD_TABLE}')
+        for name, definition in indexes:
+            if name == primary_key:
+                continue
+            cursor.execute(re.sub(rf' ON (\S+\.)?{TABLE} ', f' ON {TABLE} ', definition))
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_activitylog_category_severity'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_activity_log, migrations.RunPython.noop),
+    ]
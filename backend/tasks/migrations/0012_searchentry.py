@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The index DDL is written out here rather than imported from tasks.search, so
+# this migration does the same on every database whatever that module becomes
+TABLE = 'tasks_searchentry'
+FTS_TABLE = f'{TABLE}_fts'
+
+INDEX = {
+    # A generated tsvector column, title weighted above body, with a GIN index
+    'postgresql': [
+        f"ALTER TABLE {TABLE} ADD COLUMN document tsvector GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+        f'CREATE INDEX {TABLE}_document_idx ON {TABLE} USING GIN (document)',
+    ],
+    # An external-content FTS5 table kept in step by triggers
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, body, content='{TABLE}', "
+        f"content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+        f'CREATE TRIGGER {TABLE}_fts_insert AFTER INSERT ON {TABLE} BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END',
+        f'CREATE TRIGGER {TABLE}_fts_delete AFTER DELETE ON {TABLE} BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+        f'CREATE TRIGGER {TABLE}_fts_update AFTER UPDATE OF title, body ON {TABLE} BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+        f'INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END',
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ],
+}
+DROP_INDEX = {
+    'postgresql': [f'ALTER TABLE {TABLE} DROP COLUMN document'],
+    'sqlite': [
+        f'DROP TRIGGER IF EXISTS {TABLE}_fts_{event}' for event in ('insert', 'delete', 'update')
+    ] + [f'DROP TABLE IF EXISTS {FTS_TABLE}'],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in INDEX.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP_INDEX.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def index_existing(apps, schema_editor):
+    """Entries for what is already there; the triggers or generated column index them"""
+    SearchEntry = apps.get_model('tasks', 'SearchEntry')
+    Project = apps.get_model('tasks', 'Project')
+    Task = apps.get_model('tasks', 'Task')
+    TaskComment = apps.get_model('tasks', 'TaskComment')
+    no_task = models.Value(None, output_field=models.BigIntegerField())
+    sources = [
+        ('project', Project.objects.values_list('id', 'id', no_task, 'name', 'description')),
+        ('task', Task.objects.values_list('id', 'project_id', 'id', 'title', 'description')),
+        ('comment', TaskComment.objects.values_list(
+            'id', 'task__project_id', 'task_id', models.Value(''), 'content'
+        )),
+    ]
+    for kind, values in sources:
+        batch = []
+        for object_id, project_id, task_id, title, body in values.order_by('id').iterator(chunk_size=2000):
+            batch.append(SearchEntry(
+                kind=kind, object_id=object_id, project_id=project_id, task_id=task_id,
+                title=title, body=body
+            ))
+            if len(batch) >= 1000:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_partition_activitylog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('project', 'Project'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.project')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.task')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_object_unique')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
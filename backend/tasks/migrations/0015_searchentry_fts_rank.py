@@ -0,0 +1,23 @@
+from django.db import migrations
+
+FTS_TABLE = 'tasks_searchentry_fts'
+
+
+def set_rank(rank):
+    def operation(apps, schema_editor):
+        # The PostgreSQL index ranks with ts_rank_cd weights given in each query
+        if schema_editor.connection.vendor == 'sqlite':
+            schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', %s)", [rank])
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0014_customuser_updated_at'),
+    ]
+
+    operations = [
+        # bm25 weights of the title and body columns
+        migrations.RunPython(set_rank('bm25(10.0, 1.0)'), set_rank('bm25()')),
+    ]
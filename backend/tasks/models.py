@@ -1,11 +1,46 @@
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+import io
+import os
+import pstats
 import random
-
-class CustomUserManager(BaseUserManager):
+from collections import defaultdict
+
+from .expressions import SubqueryAggregate
+
+# Assignment limits enforced when staffing projects and tasks
+MAX_PROJECTS_PER_USER = 3
+MAX_TASKS_PER_PROJECT = 3
+
+class CustomUserQuerySet(models.QuerySet):
+    def with_workload(self, project=None):
+        """Annotate assignment counts as correlated COUNT subqueries"""
+        queryset = self.annotate(
+            assigned_project_count=SubqueryAggregate(
+                ProjectAssignment.objects.filter(user=models.OuterRef('pk'))
+            )
+        )
+        if project is not None:
+            queryset = queryset.annotate(
+                assigned_task_count=SubqueryAggregate(
+                    TaskAssignment.objects.filter(user=models.OuterRef('pk'), task__project=project)
+                )
+            )
+        return queryset
+
+    def available_for_assignment(self, project=None):
+        """Staff below the project limit, and below the task limit in the project if given"""
+        queryset = self.filter(role__in=['MANAGER', 'COLLABORATOR']).with_workload(project)
+        queryset = queryset.filter(assigned_project_count__lt=MAX_PROJECTS_PER_USER)
+        if project is not None:
+            queryset = queryset.filter(assigned_task_count__lt=MAX_TASKS_PER_PROJECT)
+        return queryset
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     """Custom user model manager where email is unique for authentication."""
 
     def create_user(self, email, password=None, **extra_fields):
@@ -47,12 +82,21 @@ class CustomUser(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     last_login_ip = models.GenericIPAddressField(blank=True, null=True)
     is_online = models.BooleanField(default=False)
+    # Moves when the user is saved, so cached pages showing their name revalidate
+    updated_at = models.DateTimeField(auto_now=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination order of the admin user list
+            models.Index(fields=['-date_joined', '-id'], name='user_joined_keyset_idx'),
+            models.Index(fields=['-updated_at'], name='user_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})" if self.first_name else self.email
 
@@ -63,11 +107,13 @@ class CustomUser(AbstractUser):
     @property
     def project_count(self):
         """Count of projects user is assigned to"""
+        if hasattr(self, 'assigned_project_count'):
+            return self.assigned_project_count
         return self.assigned_projects.count()
 
     def can_be_assigned_to_project(self):
         """Check if user can be assigned to another project (limit: 3)"""
-        return self.project_count < 3
+        return self.project_count < MAX_PROJECTS_PER_USER
 
     def get_task_count_for_project(self, project):
         """Count of tasks in a specific project"""
@@ -75,7 +121,23 @@ class CustomUser(AbstractUser):
 
     def can_be_assigned_to_task_in_project(self, project):
         """Check if user can be assigned to another task in a project (limit: 3 per project)"""
-        return self.get_task_count_for_project(project) < 3
+        return self.get_task_count_for_project(project) < MAX_TASKS_PER_PROJECT
+
+class ProjectQuerySet(models.QuerySet):
+    def with_task_stats(self):
+        """Annotate per-status task counts with a single grouped aggregate"""
+        # distinct=True keeps the counts right when visibility filters join assignments
+        return self.annotate(
+            task_total=models.Count('tasks', distinct=True),
+            task_todo=models.Count('tasks', filter=models.Q(tasks__status='TODO'), distinct=True),
+            task_in_progress=models.Count('tasks', filter=models.Q(tasks__status='IN_PROGRESS'), distinct=True),
+            task_in_review=models.Count('tasks', filter=models.Q(tasks__status='IN_REVIEW'), distinct=True),
+            task_done=models.Count('tasks', filter=models.Q(tasks__status='DONE'), distinct=True),
+        )
+
+    def with_task_counters(self):
+        """Join the denormalized task counters so task_stats needs no extra query"""
+        return self.select_related('task_counters')
 
 class Project(models.Model):
     name = models.CharField(max_length=200)
@@ -121,24 +183,53 @@ class Project(models.Model):
     
     budget = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination order
+            models.Index(fields=['-created_at', '-id'], name='project_created_keyset_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def _precomputed_task_stats(self):
+        """Task statistics from with_task_stats() annotations or the counters row, if present"""
+        if hasattr(self, 'task_total'):
+            return {
+                'total': self.task_total,
+                'todo': self.task_todo,
+                'in_progress': self.task_in_progress,
+                'in_review': self.task_in_review,
+                'done': self.task_done,
+            }
+        try:
+            return self.task_counters.as_stats()
+        except ProjectTaskCounters.DoesNotExist:
+            return None
+
     @property
     def progress_percentage(self):
         """Calculate project progress based on completed tasks"""
-        total_tasks = self.tasks.count()
+        stats = self._precomputed_task_stats()
+        if stats is not None:
+            total_tasks = stats['total']
+            completed_tasks = stats['done']
+        else:
+            total_tasks = self.tasks.count()
+            completed_tasks = self.tasks.filter(status='DONE').count() if total_tasks else 0
         if total_tasks == 0:
             return 0
-        completed_tasks = self.tasks.filter(status='DONE').count()
         return (completed_tasks / total_tasks) * 100
 
     @property
     def task_stats(self):
         """Get task statistics for this project"""
+        stats = self._precomputed_task_stats()
+        if stats is not None:
+            return stats
         tasks = self.tasks.all()
         return {
             'total': tasks.count(),
@@ -148,6 +239,83 @@ class Project(models.Model):
             'done': tasks.filter(status='DONE').count(),
         }
 
+class ProjectTaskCounters(models.Model):
+    """Denormalized task counts per project, maintained on every task write"""
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='task_counters'
+    )
+    total = models.IntegerField(default=0)
+    todo = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    in_review = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Task status -> counter column
+    STATUS_FIELDS = {
+        'TODO': 'todo',
+        'IN_PROGRESS': 'in_progress',
+        'IN_REVIEW': 'in_review',
+        'DONE': 'done',
+    }
+    COUNTER_FIELDS = ['total', 'todo', 'in_progress', 'in_review', 'done']
+
+    def __str__(self):
+        return f"Task counters for {self.project_id}"
+
+    def as_stats(self):
+        return {field: getattr(self, field) for field in self.COUNTER_FIELDS}
+
+    @classmethod
+    def task_deltas(cls, rows):
+        """Turn (project_id, status, count) rows into per-project counter deltas"""
+        deltas = defaultdict(lambda: defaultdict(int))
+        for project_id, status, count in rows:
+            deltas[project_id]['total'] += count
+            deltas[project_id][cls.STATUS_FIELDS[status]] += count
+        return deltas
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """Apply counter deltas with F() increments so concurrent writers don't race"""
+        for project_id, changes in deltas.items():
+            updates = {
+                field: models.F(field) + delta
+                for field, delta in changes.items() if delta
+            }
+            if updates:
+                updates['updated_at'] = timezone.now()
+                cls.objects.filter(project_id=project_id).update(**updates)
+
+    @classmethod
+    def rebuild(cls, project_ids, write=True):
+        """Recompute counters from the tasks table, returning the projects that had drifted"""
+        drifted = []
+        with transaction.atomic():
+            # Lock existing rows first so in-flight increments land after the recount
+            current = {
+                counters.project_id: counters.as_stats()
+                for counters in cls.objects.select_for_update().filter(project_id__in=project_ids)
+            }
+            rows = []
+            for project in Project.objects.filter(id__in=project_ids).with_task_stats().order_by():
+                stats = project.task_stats
+                if current.get(project.id) != stats:
+                    drifted.append(project.id)
+                rows.append(cls(project=project, **stats))
+            if not write:
+                return drifted
+            cls.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['project'],
+                update_fields=cls.COUNTER_FIELDS + ['updated_at'],
+            )
+        return drifted
+
 class ProjectAssignment(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -172,6 +340,106 @@ class ProjectAssignment(models.Model):
     def __str__(self):
         return f"{self.user.full_name} - {self.project.name} ({self.role_in_project})"
 
+class ProjectAccess(models.Model):
+    """Who can see which project and why, materialized from creator, client and assignments"""
+    VIA_CHOICES = [
+        ('CREATOR', 'Creator'),
+        ('ASSIGNED', 'Assigned'),
+        ('CLIENT', 'Client'),
+    ]
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='project_access')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='access')
+    via = models.CharField(max_length=20, choices=VIA_CHOICES)
+
+    class Meta:
+        # Leads with user so visibility EXISTS lookups are a single index probe
+        unique_together = ['user', 'project', 'via']
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.project_id} ({self.via})"
+
+    @classmethod
+    def grant(cls, rows):
+        """Insert (user_id, project_id, via) rows, ignoring ones that already exist"""
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, project_id=project_id, via=via) for user_id, project_id, via in rows],
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def sync_project(cls, project_id):
+        """Bring a project's access rows in line with its creator, client and assignments"""
+        wanted = set()
+        project = Project.objects.filter(pk=project_id).values('created_by_id', 'client_id').first()
+        if project:
+            wanted.add((project['created_by_id'], 'CREATOR'))
+            wanted.add((project['client_id'], 'CLIENT'))
+            wanted.update(
+                (user_id, 'ASSIGNED')
+                for user_id in ProjectAssignment.objects.filter(project_id=project_id).values_list('user_id', flat=True)
+            )
+        existing = set(cls.objects.filter(project_id=project_id).values_list('user_id', 'via'))
+        stale = existing - wanted
+        if stale:
+            condition = models.Q()
+            for user_id, via in stale:
+                condition |= models.Q(user_id=user_id, via=via)
+            cls.objects.filter(condition, project_id=project_id).delete()
+        cls.grant((user_id, project_id, via) for user_id, via in wanted - existing)
+
+class TaskQuerySet(models.QuerySet):
+    def with_board_relations(self):
+        """Batch-load everything a Kanban card renders, in a fixed number of queries"""
+        return self.select_related('project', 'created_by').prefetch_related(
+            'assigned_to',
+            models.Prefetch(
+                'taskassignment_set',
+                queryset=TaskAssignment.objects.select_related('user', 'assigned_by')
+            ),
+        ).annotate(comment_count=models.Count('comments'))
+
+    def update_status(self, status, actor=None):
+        """
+        Bulk status change that keeps completed_at and the project counters in
+        step. The `actor` making the change is not notified of it.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            changed = list(
+                self.exclude(status=status).select_for_update().order_by()
+                .values_list('pk', 'project_id', 'status')
+            )
+            if not changed:
+                return 0
+            task_ids = [pk for pk, project_id, old_status in changed]
+            updated = Task.objects.filter(pk__in=task_ids).update(
+                status=status,
+                completed_at=now if status == 'DONE' else None,
+                updated_at=now,
+            )
+            rows = []
+            for task_id, project_id, old_status in changed:
+                rows += [(project_id, old_status, -1), (project_id, status, 1)]
+            ProjectTaskCounters.apply_deltas(ProjectTaskCounters.task_deltas(rows))
+
+            from .notifications import notify
+            from .realtime import publish_task
+            for pk, project_id, old_status in changed:
+                if status == 'DONE':
+                    notify('TASK_COMPLETED', task=pk, project=project_id, actor=actor)
+                publish_task(
+                    Task(pk=pk, project_id=project_id, status=status,
+                         completed_at=now if status == 'DONE' else None, updated_at=now),
+                    'updated', ['status', 'completed_at', 'updated_at']
+                )
+
+            from .dashboard import invalidate_dashboards
+            assignees = TaskAssignment.objects.filter(task_id__in=task_ids).values_list('user_id', flat=True)
+            invalidate_dashboards(user_ids=assignees)
+            for project_id in {project_id for task_id, project_id, old_status in changed}:
+                invalidate_dashboards(project_id=project_id)
+        return updated
+
 class Task(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -216,8 +484,19 @@ class Task(models.Model):
     # Kanban position
     position = models.PositiveIntegerField(default=0)
 
+    objects = TaskQuerySet.as_manager()
+
+    # The user making the change being saved, if known; they are not notified of
+    # it. serializer.save(actor=user) sets it like any other attribute
+    actor = None
+
     class Meta:
         ordering = ['position', '-created_at']
+        indexes = [
+            # Keyset pagination order, globally and within a project
+            models.Index(fields=['position', '-created_at', '-id'], name='task_position_keyset_idx'),
+            models.Index(fields=['project', 'position', '-created_at', '-id'], name='task_project_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.project.name}"
@@ -228,7 +507,30 @@ class Task(models.Model):
             self.completed_at = timezone.now()
         elif self.status != 'DONE' and self.completed_at:
             self.completed_at = None
-        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'status', 'project', 'project_id'} & set(update_fields):
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            # Count from the locked row, not from this instance: a concurrent save may have
+            # changed the status since it was loaded, as in TaskQuerySet.update_status
+            counted_as = None
+            if not self._state.adding:
+                counted_as = Task.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'project_id', 'status'
+                ).first()
+            super().save(*args, **kwargs)
+            current = (self.project_id, self.status)
+            if counted_as != current:
+                rows = [(self.project_id, self.status, 1)]
+                if counted_as is not None:
+                    rows.append((*counted_as, -1))
+                ProjectTaskCounters.apply_deltas(ProjectTaskCounters.task_deltas(rows))
+            if self.status == 'DONE' and counted_as is not None and counted_as[1] != 'DONE':
+                from .notifications import notify
+                notify('TASK_COMPLETED', task=self, actor=self.actor)
 
     @property
     def is_overdue(self):
@@ -281,7 +583,22 @@ class ActivityLog(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     action = models.CharField(max_length=100)
     description = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    
+    CATEGORY_CHOICES = [
+        ('AUTH', 'Authentication'),
+        ('PROJECT', 'Project'),
+        ('TASK', 'Task'),
+        ('SYSTEM', 'System'),
+    ]
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='SYSTEM')
+    SEVERITY_CHOICES = [
+        ('INFO', 'Info'),
+        ('WARNING', 'Warning'),
+        ('ERROR', 'Error'),
+    ]
+    severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES, default='INFO')
+    # Set when the action happens, which for buffered entries is before the row is written
+    created_at = models.DateTimeField(default=timezone.now)
     
     # Optional references to objects
     project = models.ForeignKey(Project, on_delete=models.CASCADE, blank=True, null=True)
@@ -292,6 +609,14 @@ class ActivityLog(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # On PostgreSQL the table is range-partitioned by month on created_at (migration 0011)
+        indexes = [
+            models.Index(fields=['category', 'created_at'], name='activity_category_time_idx'),
+            # Dashboard "system issues": recent ERROR entries
+            models.Index(fields=['severity', 'created_at'], name='activity_severity_time_idx'),
+            # Admin date filters and retention
+            models.Index(fields=['created_at'], name='activity_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.full_name} - {self.action}"
@@ -323,6 +648,12 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's inbox
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_keyset_idx'),
+            # Unread badge: only unread rows are indexed, so read history costs nothing
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.full_name}"
@@ -339,4 +670,102 @@ class PasswordResetCode(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"Reset code for {self.user.email}"
\ No newline at end of file
+        return f"Reset code for {self.user.email}"
+
+class RequestProfile(models.Model):
+    """cProfile dump and SQL of one API request profiled on a staff user's demand"""
+    user = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, blank=True, null=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    route = models.CharField(max_length=100, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    queries = models.JSONField(default=list)
+    # pstats dump, relative to PROFILING_DIR
+    stats_file = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    @property
+    def stats_path(self):
+        return os.path.join(settings.PROFILING_DIR, self.stats_file)
+
+    def stats_summary(self, limit=40):
+        """The most expensive functions by cumulative time, as pstats prints them"""
+        output = io.StringIO()
+        try:
+            stats = pstats.Stats(self.stats_path, stream=output)
+        except OSError:
+            return 'Profile file is missing'
+        stats.sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+class SearchEntry(models.Model):
+    """
+    Searchable text of a task, project or comment, kept in step on save.
+
+    The full-text index itself is database specific and created by migration
+    0012: a generated, GIN-indexed tsvector column on PostgreSQL and an FTS5
+    table maintained by triggers on SQLite. See tasks.search.
+    """
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('project', 'Project'),
+        ('comment', 'Comment'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    # Visibility: projects by project access, tasks and comments through their task
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, blank=True, null=True, related_name='+')
+    title = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_object_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+class OutboundEmail(models.Model):
+    """
+    Outbox of emails, sent in batches by the send_outbound_email worker so
+    requests never wait on SMTP. See tasks.outbox.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('DEAD', 'Dead letter'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    # When a pending email is next due; pushed forward while a worker holds it and after failures
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue: only pending emails, by due time
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(status='PENDING'), name='outbound_email_due_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
+
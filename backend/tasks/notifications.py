@@ -0,0 +1,183 @@
+import atexit
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Notification, Project, Task, TaskAssignment
+from .realtime import publish_notification
+
+logger = logging.getLogger('tasks.notifications')
+
+# user_ids are the recipients when known up front; otherwise they are resolved from the task
+NotificationEvent = namedtuple(
+    'NotificationEvent', ['notification_type', 'task_id', 'project_id', 'actor_id', 'user_ids']
+)
+
+MESSAGES = {
+    'TASK_ASSIGNED': ('Task assigned', 'You were assigned to "{task}"'),
+    'TASK_COMPLETED': ('Task completed', '"{task}" was completed'),
+    'COMMENT_ADDED': ('New comment', 'New comment on "{task}"'),
+    'PROJECT_ASSIGNED': ('Project assigned', 'You were added to the project "{project}"'),
+}
+
+
+def task_followers(task_ids):
+    """Assignees, creator and project client of each of the tasks, in one query"""
+    tasks = Task.objects.filter(pk__in=task_ids).order_by()
+    assignees = TaskAssignment.objects.filter(task_id__in=task_ids).order_by()
+    rows = assignees.values_list('task_id', 'user_id').union(
+        tasks.values_list('pk', 'created_by_id'),
+        tasks.values_list('pk', 'project__client_id'),
+    )
+    followers = {task_id: set() for task_id in task_ids}
+    for task_id, user_id in rows:
+        if user_id is not None:
+            followers[task_id].add(user_id)
+    return followers
+
+
+def recipients(events):
+    """
+    Recipients of each distinct event, without its actor. Events differing
+    only in how their recipients are given, explicitly or as the task's
+    followers, are one event for the union of both.
+    """
+    followers = task_followers(
+        {event.task_id for event in events if event.user_ids is None and event.task_id is not None}
+    )
+    merged = {}
+    for event in events:
+        if event.user_ids is not None:
+            user_ids = set(event.user_ids)
+        else:
+            user_ids = set(followers.get(event.task_id, ()))
+        user_ids.discard(event.actor_id)
+        merged.setdefault(event[:4], (event, set()))[1].update(user_ids)
+    return merged.values()
+
+
+def dispatch(events):
+    """Write the notifications of a batch of events with one bulk_create"""
+    tasks = Task.objects.only('id', 'title', 'project_id').in_bulk(
+        {event.task_id for event in events} - {None}
+    )
+    projects = Project.objects.only('id', 'name').in_bulk(
+        ({event.project_id for event in events} | {task.project_id for task in tasks.values()}) - {None}
+    )
+    rows = []
+    for event, user_ids in recipients(events):
+        task = tasks.get(event.task_id)
+        if event.task_id is not None and task is None:
+            continue  # deleted in the meantime
+        project = projects.get(event.project_id or (task and task.project_id))
+        if project is None:
+            continue
+        title, message = MESSAGES[event.notification_type]
+        message = message.format(task=task.title if task else '', project=project.name)
+        rows += [
+            Notification(
+                user_id=user_id, title=title, message=message,
+                notification_type=event.notification_type, task=task, project=project,
+            )
+            for user_id in sorted(user_ids)
+        ]
+    created = Notification.objects.bulk_create(rows)
+    # bulk_create skips the post_save signal that pushes new notifications
+    for notification in created:
+        publish_notification(notification)
+    return created
+
+
+class NotificationDispatcher:
+    """
+    Collects notification events and writes them from a background thread.
+
+    Events wait NOTIFICATION_COALESCE_SECONDS before they are written, and
+    duplicates within that window collapse into one: the same event for the
+    same task or project by the same user is written once, with the union of
+    its recipients, explicit or the task's followers. At 0 the events of each
+    commit are written inline.
+    Events still pending when the process exits are written by an atexit hook.
+    """
+
+    def __init__(self, delay=None):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.wakeup = threading.Event()
+        self.worker = None
+
+    def get_delay(self):
+        if self.delay is not None:
+            return self.delay
+        return getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 2.0)
+
+    def add(self, event):
+        """
+        Queue an event, merging it into a pending duplicate. Explicit
+        recipients merge here; an event for the task's followers stays
+        separate until dispatch resolves the followers.
+        """
+        key = (*event[:4], event.user_ids is None)
+        with self.lock:
+            queued = self.pending.get(key)
+            if queued is not None and event.user_ids is not None:
+                event = event._replace(user_ids=queued.user_ids | event.user_ids)
+            self.pending[key] = event
+
+    def enqueue(self, event):
+        self.add(event)
+        if self.get_delay() <= 0:
+            self.drain()
+            return
+        self.start()
+        self.wakeup.set()
+
+    def start(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, name='notification-dispatcher', daemon=True)
+                self.worker.start()
+                atexit.register(self.drain)
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            time.sleep(self.get_delay())
+            self.wakeup.clear()
+            try:
+                self.drain()
+            except Exception:
+                logger.exception('Writing notifications failed')
+            finally:
+                close_old_connections()
+
+    def drain(self):
+        with self.lock:
+            events, self.pending = list(self.pending.values()), {}
+        return dispatch(events) if events else []
+
+
+dispatcher = NotificationDispatcher()
+
+
+def notify(notification_type, task=None, project=None, users=None, actor=None):
+    """
+    Queue a notification once the current transaction commits. `users` are
+    the recipients; without them a task event goes to the task's assignees,
+    creator and client. The actor never notifies themselves.
+    """
+    if project is None:
+        project = getattr(task, 'project_id', None)
+    event = NotificationEvent(
+        notification_type,
+        getattr(task, 'pk', task),
+        getattr(project, 'pk', project),
+        getattr(actor, 'pk', actor),
+        frozenset(getattr(user, 'pk', user) for user in users) if users is not None else None,
+    )
+    transaction.on_commit(lambda: dispatcher.enqueue(event))
@@ -0,0 +1,130 @@
+"""
+Transactional email outbox.
+
+Requests only insert an OutboundEmail row, in the same transaction as the
+data the email is about. The send_outbound_email worker claims due emails a
+batch at a time and sends them over one SMTP connection. A failed email is
+retried with exponential backoff and, after OUTBOX_MAX_ATTEMPTS attempts,
+dead-lettered: it stays in the table with status DEAD and its last error.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import OUTBOUND_EMAILS
+from .models import OutboundEmail
+
+logger = logging.getLogger('tasks.outbox')
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """Queue an email for the worker; it is only sent if the current transaction commits"""
+    return OutboundEmail.objects.create(
+        subject=subject, body=body, recipients=list(recipients),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def retry_delay(attempts):
+    """Backoff after the `attempts`-th failure: base, 2 x base, 4 x base, ... up to the maximum"""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+    maximum = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), maximum))
+
+
+def claim_batch(batch_size):
+    """
+    Take up to `batch_size` due emails for this worker. Claimed rows stay
+    PENDING with next_attempt_at pushed OUTBOX_LEASE_SECONDS ahead, so other
+    workers skip them and the emails of a worker that dies are picked up
+    again once the lease runs out.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + lease
+            )
+    return emails
+
+
+def send_batch(emails):
+    """Send claimed emails over one connection; returns (sent, failed) as lists of (email, error)"""
+    sent, failed = [], []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        return [], [(email, error) for email in emails]
+    try:
+        for index, email in enumerate(emails):
+            message = EmailMessage(
+                email.subject, email.body, email.from_email or None, email.recipients, connection=connection
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                failed.append((email, error))
+                # The server may have dropped the connection; start the rest on a fresh one
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as error:
+                    failed += [(rest, error) for rest in emails[index + 1:]]
+                    break
+            else:
+                sent.append(email)
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def record_results(sent, failed):
+    now = timezone.now()
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    if sent:
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in sent]).update(
+            status='SENT', sent_at=now, attempts=F('attempts') + 1, last_error=''
+        )
+        OUTBOUND_EMAILS.inc(len(sent), outcome='sent')
+    for email, error in failed:
+        email.attempts += 1
+        email.last_error = f'{type(error).__name__}: {error}'
+        if email.attempts >= max_attempts:
+            email.status = 'DEAD'
+            logger.error('Email %s dead-lettered after %s attempts: %s', email.pk, email.attempts, email.last_error)
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+            logger.warning('Email %s failed (attempt %s): %s', email.pk, email.attempts, email.last_error)
+        OUTBOUND_EMAILS.inc(outcome='dead' if email.status == 'DEAD' else 'retried')
+    OutboundEmail.objects.bulk_update(
+        [email for email, _ in failed], ['attempts', 'last_error', 'status', 'next_attempt_at']
+    )
+
+
+def deliver_outbox(batch_size=None):
+    """Claim, send and record one batch; returns the number of emails attempted"""
+    emails = claim_batch(batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50))
+    if emails:
+        record_results(*send_batch(emails))
+    return len(emails)
+
+
+def requeue_dead(queryset=None):
+    """Give dead-lettered emails (of `queryset`, or all of them) a fresh set of attempts"""
+    if queryset is None:
+        queryset = OutboundEmail.objects.all()
+    return queryset.filter(status='DEAD').update(
+        status='PENDING', attempts=0, next_attempt_at=timezone.now()
+    )
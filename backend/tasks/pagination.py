@@ -0,0 +1,140 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """Rows strictly after `values` in `ordering` (before, when `reverse`)"""
+    condition = Q()
+    equal = {}
+    for name, value in zip(ordering, values):
+        descending = name.startswith('-') != reverse
+        field = name.lstrip('-')
+        condition |= Q(**equal, **{f'{field}__{"lt" if descending else "gt"}': value})
+        equal[field] = value
+    # Redundant bound on the leading column lets the planner range-scan the index
+    first = ordering[0]
+    lead = {f'{first.lstrip("-")}__{"lte" if first.startswith("-") != reverse else "gte"}': values[0]}
+    return Q(**lead) & condition
+
+
+def reverse_ordering(ordering):
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination over the full ordering of a view.
+
+    The cursor stores the ordering values of the last row served, so each page
+    is an index range scan: no COUNT(*) and no OFFSET, and page N costs the same
+    as page 1. The primary key is appended to the ordering as a tie-breaker.
+    Ordering fields must be non-nullable.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        ordering = list(getattr(view, 'keyset_ordering', ['-pk']))
+        if ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ordering.append('-pk' if ordering[-1].startswith('-') else 'pk')
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values = [field.to_python(value) for field, value in zip(fields, payload['v'], strict=True)]
+            return values, bool(payload['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        model_meta = queryset.model._meta
+        self.fields = [
+            model_meta.pk if name.lstrip('-') == 'pk' else model_meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request, self.fields)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = reverse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, values, reverse))
+
+        # One extra row tells us whether there is another page in this direction
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        return rows
+
+    def cursor_for(self, obj, reverse):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return self.encode_cursor(values, reverse)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if not self.page:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.cursor_for(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if not self.page:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.cursor_for(self.page[0], True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
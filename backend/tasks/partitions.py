@@ -0,0 +1,137 @@
+"""
+Monthly range partitions of the ActivityLog table on PostgreSQL.
+
+Each month lives in its own partition named tasks_activitylog_pYYYYMM, with a
+DEFAULT partition catching anything outside the months created so far; its
+rows move into a month's partition once that is created. Old
+months are removed by detaching or dropping their partition, which takes
+constant time however many rows it holds.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+
+TABLE = 'tasks_activitylog'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def partition_month(name):
+    """First day of the month a partition holds, or None for other tables"""
+    match = PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s',
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    """(name, month) of every monthly partition, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s',
+            [TABLE]
+        )
+        names = [name for name, in cursor.fetchall()]
+    return sorted(
+        (name, partition_month(name)) for name in names if partition_month(name) is not None
+    )
+
+
+def create_partitions(connection, first, last):
+    """
+    Create the missing monthly partitions from month `first` through month
+    `last`. PostgreSQL refuses a partition for rows the DEFAULT partition
+    already holds, so a month the default caught rows of is created with
+    the default detached, and those rows move into the new partition.
+    """
+    existing = {name for name, _ in partitions(connection)}
+    created = []
+    month = month_start(first)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [DEFAULT_PARTITION])
+        has_default, = cursor.fetchone()
+        while month <= last:
+            name = partition_name(month)
+            if name not in existing:
+                bounds = [month, add_months(month, 1)]
+                caught = False
+                if has_default:
+                    cursor.execute(
+                        f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} '
+                        f'WHERE created_at >= %s AND created_at < %s)',
+                        bounds
+                    )
+                    caught, = cursor.fetchone()
+                if caught:
+                    create_partition_from_default(connection, name, bounds)
+                else:
+                    cursor.execute(
+                        f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', bounds
+                    )
+                created.append(name)
+            month = add_months(month, 1)
+    return created
+
+
+def create_partition_from_default(connection, name, bounds):
+    """
+    Create partition `name` for `bounds` and move the default partition's
+    rows in that range into it. Detaching locks the table, so writes to the
+    ActivityLog wait until the default is attached again.
+    """
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}')
+        cursor.execute(f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', bounds)
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+            f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved',
+            bounds
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+
+
+def remove_partitions_before(connection, cutoff, detach=False):
+    """
+    Detach and drop (or, with `detach`, only detach) every monthly partition
+    that ends on or before `cutoff`. Returns the names of those partitions.
+    """
+    removed = []
+    with connection.cursor() as cursor:
+        for name, month in partitions(connection):
+            if add_months(month, 1) > cutoff:
+                break
+            cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+            if not detach:
+                cursor.execute(f'DROP TABLE {name}')
+            removed.append(name)
+    return removed
+
@@ -0,0 +1,40 @@
+import os
+import uuid
+
+from django.conf import settings
+
+from .models import RequestProfile
+
+
+def save_profile(profiler, request, response, user, timings, duration):
+    """Write the profiler's stats to PROFILING_DIR and record the request beside them"""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    stats_file = f'{uuid.uuid4().hex}.prof'
+    profiler.dump_stats(os.path.join(directory, stats_file))
+
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile.objects.create(
+        user=user,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        route=(match.url_name or '') if match else '',
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=len(timings.queries),
+        queries=[
+            {'db': alias, 'sql': sql, 'ms': round(seconds * 1000, 2)}
+            for alias, sql, seconds in timings.queries
+        ],
+        stats_file=stats_file,
+    )
+    prune_profiles()
+    return profile
+
+
+def prune_profiles():
+    """Keep only the newest PROFILING_MAX_PROFILES profiles; their files go with them"""
+    keep = getattr(settings, 'PROFILING_MAX_PROFILES', 50)
+    stale = RequestProfile.objects.order_by('-created_at', '-id').values_list('id', flat=True)[keep:]
+    # The post_delete signal removes each stats file
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .access import visible_projects
+
+logger = logging.getLogger('tasks.realtime')
+
+WEBSOCKET_PATH = '/ws/'
+TASK_DELTA_FIELDS = [
+    'title', 'status', 'priority', 'position', 'due_date', 'completed_at', 'updated_at'
+]
+NOTIFICATION_DELTA_FIELDS = [
+    'title', 'message', 'notification_type', 'is_read', 'created_at', 'project_id', 'task_id'
+]
+
+# Close codes in the 4000-4999 range reserved for applications
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+
+def project_group(project_id):
+    return f'project.{project_id}'
+
+
+def user_group(user_id):
+    return f'user.{user_id}'
+
+
+class InMemoryChannelLayer:
+    """
+    Groups of subscriber callbacks inside one process. Enough for a single
+    ASGI server process and for tests; several processes or hosts need a
+    layer that fans out between them, like PostgresChannelLayer.
+
+    A layer implements subscribe, unsubscribe and publish. Callbacks may be
+    called from any thread and must not block.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.groups = defaultdict(set)
+
+    def subscribe(self, group, callback):
+        with self.lock:
+            self.groups[group].add(callback)
+
+    def unsubscribe(self, group, callback):
+        with self.lock:
+            callbacks = self.groups.get(group)
+            if callbacks is not None:
+                callbacks.discard(callback)
+                if not callbacks:
+                    del self.groups[group]
+
+    def publish(self, group, message):
+        self.deliver(group, message)
+
+    def deliver(self, group, message):
+        with self.lock:
+            callbacks = list(self.groups.get(group, ()))
+        for callback in callbacks:
+            callback(message)
+
+
+class PostgresChannelLayer(InMemoryChannelLayer):
+    """
+    Fan messages out to every process with PostgreSQL LISTEN/NOTIFY, so
+    several workers and hosts need nothing but the database they share.
+
+    publish() sends a NOTIFY; each process LISTENs on a connection of its own
+    from a daemon thread and delivers to its local subscribers. Payloads are
+    limited to 8000 bytes, which the small deltas stay well under.
+    """
+    channel = 'tasks_realtime'
+    poll_timeout = 5
+
+    def __init__(self, alias='default'):
+        super().__init__()
+        self.alias = alias
+        self.listener = None
+
+    def subscribe(self, group, callback):
+        super().subscribe(group, callback)
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name='realtime-listener', daemon=True)
+                self.listener.start()
+
+    def publish(self, group, message):
+        payload = json.dumps({'group': group, 'message': message}, cls=DjangoJSONEncoder)
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def listen(self):
+        while True:
+            try:
+                self.receive_notifications()
+            except Exception:
+                logger.exception('Realtime listener lost its connection, reconnecting')
+                time.sleep(1)
+
+    def receive_notifications(self):
+        database = connections[self.alias]
+        connection = database.get_new_connection(database.get_connection_params())
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.channel}')
+            for payload in self.notifications(connection):
+                data = json.loads(payload)
+                self.deliver(data['group'], data['message'])
+        finally:
+            connection.close()
+
+    def notifications(self, connection):
+        if callable(getattr(connection, 'notifies', None)):
+            # psycopg 3
+            for notify in connection.notifies():
+                yield notify.payload
+            return
+        # psycopg2
+        while True:
+            select.select([connection], [], [], self.poll_timeout)
+            connection.poll()
+            while connection.notifies:
+                yield connection.notifies.pop(0).payload
+
+
+_channel_layer = None
+_channel_layer_lock = threading.Lock()
+
+
+def get_channel_layer():
+    """The process-wide layer named by REALTIME_CHANNEL_LAYER"""
+    global _channel_layer
+    with _channel_layer_lock:
+        if _channel_layer is None:
+            path = getattr(settings, 'REALTIME_CHANNEL_LAYER', 'tasks.realtime.InMemoryChannelLayer')
+            _channel_layer = import_string(path)()
+        return _channel_layer
+
+
+def publish(group, message):
+    """Send `message` to a group once the current transaction commits"""
+    transaction.on_commit(lambda: get_channel_layer().publish(group, message))
+
+
+def task_delta(task, fields=TASK_DELTA_FIELDS):
+    return {'id': task.pk, **{field: getattr(task, field) for field in fields}}
+
+
+def publish_task(task, event, fields=TASK_DELTA_FIELDS):
+    """Tell the task's board that a card was created, updated or deleted"""
+    publish(project_group(task.project_id), {
+        'type': f'task.{event}',
+        'project': task.project_id,
+        'task': task_delta(task, fields),
+    })
+
+
+def publish_notification(notification):
+    publish(user_group(notification.user_id), {
+        'type': 'notification.created',
+        'notification': {
+            'id': notification.pk,
+            **{field: getattr(notification, field) for field in NOTIFICATION_DELTA_FIELDS},
+        },
+    })
+
+
+def authenticate(scope):
+    """
+    User of the access token in the query string, as browsers can't set
+    headers on a WebSocket, and the token's expiry as a timestamp; (None, None)
+    without a valid token
+    """
+    query = parse_qs(scope.get('query_string', b'').decode())
+    raw_token = (query.get('token') or [None])[0]
+    if not raw_token:
+        return None, None
+    authentication = JWTAuthentication()
+    try:
+        token = authentication.get_validated_token(raw_token)
+        return authentication.get_user(token), token['exp']
+    except AuthenticationFailed:
+        return None, None
+
+
+def can_view_project(user, project_id):
+    return visible_projects(user).filter(pk=project_id).exists()
+
+
+class Subscriber:
+    """
+    One WebSocket connection: its notification stream plus the boards it
+    subscribed to. Access is checked when subscribing, and again before
+    task deltas are sent once the last check is `access_ttl` seconds old; a
+    board the user can no longer see is dropped with an ``unsubscribed``
+    message. The connection is closed once its access token expires.
+
+    Messages are queued on the connection's event loop. A client that falls
+    more than `max_queued` messages behind gets a single ``resync`` message
+    instead, telling it to reload with a (conditional) GET.
+    """
+    max_queued = 1000
+    access_ttl = 5.0
+
+    def __init__(self, user, layer, expires_at=None):
+        self.user = user
+        self.layer = layer
+        self.expires_at = expires_at
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.groups = set()
+        # Project id -> time.monotonic() of the last successful access check
+        self.access_checked = {}
+
+    def deliver(self, message):
+        # Called by the layer, possibly from another thread
+        self.loop.call_soon_threadsafe(self.enqueue, message)
+
+    def enqueue(self, message):
+        if self.queue.qsize() >= self.max_queued:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = {'type': 'resync'}
+        self.queue.put_nowait(message)
+
+    def join(self, group):
+        if group not in self.groups:
+            self.groups.add(group)
+            self.layer.subscribe(group, self.deliver)
+
+    def leave(self, group):
+        if group in self.groups:
+            self.groups.discard(group)
+            self.layer.unsubscribe(group, self.deliver)
+
+    async def can_view(self, project_id):
+        checked = self.access_checked.get(project_id)
+        if checked is not None and time.monotonic() - checked < self.access_ttl:
+            return True
+        if not await sync_to_async(can_view_project)(self.user, project_id):
+            self.access_checked.pop(project_id, None)
+            return False
+        self.access_checked[project_id] = time.monotonic()
+        return True
+
+    async def run(self, receive, send):
+        self.join(user_group(self.user.pk))
+        sender = asyncio.ensure_future(self.forward(send))
+        try:
+            while True:
+                event = await receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    await self.handle(event.get('text'))
+        finally:
+            sender.cancel()
+            for group in list(self.groups):
+                self.leave(group)
+
+    async def forward(self, send):
+        while True:
+            message = await self.queue.get()
+            if self.expires_at is not None and time.time() >= self.expires_at:
+                await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+                return
+            if message['type'].startswith('task.') and project_group(message['project']) in self.groups:
+                if not await self.can_view(message['project']):
+                    self.leave(project_group(message['project']))
+                    message = {'type': 'unsubscribed', 'project': message['project']}
+            elif message['type'].startswith('task.'):
+                continue  # queued before the board was left
+            await send({'type': 'websocket.send', 'text': json.dumps(message, cls=DjangoJSONEncoder)})
+
+    async def handle(self, text):
+        try:
+            data = json.loads(text or '')
+            action, project_id = data['action'], int(data['project'])
+        except (ValueError, TypeError, KeyError):
+            self.enqueue({'type': 'error', 'error': 'Expected {"action": ..., "project": <id>}'})
+            return
+
+        if action == 'subscribe':
+            if not await self.can_view(project_id):
+                self.enqueue({'type': 'error', 'error': 'Project not found', 'project': project_id})
+                return
+            self.join(project_group(project_id))
+            self.enqueue({'type': 'subscribed', 'project': project_id})
+        elif action == 'unsubscribe':
+            self.leave(project_group(project_id))
+            self.access_checked.pop(project_id, None)
+            self.enqueue({'type': 'unsubscribed', 'project': project_id})
+        else:
+            self.enqueue({'type': 'error', 'error': f'Unknown action {action!r}'})
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI application for WebSocket connections to /ws/?token=<access token>.
+
+    The connection receives the user's new notifications straight away.
+    Boards are added with {"action": "subscribe", "project": <id>} and
+    dropped with "unsubscribe"; they then receive task.created,
+    task.updated (with only the changed fields when known) and
+    task.deleted deltas.
+    """
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    user, expires_at = await sync_to_async(authenticate)(scope)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+    await send({'type': 'websocket.accept'})
+    await Subscriber(user, get_channel_layer(), expires_at).run(receive, send)
@@ -0,0 +1,199 @@
+"""
+Full-text search over tasks, projects and comments.
+
+Every searchable object has a SearchEntry row holding its text, upserted when
+the object is saved. The index over those rows depends on the database:
+
+* PostgreSQL: a generated tsvector column, title weighted above body, with a
+  GIN index, ranked with ts_rank_cd and highlighted with ts_headline.
+* SQLite: an FTS5 table over the entries, kept in step by triggers, ranked
+  with bm25 and highlighted with highlight() and snippet().
+
+Both are created by migration 0012, and migration 0015 sets the FTS5 rank to
+bm25 with the title weighted above the body. SQLite rebuilds a table to alter
+it, which drops its triggers, so a later migration changing SearchEntry must
+create them again; rebuild_search_index repopulates the entries.
+"""
+import re
+from html import escape
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .access import visible_projects, visible_tasks
+from .models import SearchEntry
+
+TABLE = 'tasks_searchentry'
+FTS_TABLE = f'{TABLE}_fts'
+# Fields whose change has to reach the index, per model
+TASK_FIELDS = {'title', 'description', 'project', 'project_id'}
+PROJECT_FIELDS = {'name', 'description'}
+COMMENT_FIELDS = {'content'}
+ENTRY_FIELDS = ['project', 'task', 'title', 'body', 'updated_at']
+
+# Marks around matched terms, turned into <mark> once the text is escaped
+START, STOP = '⟦', '⟧'
+HIGHLIGHTED = re.compile(f'{START}(.*?){STOP}', re.S)
+SNIPPET_WORDS = 24
+
+def task_entry(task):
+    return SearchEntry(
+        kind='task', object_id=task.pk, project_id=task.project_id, task_id=task.pk,
+        title=task.title, body=task.description
+    )
+
+
+def project_entry(project):
+    return SearchEntry(
+        kind='project', object_id=project.pk, project_id=project.pk,
+        title=project.name, body=project.description
+    )
+
+
+def comment_entry(comment):
+    return SearchEntry(
+        kind='comment', object_id=comment.pk, project_id=comment.task.project_id,
+        task_id=comment.task_id, body=comment.content
+    )
+
+
+def index_entries(entries, batch_size=1000):
+    """Insert or refresh entries in one upsert per batch"""
+    return SearchEntry.objects.bulk_create(
+        entries, batch_size=batch_size, update_conflicts=True,
+        unique_fields=['kind', 'object_id'], update_fields=ENTRY_FIELDS,
+    )
+
+
+def index_tasks(tasks):
+    return index_entries([task_entry(task) for task in tasks])
+
+
+def index_projects(projects):
+    return index_entries([project_entry(project) for project in projects])
+
+
+def index_comments(comments):
+    return index_entries([comment_entry(comment) for comment in comments])
+
+
+def needs_reindex(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query)
+
+
+class PostgresSearch:
+    config = 'english'
+    # Weights of D, C, B and A labelled lexemes: title matches count most
+    weights = '{0.1, 0.2, 0.4, 1.0}'
+    headline_options = (
+        f'StartSel={START}, StopSel={STOP}, MaxFragments=2, MaxWords={SNIPPET_WORDS}, '
+        f'MinWords=8, FragmentDelimiter=" … "'
+    )
+
+    def match(self, queryset, query):
+        tsquery = f"websearch_to_tsquery('{self.config}', %s)"
+        return queryset.filter(
+            RawSQL(f'{TABLE}.document @@ {tsquery}', [query], output_field=BooleanField())
+        ).annotate(rank=RawSQL(
+            f"ts_rank_cd('{self.weights}', {TABLE}.document, {tsquery})", [query],
+            output_field=FloatField()
+        ))
+
+    def highlights(self, ids, query):
+        tsquery = f"websearch_to_tsquery('{self.config}', %s)"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, ts_headline('{self.config}', title, {tsquery}, %s), "
+                f"ts_headline('{self.config}', body, {tsquery}, %s) FROM {TABLE} WHERE id = ANY(%s)",
+                [query, f'HighlightAll=true, StartSel={START}, StopSel={STOP}',
+                 query, self.headline_options, list(ids)]
+            )
+            return {pk: (title, body) for pk, title, body in cursor.fetchall()}
+
+
+class SqliteSearch:
+    def fts_query(self, query):
+        # Each word as a quoted prefix term, so FTS5 operators in the input are plain text
+        return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+    def match(self, queryset, query):
+        # Joined once, so MATCH runs once; the rank column is bm25, lower is better
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {TABLE}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[self.fts_query(query)],
+            select={'rank': f'-{FTS_TABLE}.rank'},
+        )
+
+    def highlights(self, ids, query):
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, highlight({FTS_TABLE}, 0, %s, %s), '
+                f"snippet({FTS_TABLE}, 1, %s, %s, '…', {SNIPPET_WORDS}) FROM {FTS_TABLE} "
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})',
+                [START, STOP, START, STOP, self.fts_query(query), *ids]
+            )
+            return {pk: (title, body) for pk, title, body in cursor.fetchall()}
+
+
+BACKENDS = {'postgresql': PostgresSearch, 'sqlite': SqliteSearch}
+
+
+def get_backend():
+    return BACKENDS[connection.vendor]()
+
+
+def visible_entries(user):
+    """Projects the user sees, plus tasks they see and the comments on them"""
+    if user.role == 'ADMIN':
+        return SearchEntry.objects.all()
+    return SearchEntry.objects.filter(
+        Q(kind='project', project__in=visible_projects(user).values('pk'))
+        | Q(task__in=visible_tasks(user).values('pk'))
+    )
+
+
+def render_highlight(text):
+    """Escape text for HTML, wrapping the matched terms in <mark>"""
+    parts = HIGHLIGHTED.split(text or '')
+    return ''.join(
+        f'<mark>{escape(part)}</mark>' if index % 2 else escape(part.replace(START, '').replace(STOP, ''))
+        for index, part in enumerate(parts)
+    )
+
+
+def search(user, query, kind=None, offset=0, limit=20):
+    """
+    Entries visible to `user` matching `query`, best first, as result dicts
+    with highlighted title and snippet. Fetches `limit` results from `offset`.
+    """
+    if not search_terms(query):
+        return []
+    backend = get_backend()
+    entries = visible_entries(user)
+    if kind is not None:
+        entries = entries.filter(kind=kind)
+    page = list(
+        backend.match(entries, query)
+        .order_by('-rank', '-updated_at', '-id')
+        .values('id', 'kind', 'object_id', 'project_id', 'task_id', 'rank')[offset:offset + limit]
+    )
+    highlights = backend.highlights([entry['id'] for entry in page], query) if page else {}
+    return [
+        {
+            'type': entry['kind'],
+            'id': entry['object_id'],
+            'project': entry['project_id'],
+            'task': entry['task_id'],
+            'title': render_highlight(highlights.get(entry['id'], ('', ''))[0]),
+            'snippet': render_highlight(highlights.get(entry['id'], ('', ''))[1]),
+            'rank': entry['rank'],
+        }
+        for entry in page
+    ]
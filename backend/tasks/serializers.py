@@ -4,6 +4,13 @@ from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 from datetime import timedelta
 from django.conf import settings
+from django.db.models import Prefetch
+
+from .middleware import TimedSerializerMixin
+from .models import (
+    Project, ProjectAssignment, Task, TaskAssignment, 
+    TaskComment, ActivityLog, Notification
+)
 
 User = get_user_model()
 
@@ -56,7 +63,7 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
         return token
 
 # User Serializers
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     project_count = serializers.ReadOnlyField()
     
@@ -69,7 +76,7 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['date_joined', 'last_login']
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     
     class Meta:
@@ -83,7 +90,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class AvailableUserSerializer(serializers.ModelSerializer):
+class AvailableUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for users available for assignment"""
     full_name = serializers.ReadOnlyField()
     project_count = serializers.ReadOnlyField()
@@ -92,32 +99,86 @@ class AvailableUserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'role', 'project_count']
 
-# Simple serializers to avoid circular imports
-class SimpleUserSerializer(serializers.ModelSerializer):
+# Simple serializers for nested representations
+class SimpleUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     
     class Meta:
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'role']
 
-class SimpleProjectSerializer(serializers.ModelSerializer):
+class SimpleProjectSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
-        model = 'tasks.Project'
+        model = Project
         fields = ['id', 'name', 'status', 'priority']
 
-class SimpleTaskSerializer(serializers.ModelSerializer):
+class SimpleTaskSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
-        model = 'tasks.Task'
+        model = Task
         fields = ['id', 'title', 'status', 'priority']
 
-# Import models after defining simple serializers
-from .models import (
-    Project, ProjectAssignment, Task, TaskAssignment, 
-    TaskComment, ActivityLog, Notification
-)
+# Sparse fieldsets
+class SparseFieldsetMixin:
+    """
+    ``?fields=a,b`` limits the output to those fields (plus ``id``); relations named
+    there render as primary keys unless also listed in ``?expand=``. Without
+    ``?fields=`` everything is rendered. optimize_queryset() applies the same shape
+    to the queryset so unrequested relations are not loaded.
+    """
+    # field name -> (lookup, prefetch queryset or None, many)
+    expandable_fields = {}
+    # Large columns deferred when not requested
+    deferrable_fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        shape = self.get_sparse_shape(self.context.get('request'))
+        if shape is None:
+            return
+        names, expand = shape
+        for name in list(self.fields):
+            if name not in names:
+                self.fields.pop(name)
+            elif name in self.expandable_fields and name not in expand:
+                lookup, _, many = self.expandable_fields[name]
+                source = {'source': lookup} if lookup != name else {}
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=many, read_only=True, **source
+                )
+
+    @classmethod
+    def get_sparse_shape(cls, request):
+        """(fields, expanded relations) asked for by the request, or None for everything"""
+        if request is None or not request.GET.get('fields'):
+            return None
+        requested = {name.strip() for name in request.GET['fields'].split(',') if name.strip()}
+        expand = {name.strip() for name in request.GET.get('expand', '').split(',')}
+        expand &= set(cls.expandable_fields)
+        return {'id'} | requested | expand, expand
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request=None):
+        """Load exactly the relations and columns the requested representation needs"""
+        declared = set(cls.Meta.fields)
+        shape = cls.get_sparse_shape(request)
+        names, expand = shape if shape else (declared, set(cls.expandable_fields))
+        for name, (lookup, prefetch_queryset, many) in cls.expandable_fields.items():
+            if name not in names or name not in declared:
+                continue
+            if not many:
+                if name in expand:
+                    queryset = queryset.select_related(lookup)
+            elif name in expand:
+                queryset = queryset.prefetch_related(Prefetch(lookup, queryset=prefetch_queryset))
+            else:
+                queryset = queryset.prefetch_related(lookup)
+        deferred = [field for field in cls.deferrable_fields if field not in names]
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        return queryset
 
 # Project Serializers
-class ProjectAssignmentSerializer(serializers.ModelSerializer):
+class ProjectAssignmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = SimpleUserSerializer(read_only=True)
     assigned_by = SimpleUserSerializer(read_only=True)
     
@@ -125,7 +186,7 @@ class ProjectAssignmentSerializer(serializers.ModelSerializer):
         model = ProjectAssignment
         fields = ['id', 'user', 'assigned_by', 'assigned_at', 'role_in_project']
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     created_by = SimpleUserSerializer(read_only=True)
     client = SimpleUserSerializer(read_only=True)
     assigned_users = SimpleUserSerializer(many=True, read_only=True)
@@ -142,8 +203,20 @@ class ProjectSerializer(serializers.ModelSerializer):
             'progress_percentage', 'task_stats'
         ]
         read_only_fields = ['created_at', 'updated_at', 'created_by']
+    
+    expandable_fields = {
+        'created_by': ('created_by', None, False),
+        'client': ('client', None, False),
+        'assigned_users': ('assigned_users', None, True),
+        'assignments': (
+            'projectassignment_set',
+            ProjectAssignment.objects.select_related('user', 'assigned_by'),
+            True
+        ),
+    }
+    deferrable_fields = ['description']
 
-class ProjectCreateSerializer(serializers.ModelSerializer):
+class ProjectCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     assigned_users = serializers.ListField(
         child=serializers.IntegerField(), 
         write_only=True, 
@@ -178,7 +251,7 @@ class ProjectCreateSerializer(serializers.ModelSerializer):
         return project
 
 # Task Serializers
-class TaskAssignmentSerializer(serializers.ModelSerializer):
+class TaskAssignmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = SimpleUserSerializer(read_only=True)
     assigned_by = SimpleUserSerializer(read_only=True)
     
@@ -186,7 +259,7 @@ class TaskAssignmentSerializer(serializers.ModelSerializer):
         model = TaskAssignment
         fields = ['id', 'user', 'assigned_by', 'assigned_at']
 
-class TaskCommentSerializer(serializers.ModelSerializer):
+class TaskCommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = SimpleUserSerializer(read_only=True)
     
     class Meta:
@@ -194,7 +267,7 @@ class TaskCommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'content', 'attachment', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetMixin, TimedSerializerMixin, serializers.ModelSerializer):
     created_by = SimpleUserSerializer(read_only=True)
     assigned_to = SimpleUserSerializer(many=True, read_only=True)
     project = SimpleProjectSerializer(read_only=True)
@@ -212,8 +285,33 @@ class TaskSerializer(serializers.ModelSerializer):
             'created_by', 'assigned_to', 'project', 'assignments', 'comments'
         ]
         read_only_fields = ['created_at', 'updated_at', 'completed_at', 'created_by']
+    
+    expandable_fields = {
+        'created_by': ('created_by', None, False),
+        'project': ('project', None, False),
+        'assigned_to': ('assigned_to', None, True),
+        'assignments': (
+            'taskassignment_set',
+            TaskAssignment.objects.select_related('user', 'assigned_by'),
+            True
+        ),
+        'comments': ('comments', TaskComment.objects.select_related('user'), True),
+    }
+    deferrable_fields = ['description']
 
-class TaskCreateSerializer(serializers.ModelSerializer):
+class KanbanTaskSerializer(TaskSerializer):
+    """Card serializer for the Kanban board: comment count instead of the full thread"""
+    comment_count = serializers.IntegerField(read_only=True)
+    
+    class Meta(TaskSerializer.Meta):
+        fields = [
+            'id', 'title', 'description', 'status', 'priority', 'position',
+            'due_date', 'created_at', 'updated_at', 'completed_at',
+            'estimated_hours', 'actual_hours', 'is_overdue', 'days_until_due',
+            'created_by', 'assigned_to', 'project', 'assignments', 'comment_count'
+        ]
+
+class TaskCreateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     assigned_to = serializers.ListField(
         child=serializers.IntegerField(), 
         write_only=True, 
@@ -246,13 +344,31 @@ class TaskCreateSerializer(serializers.ModelSerializer):
         
         return task
 
-class TaskUpdateSerializer(serializers.ModelSerializer):
+class TaskUpdateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Task
         fields = ['title', 'description', 'status', 'priority', 'due_date', 'estimated_hours', 'actual_hours', 'position']
 
+class TaskMoveSerializer(serializers.Serializer):
+    """Target column of a card move and the neighbours it lands between"""
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
+    after_id = serializers.IntegerField(required=False, allow_null=True)
+    before_id = serializers.IntegerField(required=False, allow_null=True)
+
 # Notification Serializers
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSelectionSerializer(serializers.Serializer):
+    """Which of the user's notifications a bulk action applies to; the criteria combine"""
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    before = serializers.DateTimeField(required=False)
+    notification_type = serializers.ChoiceField(choices=Notification.TYPE_CHOICES, required=False)
+    project = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('Give ids, before, notification_type or project.')
+        return attrs
+
+class NotificationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     project = SimpleProjectSerializer(read_only=True)
     task = SimpleTaskSerializer(read_only=True)
     
@@ -265,7 +381,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 # Activity Log Serializers
-class ActivityLogSerializer(serializers.ModelSerializer):
+class ActivityLogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = SimpleUserSerializer(read_only=True)
     project = SimpleProjectSerializer(read_only=True)
     task = SimpleTaskSerializer(read_only=True)
@@ -0,0 +1,185 @@
+import os
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboards
+from .models import (
+    Notification, Project, ProjectAccess, ProjectAssignment, ProjectTaskCounters, RequestProfile,
+    SearchEntry, Task, TaskAssignment, TaskComment
+)
+from .notifications import notify
+from .realtime import TASK_DELTA_FIELDS, publish_notification, publish_task
+from .search import (
+    COMMENT_FIELDS, PROJECT_FIELDS, TASK_FIELDS, comment_entry, index_entries, needs_reindex,
+    project_entry, task_entry
+)
+
+
+@receiver(post_save, sender=Project)
+def create_task_counters(sender, instance, created, raw=False, **kwargs):
+    """Every project starts with an empty counters row"""
+    if created and not raw:
+        ProjectTaskCounters.objects.get_or_create(project=instance)
+
+
+@receiver(post_save, sender=Project)
+def sync_project_access(sender, instance, created, raw=False, **kwargs):
+    """Creator and client see the project; an edit may have changed either"""
+    if raw:
+        return
+    if created:
+        ProjectAccess.grant([
+            (instance.created_by_id, instance.pk, 'CREATOR'),
+            (instance.client_id, instance.pk, 'CLIENT'),
+        ])
+    else:
+        ProjectAccess.sync_project(instance.pk)
+
+
+@receiver(post_save, sender=ProjectAssignment)
+def grant_assignment_access(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ProjectAccess.grant([(instance.user_id, instance.project_id, 'ASSIGNED')])
+    else:
+        ProjectAccess.sync_project(instance.project_id)
+
+
+@receiver(post_delete, sender=ProjectAssignment)
+def revoke_assignment_access(sender, instance, **kwargs):
+    ProjectAccess.objects.filter(
+        user_id=instance.user_id, project_id=instance.project_id, via='ASSIGNED'
+    ).delete()
+
+
+@receiver(post_delete, sender=Task)
+def decrement_task_counters(sender, instance, **kwargs):
+    """Take deleted tasks, including cascaded ones, out of the project counters"""
+    ProjectTaskCounters.apply_deltas(
+        ProjectTaskCounters.task_deltas([(instance.project_id, instance.status, -1)])
+    )
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_dashboards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboards(
+            user_ids=[instance.created_by_id, instance.client_id], project_id=instance.pk
+        )
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_dashboards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboards(project_id=instance.project_id, task_id=instance.pk)
+
+
+@receiver(post_save, sender=ProjectAssignment)
+@receiver(post_delete, sender=ProjectAssignment)
+@receiver(post_save, sender=TaskAssignment)
+@receiver(post_delete, sender=TaskAssignment)
+def invalidate_assignment_dashboards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboards(user_ids=[instance.user_id])
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_stats(sender, instance, **kwargs):
+    try:
+        os.remove(instance.stats_path)
+    except FileNotFoundError:
+        pass
+
+
+@receiver(post_save, sender=TaskComment)
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_save, sender=TaskAssignment)
+@receiver(post_delete, sender=TaskAssignment)
+def touch_task(sender, instance, raw=False, **kwargs):
+    """Comments and assignees are part of the task, so they move its ETag too"""
+    if not raw:
+        Task.objects.filter(pk=instance.task_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ProjectAssignment)
+@receiver(post_delete, sender=ProjectAssignment)
+def touch_project(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Project.objects.filter(pk=instance.project_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Task)
+def push_task_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    fields = TASK_DELTA_FIELDS
+    if update_fields is not None:
+        fields = [field for field in TASK_DELTA_FIELDS if field in update_fields]
+    publish_task(instance, 'created' if created else 'updated', fields)
+
+
+@receiver(post_delete, sender=Task)
+def push_task_deleted(sender, instance, **kwargs):
+    publish_task(instance, 'deleted', fields=[])
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_notification(instance)
+
+
+@receiver(post_save, sender=TaskAssignment)
+def notify_task_assigned(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        notify('TASK_ASSIGNED', task=instance.task_id, users=[instance.user_id], actor=instance.assigned_by_id)
+
+
+@receiver(post_save, sender=ProjectAssignment)
+def notify_project_assigned(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        notify(
+            'PROJECT_ASSIGNED', project=instance.project_id,
+            users=[instance.user_id], actor=instance.assigned_by_id
+        )
+
+
+@receiver(post_save, sender=TaskComment)
+def notify_comment_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        notify('COMMENT_ADDED', task=instance.task_id, actor=instance.user_id)
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not needs_reindex(update_fields, TASK_FIELDS):
+        return
+    index_entries([task_entry(instance)])
+    if update_fields is None or 'project' in update_fields or 'project_id' in update_fields:
+        # Comments follow their task to another project
+        SearchEntry.objects.filter(kind='comment', task_id=instance.pk).exclude(
+            project_id=instance.project_id
+        ).update(project_id=instance.project_id)
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and needs_reindex(update_fields, PROJECT_FIELDS):
+        index_entries([project_entry(instance)])
+
+
+@receiver(post_save, sender=TaskComment)
+def index_comment(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and needs_reindex(update_fields, COMMENT_FIELDS):
+        index_entries([comment_entry(instance)])
+
+
+@receiver(post_delete, sender=TaskComment)
+def unindex_comment(sender, instance, **kwargs):
+    # Task and project entries go with their object through the foreign key cascade
+    SearchEntry.objects.filter(kind='comment', object_id=instance.pk).delete()
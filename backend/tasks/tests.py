@@ -1,3 +1,1855 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core import mail
+from django.contrib.auth.hashers import MD5PasswordHasher, PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models import Count, Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from backend.asgi import application
+
+from . import urls
+from .access import visible_projects, visible_tasks
+from .activity import ActivityBuffer, category_for, log_activity
+from .benchmark import (
+    BENCHMARK_ROUTES, ROLES, benchmark_users, queries_by_template, request_route, route_names,
+    run_benchmark, run_login_benchmark
+)
+from .backends import EmailBackend
+from .dashboard import get_dashboard_stats
+from .kanban import move_task
+from .metrics import Counter as MetricCounter, Histogram, MetricsRegistry
+from .middleware import PerformanceMiddleware
+from .models import (
+    MAX_PROJECTS_PER_USER, MAX_TASKS_PER_PROJECT, ActivityLog, CustomUser, Notification,
+    OutboundEmail, PasswordResetCode, Project, ProjectAssignment, ProjectTaskCounters, RequestProfile,
+    SearchEntry, Task, TaskAssignment, TaskComment
+)
+from .notifications import NotificationDispatcher, NotificationEvent
+from .outbox import claim_batch, deliver_outbox, enqueue_email
+from .partitions import (
+    DEFAULT_PARTITION, add_months, create_partitions, is_partitioned, month_start, partition_month,
+    partition_name, partitions, remove_partitions_before
+)
+from .realtime import Subscriber
+from .search import render_highlight
+from .views import UnreadNotificationCountView
+
+
+class KanbanBoardViewTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(
+            email='manager@example.com', role='MANAGER'
+        )
+        self.collaborator = CustomUser.objects.create_user(
+            email='collab@example.com', role='COLLABORATOR'
+        )
+        self.client_user = CustomUser.objects.create_user(
+            email='client@example.com', role='CLIENT'
+        )
+        self.project = Project.objects.create(
+            name='Board', description='Kanban project', created_by=self.manager,
+            client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        ProjectAssignment.objects.create(
+            project=self.project, user=self.collaborator,
+            assigned_by=self.manager, role_in_project='COLLABORATOR'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+        self.url = reverse('kanban_board', args=[self.project.id])
+
+    def add_cards(self, count):
+        statuses = [status for status, _ in Task.STATUS_CHOICES]
+        for i in range(count):
+            task = Task.objects.create(
+                title=f'Card {i}', description='...', project=self.project,
+                created_by=self.manager, status=statuses[i % len(statuses)],
+                due_date=timezone.now() + timedelta(days=3), position=i
+            )
+            TaskAssignment.objects.create(
+                task=task, user=self.collaborator, assigned_by=self.manager
+            )
+            TaskComment.objects.create(task=task, user=self.collaborator, content='Hi')
+
+    def count_board_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data
+
+    def test_board_buckets_cards_by_status(self):
+        self.add_cards(8)
+        _, data = self.count_board_queries()
+        self.assertEqual(list(data['columns']), ['TODO', 'IN_PROGRESS', 'IN_REVIEW', 'DONE'])
+        for cards in data['columns'].values():
+            self.assertEqual(len(cards), 2)
+            self.assertEqual([card['position'] for card in cards],
+                             sorted(card['position'] for card in cards))
+        card = data['columns']['TODO'][0]
+        self.assertEqual(card['comment_count'], 1)
+        self.assertEqual(card['assigned_to'][0]['email'], 'collab@example.com')
+        self.assertEqual(card['assignments'][0]['assigned_by']['email'], 'manager@example.com')
+
+    def test_board_query_count_is_constant(self):
+        self.add_cards(4)
+        small, _ = self.count_board_queries()
+        self.add_cards(40)
+        large, _ = self.count_board_queries()
+        self.assertEqual(small, large)
+
+
+class ProjectTaskStatsTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(
+            email='manager@example.com', role='MANAGER'
+        )
+        client_user = CustomUser.objects.create_user(
+            email='client@example.com', role='CLIENT'
+        )
+        self.project = Project.objects.create(
+            name='Stats', description='...', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        # Several assignments make the visibility join fan out per project
+        for i in range(3):
+            member = CustomUser.objects.create_user(
+                email=f'member{i}@example.com', role='COLLABORATOR'
+            )
+            ProjectAssignment.objects.create(
+                project=self.project, user=member,
+                assigned_by=self.manager, role_in_project='COLLABORATOR'
+            )
+        for status in ['TODO', 'TODO', 'IN_PROGRESS', 'DONE']:
+            Task.objects.create(
+                title=status, description='...', project=self.project,
+                created_by=self.manager, status=status,
+                due_date=timezone.now() + timedelta(days=3)
+            )
+
+    def test_annotated_stats_match_fallback(self):
+        expected = Project.objects.get(pk=self.project.pk).task_stats
+        self.assertEqual(expected, {
+            'total': 4, 'todo': 2, 'in_progress': 1, 'in_review': 0, 'done': 1,
+        })
+        project = Project.objects.filter(
+            Q(created_by=self.manager) | Q(assigned_users=self.manager)
+        ).distinct().with_task_stats().get()
+        with self.assertNumQueries(0):
+            self.assertEqual(project.task_stats, expected)
+            self.assertEqual(project.progress_percentage, 25)
+
+
+class ProjectTaskCountersTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = self.make_project('Alpha')
+        self.other = self.make_project('Beta')
+
+    def make_project(self, name):
+        return Project.objects.create(
+            name=name, description='...', created_by=self.manager,
+            client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+
+    def make_task(self, status='TODO', project=None):
+        return Task.objects.create(
+            title='Task', description='...', project=project or self.project,
+            created_by=self.manager, status=status,
+            due_date=timezone.now() + timedelta(days=3)
+        )
+
+    def counters(self, project=None):
+        return ProjectTaskCounters.objects.get(project=project or self.project).as_stats()
+
+    def test_counters_follow_task_writes(self):
+        task = self.make_task()
+        self.make_task('DONE')
+        self.assertEqual(self.counters(), {
+            'total': 2, 'todo': 1, 'in_progress': 0, 'in_review': 0, 'done': 1,
+        })
+
+        task = Task.objects.get(pk=task.pk)
+        task.status = 'IN_REVIEW'
+        task.save()
+        self.assertEqual(self.counters()['todo'], 0)
+        self.assertEqual(self.counters()['in_review'], 1)
+
+        task.project = self.other
+        task.save()
+        self.assertEqual(self.counters()['total'], 1)
+        self.assertEqual(self.counters(self.other)['in_review'], 1)
+
+        task.delete()
+        self.assertEqual(self.counters(self.other)['total'], 0)
+
+    def test_bulk_status_change_updates_counters(self):
+        for _ in range(3):
+            self.make_task()
+        self.make_task('TODO', project=self.other)
+        updated = Task.objects.filter(project=self.project).update_status('DONE')
+        self.assertEqual(updated, 3)
+        self.assertEqual(self.counters()['done'], 3)
+        self.assertEqual(self.counters()['todo'], 0)
+        self.assertEqual(self.counters(self.other)['todo'], 1)
+        self.assertFalse(Task.objects.filter(status='DONE', completed_at__isnull=True).exists())
+
+    def test_project_reads_counters(self):
+        self.make_task('DONE')
+        self.make_task()
+        project = Project.objects.with_task_counters().get(pk=self.project.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(project.task_stats['total'], 2)
+            self.assertEqual(project.progress_percentage, 50)
+
+    def test_saves_of_stale_instances_keep_counters_exact(self):
+        task = self.make_task()
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        first.status = 'DONE'
+        first.save()
+        # Loaded before the first save, so its own idea of the old status is TODO
+        second.status = 'IN_PROGRESS'
+        second.save()
+        self.assertEqual(self.counters(), {
+            'total': 1, 'todo': 0, 'in_progress': 1, 'in_review': 0, 'done': 0,
+        })
+        call_command('rebuild_task_counters', '--verify', stdout=StringIO())
+
+    def test_rebuild_command_repairs_drift(self):
+        self.make_task()
+        ProjectTaskCounters.objects.filter(project=self.project).update(total=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_counters', '--verify', stdout=StringIO())
+        call_command('rebuild_task_counters', stdout=StringIO())
+        self.assertEqual(self.counters()['total'], 1)
+        call_command('rebuild_task_counters', '--verify', stdout=StringIO())
+
+
+@override_settings(NOTIFICATION_COALESCE_SECONDS=0)
+class DashboardStatsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN')
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        self.client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Dash', description='...', created_by=self.admin, status='ACTIVE',
+            client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        ProjectAssignment.objects.create(
+            project=self.project, user=self.manager,
+            assigned_by=self.admin, role_in_project='MANAGER'
+        )
+        for status, days in [('TODO', -1), ('IN_PROGRESS', 3), ('IN_REVIEW', 3), ('DONE', 3)]:
+            task = Task.objects.create(
+                title=status, description='...', project=self.project,
+                created_by=self.manager, status=status,
+                due_date=timezone.now() + timedelta(days=days)
+            )
+            TaskAssignment.objects.create(task=task, user=self.collaborator, assigned_by=self.manager)
+        self.api = APIClient()
+        self.url = reverse('dashboard_stats')
+
+    def get_stats(self, user):
+        self.api.force_authenticate(user)
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['stats']
+
+    def test_role_stats(self):
+        self.assertEqual(self.get_stats(self.admin), {
+            'total_users': 4, 'active_projects': 1, 'total_tasks': 4,
+            'completed_tasks': 1, 'system_issues': 0,
+        })
+        self.assertEqual(self.get_stats(self.manager), {
+            'managed_projects': 1, 'active_projects': 1, 'team_tasks': 4,
+            'completed_tasks': 1, 'overdue_tasks': 1,
+        })
+        self.assertEqual(self.get_stats(self.collaborator), {
+            'my_tasks': 4, 'completed_tasks': 1, 'in_progress': 1,
+            'pending_tasks': 1, 'overdue_tasks': 1,
+        })
+        self.assertEqual(self.get_stats(self.client_user), {
+            'my_projects': 1, 'active_projects': 1, 'completed_projects': 0,
+            'total_tasks': 4, 'pending_review': 1,
+        })
+
+    def test_each_role_is_one_query_then_cached(self):
+        for user in [self.admin, self.manager, self.collaborator, self.client_user]:
+            with self.assertNumQueries(1):
+                get_dashboard_stats(user)
+            with self.assertNumQueries(0):
+                get_dashboard_stats(user)
+
+    def test_task_changes_invalidate_visible_dashboards(self):
+        self.assertEqual(self.get_stats(self.collaborator)['completed_tasks'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.filter(project=self.project).update_status('DONE')
+        self.assertEqual(self.get_stats(self.collaborator)['completed_tasks'], 4)
+        self.assertEqual(self.get_stats(self.manager)['completed_tasks'], 4)
+
+
+class AvailableUsersViewTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.projects = [
+            Project.objects.create(
+                name=f'P{i}', description='...', created_by=self.admin,
+                client=client_user, start_date=timezone.now().date(),
+                end_date=timezone.now().date() + timedelta(days=30)
+            )
+            for i in range(4)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.url = reverse('available_users')
+
+    def add_staff(self, count, prefix='staff'):
+        return [
+            CustomUser.objects.create_user(
+                email=f'{prefix}{i}@example.com', role='COLLABORATOR', first_name=prefix.title()
+            )
+            for i in range(count)
+        ]
+
+    def assign_projects(self, user, count):
+        for project in self.projects[:count]:
+            ProjectAssignment.objects.create(
+                project=project, user=user, assigned_by=self.admin, role_in_project='COLLABORATOR'
+            )
+
+    def assign_tasks(self, user, count):
+        project = self.projects[0]
+        for i in range(count):
+            task = Task.objects.create(
+                title=f'T{i}', description='...', project=project, created_by=self.admin,
+                due_date=timezone.now() + timedelta(days=3)
+            )
+            TaskAssignment.objects.create(task=task, user=user, assigned_by=self.admin)
+
+    def emails(self, **params):
+        response = self.api.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return {user['email'] for user in response.data['users']}
+
+    def test_limits_are_applied(self):
+        free, busy, full_tasks = self.add_staff(3)
+        self.assign_projects(busy, 3)
+        self.assign_projects(full_tasks, 1)
+        self.assign_tasks(full_tasks, 3)
+        self.assertEqual(self.emails(), {free.email, full_tasks.email})
+        self.assertEqual(self.emails(project_id=self.projects[0].id), {free.email})
+        response = self.api.get(self.url)
+        counts = {user['email']: user['project_count'] for user in response.data['users']}
+        self.assertEqual(counts[full_tasks.email], 1)
+
+    def test_query_count_is_constant(self):
+        self.add_staff(3)
+        with CaptureQueriesContext(connection) as small:
+            self.api.get(self.url, {'project_id': self.projects[0].id})
+        for user in self.add_staff(20, prefix='more'):
+            self.assign_projects(user, 1)
+        with CaptureQueriesContext(connection) as large:
+            self.api.get(self.url, {'project_id': self.projects[0].id})
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_unpaged_by_default(self):
+        # The dashboard renders the whole list, as before paging was added
+        self.add_staff(60)
+        response = self.api.get(self.url)
+        self.assertEqual(list(response.data), ['users'])
+        self.assertEqual(len(response.data['users']), 60)
+
+    def test_search_and_pagination(self):
+        self.add_staff(3, prefix='alice')
+        self.add_staff(2, prefix='bob')
+        self.assertEqual(self.emails(search='bo'), {'bob0@example.com', 'bob1@example.com'})
+        response = self.api.get(self.url, {'search': 'ali', 'page_size': 2})
+        self.assertEqual(len(response.data['users']), 2)
+        self.assertEqual(response.data['next_page'], 2)
+        response = self.api.get(self.url, {'search': 'ali', 'page_size': 2, 'page': 2})
+        self.assertEqual(len(response.data['users']), 1)
+        self.assertIsNone(response.data['next_page'])
+
+
+class ProjectAccessTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN')
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        self.client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.outsider = CustomUser.objects.create_user(email='other@example.com', role='MANAGER')
+        self.project = Project.objects.create(
+            name='Visible', description='...', created_by=self.manager,
+            client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.assignment = ProjectAssignment.objects.create(
+            project=self.project, user=self.collaborator,
+            assigned_by=self.manager, role_in_project='COLLABORATOR'
+        )
+        self.assigned_task = Task.objects.create(
+            title='Mine', description='...', project=self.project, created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=3)
+        )
+        TaskAssignment.objects.create(task=self.assigned_task, user=self.collaborator, assigned_by=self.manager)
+        self.other_task = Task.objects.create(
+            title='Theirs', description='...', project=self.project, created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=3)
+        )
+
+    def test_visibility_by_role(self):
+        for user in [self.admin, self.manager, self.collaborator, self.client_user]:
+            self.assertEqual(list(visible_projects(user)), [self.project])
+        self.assertFalse(visible_projects(self.outsider).exists())
+        self.assertEqual(set(visible_tasks(self.manager)), {self.assigned_task, self.other_task})
+        self.assertEqual(set(visible_tasks(self.client_user)), {self.assigned_task, self.other_task})
+        self.assertEqual(list(visible_tasks(self.collaborator)), [self.assigned_task])
+        self.assertFalse(visible_tasks(self.outsider).exists())
+
+    def test_visibility_queries_do_not_dedupe(self):
+        self.assertNotIn('DISTINCT', str(visible_projects(self.manager).query))
+        self.assertNotIn('DISTINCT', str(visible_tasks(self.client_user).query))
+
+    def test_access_follows_assignments_and_project_edits(self):
+        self.assignment.delete()
+        self.assertFalse(visible_projects(self.collaborator).exists())
+
+        new_client = CustomUser.objects.create_user(email='client2@example.com', role='CLIENT')
+        self.project.client = new_client
+        self.project.save()
+        self.assertFalse(visible_projects(self.client_user).exists())
+        self.assertTrue(visible_projects(new_client).exists())
+
+        ProjectAssignment.objects.create(
+            project=self.project, user=self.outsider,
+            assigned_by=self.manager, role_in_project='MANAGER'
+        )
+        self.assertTrue(visible_projects(self.outsider).exists())
+
+
+def page_queries(ctx):
+    """Captured queries without the conditional GET validator"""
+    return [query for query in ctx.captured_queries if '"last_modified"' not in query['sql']]
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        project = Project.objects.create(
+            name='Paged', description='...', created_by=self.admin,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        for i in range(23):
+            Task.objects.create(
+                title=f'T{i}', description='...', project=project, created_by=self.admin,
+                due_date=timezone.now() + timedelta(days=3), position=i % 3
+            )
+        # Ties on every ordering column except the primary key
+        Task.objects.filter(position=1).update(created_at=timezone.now())
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def walk(self, url, key='next'):
+        ids, pages = [], 0
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            for query in page_queries(ctx):
+                self.assertNotIn('COUNT(', query['sql'].upper())
+                self.assertNotIn('OFFSET', query['sql'].upper())
+            page_ids = [task['id'] for task in response.data['results']]
+            ids = page_ids + ids if key == 'previous' else ids + page_ids
+            url, pages = response.data[key], pages + 1
+        return ids, pages
+
+    def test_pages_follow_full_ordering(self):
+        expected = list(Task.objects.order_by('position', '-created_at', '-id').values_list('id', flat=True))
+        ids, pages = self.walk(reverse('task_list') + '?page_size=5')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 5)
+
+    def test_previous_links_walk_back(self):
+        response = self.api.get(reverse('task_list'), {'page_size': 5})
+        for _ in range(3):
+            response = self.api.get(response.data['next'])
+        last_page = [task['id'] for task in response.data['results']]
+        ids, _ = self.walk(response.data['previous'], key='previous')
+        expected = list(Task.objects.order_by('position', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids + last_page, expected[:20])
+
+    def cursor(self, values):
+        payload = json.dumps({'v': values, 'r': False})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def test_invalid_cursor(self):
+        response = self.api.get(reverse('task_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_values(self):
+        # Well-formed cursors whose values the ordering fields reject
+        for url, values in [
+            (reverse('task_list'), ['abc', 'zzz', 1]),
+            (reverse('project_list'), ['not a date', 1]),
+        ]:
+            response = self.api.get(url, {'cursor': self.cursor(values)})
+            self.assertEqual(response.status_code, 404, url)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Sparse', description='Long project text', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def add_tasks(self, count):
+        for i in range(count):
+            task = Task.objects.create(
+                title=f'T{i}', description='Long task text', project=self.project,
+                created_by=self.manager, due_date=timezone.now() + timedelta(days=3)
+            )
+            TaskAssignment.objects.create(task=task, user=self.collaborator, assigned_by=self.manager)
+            TaskComment.objects.create(task=task, user=self.collaborator, content='Hi')
+
+    def get_tasks(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get(reverse('task_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], page_queries(ctx)
+
+    def test_fields_trim_output_and_sql(self):
+        self.add_tasks(3)
+        tasks, queries = self.get_tasks(fields='title,status,due_date')
+        self.assertEqual(set(tasks[0]), {'id', 'title', 'status', 'due_date'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"description"', queries[0]['sql'])
+
+    def test_relations_collapse_to_ids_unless_expanded(self):
+        self.add_tasks(1)
+        tasks, queries = self.get_tasks(fields='title,project,assigned_to', expand='assigned_to')
+        self.assertEqual(tasks[0]['project'], self.project.id)
+        self.assertEqual(tasks[0]['assigned_to'][0]['email'], 'collab@example.com')
+        self.assertEqual(len(queries), 2)
+
+    def test_full_representation_query_count_is_constant(self):
+        self.add_tasks(2)
+        _, small = self.get_tasks()
+        self.add_tasks(10)
+        tasks, large = self.get_tasks()
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(tasks[0]['comments'][0]['user']['email'], 'collab@example.com')
+
+    def test_project_fields(self):
+        response = self.api.get(reverse('project_list'), {'fields': 'name,task_stats'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'task_stats'})
+
+
+class TaskBulkCreateViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Import', description='...', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.hidden = Project.objects.create(
+            name='Hidden', description='...', created_by=client_user,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+        self.url = reverse('task_bulk_create')
+
+    def item(self, project=None, **extra):
+        return {
+            'title': 'Imported', 'description': '...', 'project': (project or self.project).id,
+            'due_date': (timezone.now() + timedelta(days=3)).isoformat(), **extra
+        }
+
+    def test_creates_tasks_and_respects_assignment_limit(self):
+        items = [self.item(assigned_to=[self.collaborator.id]) for _ in range(5)]
+        response = self.api.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['created']), 5)
+        self.assertEqual(Task.objects.filter(project=self.project).count(), 5)
+        self.assertEqual(TaskAssignment.objects.filter(user=self.collaborator).count(), 3)
+        self.assertEqual(response.data['created'][4]['skipped_assignees'], [self.collaborator.id])
+        self.assertEqual(ProjectTaskCounters.objects.get(project=self.project).todo, 5)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def post(count):
+            items = [self.item(assigned_to=[self.collaborator.id]) for _ in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.api.post(self.url, items, format='json')
+            return len(ctx.captured_queries)
+        self.assertEqual(post(2), post(20))
+
+    def test_partial_and_atomic_batches(self):
+        items = [self.item(), {'title': 'Broken'}, self.item(project=self.hidden)]
+        response = self.api.post(self.url, {'tasks': items, 'atomic': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertFalse(Task.objects.exists())
+
+        response = self.api.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([task['index'] for task in response.data['created']], [0])
+        self.assertEqual(Task.objects.count(), 1)
+
+
+class TaskMoveViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Board', description='...', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def make_task(self, title, position, status='TODO'):
+        return Task.objects.create(
+            title=title, description='...', project=self.project, created_by=self.manager,
+            status=status, position=position, due_date=timezone.now() + timedelta(days=3)
+        )
+
+    def move(self, task, **data):
+        return self.api.post(reverse('task_move', args=[task.id]), data, format='json')
+
+    def column(self, status):
+        return list(Task.objects.filter(project=self.project, status=status).values_list('title', flat=True))
+
+    def test_move_takes_midpoint_and_writes_one_row(self):
+        a, b = self.make_task('a', 1024), self.make_task('b', 2048)
+        card = self.make_task('card', 1024, status='IN_PROGRESS')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.move(card, status='TODO', after_id=a.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['rebalanced'])
+        self.assertEqual(response.data['position'], 1536)
+        self.assertEqual(self.column('TODO'), ['a', 'card', 'b'])
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "tasks_task"')]
+        self.assertEqual(len(writes), 1)
+        # The neighbours keep their positions
+        b.refresh_from_db()
+        self.assertEqual(b.position, 2048)
+        counters = ProjectTaskCounters.objects.get(project=self.project)
+        self.assertEqual((counters.todo, counters.in_progress), (3, 0))
+
+    def test_move_to_top_and_bottom(self):
+        self.make_task('a', 1024)
+        b = self.make_task('b', 2048)
+        self.move(b, status='TODO', before_id=Task.objects.get(title='a').id)
+        self.assertEqual(self.column('TODO'), ['b', 'a'])
+        self.move(b, status='TODO')
+        self.assertEqual(self.column('TODO'), ['a', 'b'])
+
+    def test_rebalances_column_when_neighbours_are_adjacent(self):
+        for i in range(4):
+            self.make_task(str(i), 0)
+        card = self.make_task('card', 0, status='IN_PROGRESS')
+        order = self.column('TODO')
+        anchor = Task.objects.get(title=order[1])
+        response = self.move(card, status='TODO', after_id=anchor.id)
+        self.assertTrue(response.data['rebalanced'])
+        self.assertEqual(self.column('TODO'), order[:2] + ['card'] + order[2:])
+        positions = list(Task.objects.filter(status='TODO').values_list('position', flat=True))
+        self.assertEqual(positions, [1024, 2048, 3072, 4096, 5120])
+
+    def test_completed_at_follows_status(self):
+        card = self.make_task('card', 0)
+        self.move(card, status='DONE')
+        card.refresh_from_db()
+        self.assertIsNotNone(card.completed_at)
+        self.move(card, status='IN_REVIEW')
+        card.refresh_from_db()
+        self.assertIsNone(card.completed_at)
+
+    def test_rejects_neighbour_from_another_column(self):
+        other = self.make_task('other', 1024, status='DONE')
+        card = self.make_task('card', 0)
+        response = self.move(card, status='TODO', after_id=other.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('after_id', response.data)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Board', description='...', created_by=self.manager,
+            client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30), status='ACTIVE'
+        )
+        self.task = Task.objects.create(
+            title='Task', description='...', project=self.project, created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=3)
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def revalidate(self, url, etag):
+        return self.api.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_board_is_not_modified(self):
+        url = reverse('kanban_board', args=[self.project.id])
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.revalidate(url, response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_changes_move_the_etag(self):
+        url = reverse('kanban_board', args=[self.project.id])
+        etag = self.api.get(url)['ETag']
+        changes = [
+            lambda: TaskComment.objects.create(task=self.task, user=self.manager, content='Hi'),
+            lambda: TaskAssignment.objects.create(task=self.task, user=self.manager, assigned_by=self.manager),
+            lambda: self.api.post(reverse('task_move', args=[self.task.id]), {'status': 'DONE'}, format='json'),
+            lambda: self.task.delete(),
+        ]
+        for change in changes:
+            change()
+            response = self.revalidate(url, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+    def test_if_modified_since_alone_is_not_honoured(self):
+        # Deleting a card moves no timestamp, so only the ETag can tell
+        url = reverse('kanban_board', args=[self.project.id])
+        self.task.delete()
+        response = self.api.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_users_shown_move_the_etag(self):
+        url = reverse('task_list') + f'?project_id={self.project.id}'
+        etag = self.api.get(url)['ETag']
+        outsider = CustomUser.objects.create_user(email='outsider@example.com', role='COLLABORATOR')
+        outsider.first_name = 'Renamed'
+        outsider.save()
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+        collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        TaskComment.objects.create(task=self.task, user=collaborator, content='Hi')
+        etag = self.api.get(url)['ETag']
+        CustomUser.objects.filter(pk=collaborator.pk).update(
+            first_name='Renamed', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_nested_names_and_due_dates_move_the_etag(self):
+        url = reverse('task_list') + f'?project_id={self.project.id}'
+        etag = self.api.get(url)['ETag']
+        changes = [
+            lambda: Project.objects.filter(pk=self.project.pk).update(
+                name='Renamed', updated_at=timezone.now() + timedelta(seconds=1)
+            ),
+            lambda: CustomUser.objects.filter(pk=self.manager.pk).update(
+                first_name='Renamed', updated_at=timezone.now() + timedelta(seconds=2)
+            ),
+        ]
+        for change in changes:
+            change()
+            response = self.revalidate(url, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+        # The task falls due: is_overdue flips without any row changing
+        with patch('django.utils.timezone.now', return_value=self.task.due_date + timedelta(minutes=1)):
+            response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_overdue'])
+
+    def test_dashboard_stats_are_fetched_once(self):
+        with patch('tasks.conditional.get_dashboard_stats', wraps=get_dashboard_stats) as fetch:
+            response = self.api.get(reverse('dashboard_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(response.data['stats'], get_dashboard_stats(self.manager))
+
+    def test_lists_and_dashboards_revalidate(self):
+        urls = [
+            reverse('task_list') + f'?project_id={self.project.id}',
+            reverse('project_detail', args=[self.project.id]),
+            reverse('dashboard_stats'),
+            reverse('recent_tasks'),
+            reverse('active_projects'),
+        ]
+        for url in urls:
+            etag = self.api.get(url)['ETag']
+            self.assertEqual(self.revalidate(url, etag).status_code, 304, url)
+
+        # The same data seen by someone else gets its own validator
+        other = APIClient()
+        other.force_authenticate(self.client_user)
+        response = other.get(urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_project_has_no_validator(self):
+        response = self.api.get(reverse('kanban_board', args=[self.project.id + 1]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command(
+            'seed_benchmark_data', users=3, projects_per_manager=2, tasks_per_project=8,
+            comments_per_task=1, notifications_per_user=3, activity_per_user=3, stdout=StringIO()
+        )
+
+    def test_seed_respects_assignment_limits(self):
+        self.assertEqual(benchmark_users().count(), 12)
+        self.assertEqual(Task.objects.count(), 48)
+        project_load = ProjectAssignment.objects.values('user').annotate(n=Count('id'))
+        self.assertLessEqual(max(row['n'] for row in project_load), MAX_PROJECTS_PER_USER)
+        task_load = TaskAssignment.objects.values('user', 'task__project').annotate(n=Count('id'))
+        self.assertLessEqual(max(row['n'] for row in task_load), MAX_TASKS_PER_PROJECT)
+        project_ids = list(Project.objects.values_list('id', flat=True))
+        self.assertEqual(ProjectTaskCounters.rebuild(project_ids, write=False), [])
+        with self.assertRaises(CommandError):
+            call_command('seed_benchmark_data', users=1, stdout=StringIO())
+
+    def test_every_route_has_a_benchmark_request(self):
+        self.assertEqual(set(route_names(urls.urlpatterns)) - set(BENCHMARK_ROUTES), set())
+
+    def test_run_benchmark_reports_routes_without_writing(self):
+        manager = benchmark_users().filter(role='MANAGER').first()
+        tasks_before = Task.objects.count()
+        report = run_benchmark(
+            [manager], ['task_list', 'task_bulk_create', 'kanban_board'],
+            iterations=2, warmup=0, host='testserver'
+        )
+        self.assertEqual(
+            [result['route'] for result in report['results']],
+            ['task_list', 'task_bulk_create', 'kanban_board']
+        )
+        self.assertEqual(report['results'][1]['status'], {'201': 2})
+        self.assertEqual(report['results'][0]['status'], {'200': 2})
+        self.assertGreater(report['results'][0]['bytes'], 0)
+        self.assertEqual(Task.objects.count(), tasks_before)
+
+
+QUERY_BUDGETS_PATH = Path(__file__).with_name('query_budgets.json')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(TestCase):
+    """
+    Every route, as every role, must run the same number of queries on a small
+    and a large data set, and no more than its entry in query_budgets.json.
+    Run with UPDATE_QUERY_BUDGETS=1 to rewrite the budget file.
+    """
+    # (users per role, tasks per project): 10 tasks over 2 projects, then 200 over 10
+    sizes = ((2, 5), (10, 20))
+
+    def measure(self, users, tasks_per_project):
+        benchmark_users().delete()
+        call_command(
+            'seed_benchmark_data', users=users, projects_per_manager=1,
+            tasks_per_project=tasks_per_project, comments_per_task=2,
+            notifications_per_user=tasks_per_project, activity_per_user=tasks_per_project,
+            stdout=StringIO()
+        )
+        # Empty results skip their prefetches, so keep the active-project lists populated
+        Project.objects.update(status='ACTIVE')
+        client = APIClient()
+        measured = {}
+        for role in ROLES:
+            user = benchmark_users().filter(role=role).order_by('id').first()
+            token = str(RefreshToken.for_user(user).access_token)
+            for name in route_names(urls.urlpatterns):
+                # Measure the uncached path
+                cache.clear()
+                result = request_route(client, user, name, token)
+                if result is not None:
+                    measured[(name, role)] = result[1]
+        return measured
+
+    def format_queries(self, captured):
+        return '\n'.join(f'{count:4d} x {template}' for count, template in (
+            (count, template) for template, count in queries_by_template(captured)
+        ))
+
+    def test_query_counts_are_flat_and_within_budget(self):
+        small, large = (self.measure(*size) for size in self.sizes)
+        budgets = json.loads(QUERY_BUDGETS_PATH.read_text())
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            budgets = {}
+            for (name, role), captured in sorted(large.items()):
+                budgets.setdefault(name, {})[role] = len(captured)
+            QUERY_BUDGETS_PATH.write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n')
+
+        self.assertEqual(set(small), set(large))
+        for (name, role), captured in sorted(large.items()):
+            with self.subTest(route=name, role=role):
+                budget = budgets.get(name, {}).get(role)
+                self.assertIsNotNone(budget, f'{name} has no query budget for {role}')
+                self.assertEqual(
+                    len(small[(name, role)]), len(captured),
+                    f'{name} as {role} runs more queries on the larger data set:\n'
+                    + self.format_queries(captured)
+                )
+                self.assertLessEqual(
+                    len(captured), budget,
+                    f'{name} as {role} is over its budget of {budget} queries:\n'
+                    + self.format_queries(captured)
+                )
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        Project.objects.create(
+            name='Timed', description='...', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+
+    def get_projects(self):
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        return api.get(reverse('project_list'))
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0.0)
+    def test_disabled_without_sampling(self):
+        self.assertNotIn('Server-Timing', self.get_projects())
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1.0, PERFORMANCE_SLOW_REQUEST_MS=60000)
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs('tasks.performance', 'INFO') as logs:
+            response = self.get_projects()
+        timing = response['Server-Timing']
+        for metric in ['sql;dur=', 'serializer;dur=', 'render;dur=', 'total;dur=']:
+            self.assertIn(metric, timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['route'], 'project_list')
+        self.assertGreater(record['queries'], 0)
+        self.assertIn(f'desc="{record["queries"]} queries"', timing)
+        self.assertNotIn('query_log', record)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1.0, PERFORMANCE_SLOW_REQUEST_MS=0)
+    def test_slow_request_dumps_queries(self):
+        with self.assertLogs('tasks.performance', 'WARNING') as logs:
+            self.get_projects()
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['slow'])
+        self.assertEqual(len(record['query_log']), record['queries'])
+        self.assertTrue(any('tasks_project' in query['sql'] for query in record['query_log']))
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=1.0)
+    def test_leaves_drf_serializers_unpatched(self):
+        data = BaseSerializer.data
+        PerformanceMiddleware(lambda request: None)
+        self.assertIs(BaseSerializer.data, data)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN', is_staff=True)
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.api = APIClient()
+
+    def test_metrics_are_staff_only(self):
+        self.api.force_authenticate(self.manager)
+        self.assertEqual(self.api.get(reverse('metrics')).status_code, 403)
+
+    def test_exposes_route_cache_and_auth_metrics(self):
+        self.api.force_authenticate(self.manager)
+        self.api.get(reverse('dashboard_stats'))
+        self.api.get(reverse('dashboard_stats'))
+        EmailBackend().authenticate(None, username='nobody@example.com', password='secret')
+
+        self.api.force_authenticate(self.admin)
+        response = self.api.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{route="dashboard_stats",method="GET",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="dashboard_stats",method="GET",le="+Inf"}', body)
+        self.assertIn('http_request_db_queries_count{route="dashboard_stats"}', body)
+        self.assertIn('cache_requests_total{cache="dashboard_stats",result="hit"}', body)
+        self.assertIn('auth_attempts_total{outcome="unknown_user"}', body)
+
+    def test_multiprocess_mode_sums_workers(self):
+        def metrics(registry):
+            return (
+                MetricCounter(registry, 'jobs_total', 'Jobs', ['kind']),
+                Histogram(registry, 'job_seconds', 'Job time', [], [1, 10]),
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            for worker in (1, 2):
+                registry = MetricsRegistry(multiprocess_dir=directory)
+                counter, histogram = metrics(registry)
+                counter.inc(kind='a')
+                histogram.observe(worker * 3)
+                registry.flush(directory)
+                # Stand in for a second process: files are named by pid
+                os.rename(
+                    os.path.join(directory, f'metrics-{os.getpid()}.json'),
+                    os.path.join(directory, f'metrics-{worker}.json')
+                )
+            scraper = MetricsRegistry(multiprocess_dir=directory)
+            metrics(scraper)
+            exposed = scraper.expose()
+        self.assertIn('jobs_total{kind="a"} 2', exposed)
+        self.assertIn('job_seconds_bucket{le="10"} 2', exposed)
+        self.assertIn('job_seconds_sum 9', exposed)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.staff = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN', is_staff=True)
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+
+    def get(self, user, **extra):
+        api = APIClient()
+        token = RefreshToken.for_user(user).access_token
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory.name, PROFILING_MAX_PROFILES=2):
+            return api.get(reverse('project_list'), **extra)
+
+    def test_staff_request_is_profiled_with_its_sql(self):
+        response = self.get(self.staff, HTTP_X_PROFILE='1')
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.route, 'project_list')
+        self.assertEqual(profile.query_count, len(profile.queries))
+        self.assertTrue(any('tasks_project' in query['sql'] for query in profile.queries))
+        with self.settings(PROFILING_DIR=self.directory.name):
+            self.assertIn('cumulative', profile.stats_summary())
+
+    def test_flag_is_ignored_for_non_staff_and_without_flag(self):
+        self.assertNotIn('X-Profile-Id', self.get(self.manager, HTTP_X_PROFILE='1'))
+        self.assertNotIn('X-Profile-Id', self.get(self.staff))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_non_staff_flag_costs_no_queries(self):
+        with CaptureQueriesContext(connection) as plain:
+            self.get(self.manager)
+        with self.assertNumQueries(len(plain)):
+            response = self.get(self.manager, HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_store_is_bounded(self):
+        ids = [self.get(self.staff, data={'profile': '1'})['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(
+            sorted(RequestProfile.objects.values_list('id', flat=True)), sorted(map(int, ids[1:]))
+        )
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+
+@override_settings(NOTIFICATION_COALESCE_SECONDS=0)
+class RealtimeTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.other = CustomUser.objects.create_user(email='other@example.com', role='MANAGER')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Live', description='...', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.tokens = {
+            user.pk: str(RefreshToken.for_user(user).access_token) for user in (self.manager, self.other)
+        }
+
+    async def open(self, user):
+        socket = ApplicationCommunicator(application, {
+            'type': 'websocket', 'path': '/ws/',
+            'query_string': f'token={self.tokens[user.pk]}'.encode(),
+        })
+        await socket.send_input({'type': 'websocket.connect'})
+        self.assertEqual((await socket.receive_output())['type'], 'websocket.accept')
+        return socket
+
+    async def send(self, socket, **data):
+        await socket.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive(self, socket):
+        return json.loads((await socket.receive_output(timeout=1))['text'])
+
+    async def close(self, socket):
+        await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await socket.wait()
+
+    def committed(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            return change()
+
+    async def test_rejects_missing_or_invalid_token(self):
+        for query_string in (b'', b'token=garbage'):
+            socket = ApplicationCommunicator(
+                application, {'type': 'websocket', 'path': '/ws/', 'query_string': query_string}
+            )
+            await socket.send_input({'type': 'websocket.connect'})
+            self.assertEqual(await socket.receive_output(), {'type': 'websocket.close', 'code': 4401})
+
+    async def test_board_subscribers_receive_task_deltas(self):
+        socket = await self.open(self.manager)
+        await self.send(socket, action='subscribe', project=self.project.id)
+        self.assertEqual(await self.receive(socket), {'type': 'subscribed', 'project': self.project.id})
+
+        task = await sync_to_async(self.committed)(lambda: Task.objects.create(
+            title='Card', description='...', project=self.project, created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=3)
+        ))
+        message = await self.receive(socket)
+        self.assertEqual((message['type'], message['task']['id']), ('task.created', task.id))
+        self.assertEqual(message['task']['status'], 'TODO')
+
+        await sync_to_async(self.committed)(lambda: move_task(task, 'DONE'))
+        message = await self.receive(socket)
+        self.assertEqual(message['type'], 'task.updated')
+        self.assertEqual(set(message['task']), {'id', 'status', 'position', 'completed_at', 'updated_at'})
+        # The creator is told the task was completed on the same connection
+        self.assertEqual((await self.receive(socket))['notification']['notification_type'], 'TASK_COMPLETED')
+
+        task_id = task.id
+        await sync_to_async(self.committed)(task.delete)
+        self.assertEqual(await self.receive(socket), {
+            'type': 'task.deleted', 'project': self.project.id, 'task': {'id': task_id}
+        })
+
+        await self.send(socket, action='unsubscribe', project=self.project.id)
+        self.assertEqual((await self.receive(socket))['type'], 'unsubscribed')
+        await self.close(socket)
+
+    async def test_cannot_subscribe_to_invisible_project(self):
+        socket = await self.open(self.other)
+        await self.send(socket, action='subscribe', project=self.project.id)
+        message = await self.receive(socket)
+        self.assertEqual((message['type'], message['error']), ('error', 'Project not found'))
+        await self.close(socket)
+
+    async def test_board_is_dropped_once_access_is_revoked(self):
+        assignment = await sync_to_async(ProjectAssignment.objects.create)(
+            project=self.project, user=self.other, assigned_by=self.manager, role_in_project='MANAGER'
+        )
+        socket = await self.open(self.other)
+        await self.send(socket, action='subscribe', project=self.project.id)
+        self.assertEqual((await self.receive(socket))['type'], 'subscribed')
+
+        await sync_to_async(assignment.delete)()
+        with patch.object(Subscriber, 'access_ttl', 0):
+            await sync_to_async(self.committed)(lambda: Task.objects.create(
+                title='Secret', description='...', project=self.project, created_by=self.manager,
+                due_date=timezone.now() + timedelta(days=3)
+            ))
+            self.assertEqual(await self.receive(socket), {'type': 'unsubscribed', 'project': self.project.id})
+            await sync_to_async(self.committed)(lambda: Task.objects.create(
+                title='Secret too', description='...', project=self.project, created_by=self.manager,
+                due_date=timezone.now() + timedelta(days=3)
+            ))
+            self.assertTrue(await socket.receive_nothing())
+        await self.close(socket)
+
+    async def test_expired_token_closes_the_connection(self):
+        socket = await self.open(self.manager)
+        await self.send(socket, action='subscribe', project=self.project.id)
+        self.assertEqual((await self.receive(socket))['type'], 'subscribed')
+        expired = time.time() + settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds() + 60
+        with patch('tasks.realtime.time.time', return_value=expired):
+            await sync_to_async(self.committed)(lambda: Task.objects.create(
+                title='Late', description='...', project=self.project, created_by=self.manager,
+                due_date=timezone.now() + timedelta(days=3)
+            ))
+            self.assertEqual(await socket.receive_output(timeout=1), {'type': 'websocket.close', 'code': 4401})
+        await self.close(socket)
+
+    async def test_notifications_reach_only_their_user(self):
+        mine, theirs = await self.open(self.manager), await self.open(self.other)
+        notification = await sync_to_async(self.committed)(lambda: Notification.objects.create(
+            user=self.manager, title='Assigned', message='...', notification_type='TASK_ASSIGNED'
+        ))
+        message = await self.receive(mine)
+        self.assertEqual(message['type'], 'notification.created')
+        self.assertEqual(message['notification']['id'], notification.id)
+        self.assertTrue(await theirs.receive_nothing())
+        await self.close(mine)
+        await self.close(theirs)
+
+
+@override_settings(NOTIFICATION_COALESCE_SECONDS=0)
+class NotificationDispatcherTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        self.client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Inbox', description='...', created_by=self.manager,
+            client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.task = Task.objects.create(
+            title='Card', description='...', project=self.project, created_by=self.manager,
+            due_date=timezone.now() + timedelta(days=3)
+        )
+
+    def inbox(self, notification_type):
+        return sorted(
+            Notification.objects.filter(notification_type=notification_type)
+            .values_list('user__email', flat=True)
+        )
+
+    def test_events_notify_followers_but_not_the_actor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskAssignment.objects.create(task=self.task, user=self.collaborator, assigned_by=self.manager)
+        self.assertEqual(self.inbox('TASK_ASSIGNED'), ['collab@example.com'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskComment.objects.create(task=self.task, user=self.collaborator, content='Hi')
+        self.assertEqual(self.inbox('COMMENT_ADDED'), ['client@example.com', 'manager@example.com'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            move_task(self.task, 'DONE')
+        self.assertEqual(
+            self.inbox('TASK_COMPLETED'), ['client@example.com', 'collab@example.com', 'manager@example.com']
+        )
+        notification = Notification.objects.get(notification_type='TASK_ASSIGNED')
+        self.assertEqual((notification.project, notification.message), (self.project, 'You were assigned to "Card"'))
+
+    def test_completing_a_task_does_not_notify_whoever_completed_it(self):
+        TaskAssignment.objects.create(task=self.task, user=self.collaborator, assigned_by=self.manager)
+        api = APIClient()
+        api.force_authenticate(self.collaborator)
+        with self.captureOnCommitCallbacks(execute=True):
+            api.post(reverse('task_move', args=[self.task.id]), {'status': 'DONE'}, format='json')
+        self.assertEqual(self.inbox('TASK_COMPLETED'), ['client@example.com', 'manager@example.com'])
+
+        Notification.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            api.patch(reverse('task_detail', args=[self.task.id]), {'status': 'TODO'}, format='json')
+            api.patch(reverse('task_detail', args=[self.task.id]), {'status': 'DONE'}, format='json')
+        self.assertEqual(self.inbox('TASK_COMPLETED'), ['client@example.com', 'manager@example.com'])
+
+        Notification.objects.all().delete()
+        Task.objects.filter(pk=self.task.pk).update_status('TODO')
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.filter(pk=self.task.pk).update_status('DONE', actor=self.manager)
+        self.assertEqual(self.inbox('TASK_COMPLETED'), ['client@example.com', 'collab@example.com'])
+
+    def test_duplicates_coalesce_into_one_bulk_insert(self):
+        dispatcher = NotificationDispatcher()
+        for _ in range(3):
+            dispatcher.add(NotificationEvent('COMMENT_ADDED', self.task.id, None, self.manager.id, None))
+        dispatcher.add(NotificationEvent('TASK_ASSIGNED', self.task.id, None, self.manager.id, frozenset([self.collaborator.id])))
+        dispatcher.add(NotificationEvent('TASK_ASSIGNED', self.task.id, None, self.manager.id, frozenset([self.client_user.id])))
+        # Tasks, projects, one recipient lookup and the insert
+        with self.assertNumQueries(4):
+            created = dispatcher.drain()
+        self.assertEqual(len(created), 3)
+        self.assertEqual(self.inbox('COMMENT_ADDED'), ['client@example.com'])
+        self.assertEqual(self.inbox('TASK_ASSIGNED'), ['client@example.com', 'collab@example.com'])
+        self.assertEqual(dispatcher.drain(), [])
+
+
+    def test_followers_and_explicit_recipients_of_one_event_merge(self):
+        other_task = Task.objects.create(
+            title='Other', description='...', project=self.project, created_by=self.collaborator,
+            due_date=timezone.now() + timedelta(days=3)
+        )
+        dispatcher = NotificationDispatcher()
+        dispatcher.add(NotificationEvent('TASK_COMPLETED', self.task.id, None, None, None))
+        dispatcher.add(NotificationEvent('TASK_COMPLETED', self.task.id, None, None, frozenset([self.collaborator.id])))
+        dispatcher.add(NotificationEvent('TASK_COMPLETED', self.task.id, None, None, None))
+        dispatcher.add(NotificationEvent('TASK_COMPLETED', other_task.id, None, None, None))
+        # Followers of both tasks come from one recipient lookup
+        with self.assertNumQueries(4):
+            created = dispatcher.drain()
+        self.assertEqual(
+            sorted((notification.task_id, notification.user.email) for notification in created),
+            [(self.task.id, 'client@example.com'), (self.task.id, 'collab@example.com'),
+             (self.task.id, 'manager@example.com'), (other_task.id, 'client@example.com'),
+             (other_task.id, 'collab@example.com')]
+        )
+
+
+class NotificationInboxTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='user@example.com', role='MANAGER')
+        other = CustomUser.objects.create_user(email='other@example.com', role='MANAGER')
+        Notification.objects.bulk_create([
+            Notification(
+                user=user, title=f'N{i}', message='...', notification_type='SYSTEM', is_read=i >= 3
+            )
+            for user in (self.user, other) for i in range(5)
+        ])
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def unread_count(self):
+        response = self.api.get(reverse('unread_notification_count'))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_unread_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.unread_count(), {'unread_count': 3, 'capped': False})
+        self.assertIn('LIMIT', ctx.captured_queries[-1]['sql'])
+
+    def test_unread_count_is_capped(self):
+        with patch.object(UnreadNotificationCountView, 'max_count', 2):
+            self.assertEqual(self.unread_count(), {'unread_count': 2, 'capped': True})
+
+    def bulk(self, name, **data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post(reverse(name), data, format='json')
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def test_bulk_read_is_one_update_of_unread_rows(self):
+        response, queries = self.bulk('bulk_read_notifications', before=timezone.now().isoformat())
+        self.assertEqual(response.data, {'updated': 3})
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0].startswith('UPDATE'))
+        self.assertEqual(self.unread_count()['unread_count'], 0)
+        # Other users' inboxes are untouched
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 3)
+
+    def test_bulk_selection_combines_criteria(self):
+        first, second = self.user.notifications.order_by('id').values_list('id', flat=True)[:2]
+        Notification.objects.filter(id=first).update(notification_type='COMMENT_ADDED')
+        response, _ = self.bulk(
+            'bulk_read_notifications', ids=[first, second], notification_type='COMMENT_ADDED'
+        )
+        self.assertEqual(response.data, {'updated': 1})
+        self.assertEqual(self.unread_count()['unread_count'], 2)
+
+    def test_bulk_dismiss_deletes_in_one_statement(self):
+        ids = list(self.user.notifications.values_list('id', flat=True))
+        response, queries = self.bulk('bulk_dismiss_notifications', ids=ids)
+        self.assertEqual(response.data, {'deleted': 5})
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(self.user.notifications.exists())
+
+    def test_bulk_action_needs_a_selection(self):
+        response, queries = self.bulk('bulk_read_notifications')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(queries, [])
+
+    def test_mark_single_notification_read(self):
+        notification = self.user.notifications.filter(is_read=False).first()
+        with self.assertNumQueries(1):
+            response = self.api.post(reverse('mark_notification_read', args=[notification.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread_count()['unread_count'], 2)
+        other = Notification.objects.exclude(user=self.user).first()
+        response = self.api.post(reverse('mark_notification_read', args=[other.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ActivityLogBufferTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.project = Project.objects.create(
+            name='Audit', description='...', created_by=self.manager,
+            client=client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+        # Flushed by hand in the tests; a writer thread would write outside the test transaction
+        self.buffer = ActivityBuffer()
+        self.buffer.start = lambda: None
+
+    def tearDown(self):
+        self.buffer.stop()
+
+    def entry(self, action='TASK_CREATED', **fields):
+        return ActivityLog(user=self.manager, action=action, description='...', **fields)
+
+    @override_settings(ACTIVITY_LOG_BUFFERED=False)
+    def test_unbuffered_entries_are_written_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post(reverse('task_list'), {
+                'title': 'Audited', 'description': '...', 'project': self.project.id,
+                'due_date': (timezone.now() + timedelta(days=3)).isoformat(),
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        entry = ActivityLog.objects.get()
+        self.assertEqual((entry.action, entry.project, entry.ip_address), ('TASK_CREATED', self.project, '127.0.0.1'))
+
+    @override_settings(ACTIVITY_LOG_BUFFERED=True, ACTIVITY_LOG_BATCH_SIZE=2, ACTIVITY_LOG_MAX_BUFFERED=3)
+    def test_buffer_flushes_in_batches_and_counts_drops(self):
+        buffer = self.buffer
+        for _ in range(4):
+            buffer.append(self.entry())
+        self.assertEqual(ActivityLog.objects.count(), 0)
+        with self.assertNumQueries(2):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        self.assertEqual(buffer.stats, {'flushed': 3, 'dropped': 1, 'failed': 0})
+
+    @override_settings(ACTIVITY_LOG_BUFFERED=True, ACTIVITY_LOG_FLUSH_INTERVAL=60)
+    def test_stop_ends_the_writer_thread_and_drains_the_buffer(self):
+        buffer = ActivityBuffer()
+        written = []
+        buffer.write = lambda batch: (written.extend(batch) or len(batch), [])
+        buffer.append(self.entry())
+        worker = buffer.worker
+        self.assertTrue(worker.is_alive())
+        buffer.append(self.entry())
+        buffer.stop()
+        self.assertFalse(worker.is_alive())
+        self.assertEqual((len(written), len(buffer.entries)), (2, 0))
+
+    def database_down(self, side_effect=OperationalError('server closed the connection')):
+        return patch.object(ActivityLog.objects, 'bulk_create', side_effect=side_effect)
+
+    @override_settings(ACTIVITY_LOG_BUFFERED=True, ACTIVITY_LOG_BATCH_SIZE=2, ACTIVITY_LOG_MAX_BUFFERED=3)
+    def test_database_errors_keep_the_batch_for_the_next_flush(self):
+        buffer = self.buffer
+        for _ in range(3):
+            buffer.append(self.entry())
+        with self.database_down(), self.assertLogs('tasks.activity', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(len(buffer.entries), 3)
+
+        # An entry logged while the batch was out leaves room for only one of its two
+        def log_and_fail(batch):
+            buffer.append(self.entry())
+            raise OperationalError('server closed the connection')
+        with self.database_down(log_and_fail), self.assertLogs('tasks.activity', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.stats, {'flushed': 0, 'dropped': 0, 'failed': 1})
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        self.assertEqual(buffer.stats, {'flushed': 3, 'dropped': 0, 'failed': 1})
+
+    @override_settings(ACTIVITY_LOG_BUFFERED=False)
+    def test_unbuffered_database_errors_count_as_failed(self):
+        with self.database_down(), self.assertLogs('tasks.activity', 'ERROR'):
+            self.buffer.append(self.entry())
+        self.assertEqual(self.buffer.stats, {'flushed': 0, 'dropped': 0, 'failed': 1})
+
+    def test_entries_keep_the_time_of_the_action(self):
+        entry = self.entry()
+        logged_at = entry.created_at
+        self.buffer.write([entry])
+        self.assertEqual(ActivityLog.objects.get().created_at, logged_at)
+
+
+class ActivityLogRetentionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN')
+
+    def log(self, days_ago, action='TASK_CREATED', severity='INFO'):
+        return ActivityLog.objects.create(
+            user=self.user, action=action, description='...', category=category_for(action),
+            severity=severity, created_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_system_issues_count_recent_errors_by_severity(self):
+        self.log(1, 'EMAIL_FAILED', severity='ERROR')
+        self.log(30, 'EMAIL_FAILED', severity='ERROR')
+        # The action text no longer matters
+        self.log(1, 'LOGIN_ERROR_PAGE_VIEWED')
+        self.assertEqual(get_dashboard_stats(self.user)['system_issues'], 1)
+
+    @override_settings(ACTIVITY_LOG_BUFFERED=False)
+    def test_logged_error_actions_count_as_system_issues(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            log_activity(self.user, 'EMAIL_ERROR', 'SMTP server refused the connection')
+            log_activity(self.user, 'LOGIN_ERROR_PAGE_VIEWED')
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('action', 'severity')),
+            [('EMAIL_ERROR', 'ERROR'), ('LOGIN_ERROR_PAGE_VIEWED', 'INFO')]
+        )
+        self.assertEqual(get_dashboard_stats(self.user)['system_issues'], 1)
+
+    def test_categories_follow_action_prefix(self):
+        self.assertEqual(
+            [category_for(action) for action in ['LOGIN_ERROR', 'PROJECT_CREATED', 'TASKS_BULK_CREATED', 'BACKUP']],
+            ['AUTH', 'PROJECT', 'TASK', 'SYSTEM']
+        )
+
+    def test_prune_deletes_expired_entries_in_chunks(self):
+        for days_ago in [400, 380, 370, 10]:
+            self.log(days_ago)
+        out = StringIO()
+        call_command('prune_activity_log', days=365, chunk_size=2, stdout=out)
+        self.assertIn('Deleted 3 entries', out.getvalue())
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_prune_rejects_empty_retention(self):
+        with self.assertRaises(CommandError):
+            call_command('prune_activity_log', days=0, stdout=StringIO())
+
+    def test_monthly_partition_names(self):
+        month = month_start(timezone.now().replace(year=2025, month=12, day=15))
+        self.assertEqual(partition_name(month), 'tasks_activitylog_p202512')
+        self.assertEqual(partition_name(add_months(month, 1)), 'tasks_activitylog_p202601')
+        self.assertEqual(partition_month('tasks_activitylog_p202601'), add_months(month, 1))
+        self.assertIsNone(partition_month('tasks_activitylog_default'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'ActivityLog is partitioned on PostgreSQL only')
+class ActivityLogPartitionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='admin@example.com', role='ADMIN')
+        self.month = month_start(timezone.now())
+
+    def log(self, moment):
+        return ActivityLog.objects.create(user=self.user, action='TASK_CREATED', created_at=moment)
+
+    def partition_of(self, entry):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM tasks_activitylog WHERE id = %s', [entry.pk])
+            return cursor.fetchone()[0]
+
+    def table_exists(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+            return cursor.fetchone()[0]
+
+    def test_entries_land_in_their_month(self):
+        self.assertTrue(is_partitioned(connection))
+        entry = self.log(timezone.now())
+        self.assertEqual(self.partition_of(entry), partition_name(self.month))
+
+    def test_new_month_takes_its_rows_from_the_default_partition(self):
+        month = add_months(self.month, 24)
+        entry = self.log(month + timedelta(days=2))
+        self.assertEqual(self.partition_of(entry), DEFAULT_PARTITION)
+        self.assertEqual(create_partitions(connection, month, month), [partition_name(month)])
+        self.assertEqual(self.partition_of(entry), partition_name(month))
+        self.assertTrue(self.table_exists(DEFAULT_PARTITION))
+        self.assertEqual(create_partitions(connection, month, month), [])
+
+    def test_expired_months_are_detached_or_dropped(self):
+        old = add_months(self.month, -24)
+        create_partitions(connection, old, add_months(old, 1))
+        entry = self.log(old + timedelta(days=2))
+
+        self.assertEqual(remove_partitions_before(connection, add_months(old, 1), detach=True), [partition_name(old)])
+        self.assertFalse(ActivityLog.objects.filter(pk=entry.pk).exists())
+        self.assertTrue(self.table_exists(partition_name(old)))
+
+        following = add_months(old, 1)
+        self.assertEqual(remove_partitions_before(connection, add_months(old, 2)), [partition_name(following)])
+        self.assertFalse(self.table_exists(partition_name(following)))
+        self.assertIn(partition_name(self.month), [name for name, _ in partitions(connection)])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.manager = CustomUser.objects.create_user(email='manager@example.com', role='MANAGER')
+        self.collaborator = CustomUser.objects.create_user(email='collab@example.com', role='COLLABORATOR')
+        self.client_user = CustomUser.objects.create_user(email='client@example.com', role='CLIENT')
+        self.outsider = CustomUser.objects.create_user(email='other@example.com', role='MANAGER')
+        self.project = Project.objects.create(
+            name='Invoicing rewrite', description='Replace the legacy billing engine',
+            created_by=self.manager, client=self.client_user, start_date=timezone.now().date(),
+            end_date=timezone.now().date() + timedelta(days=30)
+        )
+        ProjectAssignment.objects.create(
+            project=self.project, user=self.collaborator,
+            assigned_by=self.manager, role_in_project='COLLABORATOR'
+        )
+        self.assigned_task = Task.objects.create(
+            title='Export invoices', description='Write the <csv> exporter',
+            project=self.project, created_by=self.manager, due_date=timezone.now() + timedelta(days=3)
+        )
+        TaskAssignment.objects.create(task=self.assigned_task, user=self.collaborator, assigned_by=self.manager)
+        self.other_task = Task.objects.create(
+            title='Tax rules', description='Billing tax rules per country, invoices included',
+            project=self.project, created_by=self.manager, due_date=timezone.now() + timedelta(days=3)
+        )
+        self.comment = TaskComment.objects.create(
+            task=self.other_task, user=self.manager, content='Invoices must round half up'
+        )
+        self.api = APIClient()
+
+    def search(self, user, **params):
+        self.api.force_authenticate(user)
+        response = self.api.get(reverse('search'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def hits(self, user, q, **params):
+        return [(hit['type'], hit['id']) for hit in self.search(user, q=q, **params)['results']]
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 index on SQLite')
+    def test_fts_table_is_matched_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.search(self.manager, q='invoices')
+        ranking = next(
+            query['sql'] for query in ctx.captured_queries
+            if 'MATCH' in query['sql'] and 'ORDER BY' in query['sql']
+        )
+        self.assertEqual(ranking.count('MATCH'), 1)
+        self.assertNotIn('bm25(', ranking)
+
+    def test_results_are_ranked_and_highlighted(self):
+        results = self.search(self.manager, q='invoices')['results']
+        # A title match outranks matches in the body
+        self.assertEqual((results[0]['type'], results[0]['id']), ('task', self.assigned_task.id))
+        self.assertEqual(results[0]['title'], 'Export <mark>invoices</mark>')
+        self.assertEqual(results[0]['snippet'], 'Write the &lt;csv&gt; exporter')
+        self.assertCountEqual(
+            [(hit['type'], hit['id']) for hit in results],
+            [('project', self.project.id), ('task', self.assigned_task.id),
+             ('task', self.other_task.id), ('comment', self.comment.id)]
+        )
+        self.assertEqual(
+            [hit['rank'] for hit in results], sorted((hit['rank'] for hit in results), reverse=True)
+        )
+
+    def test_results_follow_visibility(self):
+        self.assertEqual(self.hits(self.outsider, 'invoices'), [])
+        # Collaborators only see their own tasks, and no comments of other tasks
+        self.assertCountEqual(
+            self.hits(self.collaborator, 'invoices'),
+            [('project', self.project.id), ('task', self.assigned_task.id)]
+        )
+        self.assertEqual(len(self.hits(self.client_user, 'invoices')), 4)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.hits(self.manager, 'spreadsheet'), [])
+        self.assigned_task.description = 'Spreadsheet export'
+        self.assigned_task.save()
+        self.assertEqual(self.hits(self.manager, 'spreadsheet'), [('task', self.assigned_task.id)])
+
+        # Saves of other fields leave the entry alone
+        with CaptureQueriesContext(connection) as ctx:
+            self.assigned_task.save(update_fields=['priority'])
+        self.assertFalse(any('searchentry' in query['sql'] for query in ctx.captured_queries))
+
+        self.comment.delete()
+        self.other_task.delete()
+        self.assertEqual(self.hits(self.manager, 'tax'), [])
+        self.assertEqual(SearchEntry.objects.count(), 2)
+
+    def test_filter_and_pagination(self):
+        self.assertEqual(self.hits(self.manager, 'invoices', type='comment'), [('comment', self.comment.id)])
+        first = self.search(self.manager, q='invoices', page_size=3)
+        self.assertEqual((len(first['results']), first['next_page']), (3, 2))
+        second = self.search(self.manager, q='invoices', page_size=3, page=2)
+        self.assertEqual((len(second['results']), second['next_page']), (1, None))
+
+    def test_prefix_terms_and_operators_in_input(self):
+        self.assertEqual(self.hits(self.manager, 'export'), [('task', self.assigned_task.id)])
+        self.assertEqual(len(self.hits(self.manager, 'invoic')), 4)
+        self.assertEqual(len(self.hits(self.manager, '("invoices*')), 4)
+        self.assertEqual(self.hits(self.manager, '!!!'), [])
+
+    def test_invalid_requests(self):
+        self.api.force_authenticate(self.manager)
+        self.assertEqual(self.api.get(reverse('search')).status_code, 400)
+        self.assertEqual(self.api.get(reverse('search'), {'q': 'x', 'type': 'user'}).status_code, 400)
+
+    def test_rebuild_command_restores_entries(self):
+        SearchEntry.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.hits(self.manager, 'invoices')), 4)
+
+    def test_render_highlight_escapes_text(self):
+        self.assertEqual(render_highlight('<b>⟦a&b⟧</b> ⟦'), '&lt;b&gt;<mark>a&amp;b</mark>&lt;/b&gt; ')
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Locmem backend counting connections and refusing recipients at bounce.example"""
+    opened = 0
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any(to.endswith('@bounce.example') for message in messages for to in message.to):
+            raise ConnectionError('Recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(OUTBOX_RETRY_BASE_SECONDS=60, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='user@example.com', role='MANAGER')
+        FlakyEmailBackend.opened = 0
+
+    def test_forgot_password_only_enqueues(self):
+        response = APIClient().post(reverse('forgot_password'), {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.recipients), ('PENDING', [self.user.email]))
+
+        call_command('send_outbound_email', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(PasswordResetCode.objects.get(user=self.user).code, mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('SENT', 1))
+        self.assertIsNotNone(email.sent_at)
+
+    def test_failed_enqueue_keeps_the_old_code(self):
+        old = PasswordResetCode.objects.create(user=self.user)
+        with patch('tasks.views.enqueue_email', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            APIClient().post(reverse('forgot_password'), {'email': self.user.email}, format='json')
+        self.assertEqual(list(PasswordResetCode.objects.filter(user=self.user, is_used=False)), [old])
+
+    @override_settings(EMAIL_BACKEND='tasks.tests.FlakyEmailBackend')
+    def test_batch_shares_one_connection(self):
+        for i in range(5):
+            enqueue_email(f'Subject {i}', '...', [f'user{i}@example.com'])
+        self.assertEqual(deliver_outbox(batch_size=10), 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+
+    @override_settings(EMAIL_BACKEND='tasks.tests.FlakyEmailBackend')
+    def test_failures_back_off_then_dead_letter(self):
+        bounced = enqueue_email('Bounce', '...', ['someone@bounce.example'])
+        delivered = enqueue_email('Fine', '...', ['someone@example.com'])
+        deliver_outbox()
+        bounced.refresh_from_db()
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.status, 'SENT')
+        self.assertEqual((bounced.status, bounced.attempts), ('PENDING', 1))
+        self.assertIn('Recipient refused', bounced.last_error)
+        # Not due again until the backoff has passed, and the backoff doubles
+        self.assertEqual(deliver_outbox(), 0)
+        for attempt, delay in [(2, 120), (3, None)]:
+            OutboundEmail.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+            started = timezone.now()
+            deliver_outbox()
+            bounced.refresh_from_db()
+            self.assertEqual(bounced.attempts, attempt)
+            if delay is not None:
+                self.assertGreaterEqual(bounced.next_attempt_at, started + timedelta(seconds=delay))
+        self.assertEqual(bounced.status, 'DEAD')
+        self.assertEqual(deliver_outbox(), 0)
+
+        call_command('send_outbound_email', '--once', '--requeue-dead', stdout=StringIO())
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('PENDING', 1))
+
+    def test_claimed_emails_are_leased(self):
+        enqueue_email('Subject', '...', ['someone@example.com'])
+        self.assertEqual(len(claim_batch(10)), 1)
+        # A second worker finds nothing until the lease runs out
+        self.assertEqual(claim_batch(10), [])
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(claim_batch(10)), 1)
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+])
+class EmailBackendTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='secret', role='MANAGER')
+
+    def attempt(self, email, password):
+        with patch.object(
+            MD5PasswordHasher, 'encode', autospec=True, side_effect=MD5PasswordHasher.encode
+        ) as encode:
+            user = EmailBackend().authenticate(None, username=email, password=password)
+        return user, encode.call_count
+
+    def test_every_outcome_costs_one_hash(self):
+        self.assertEqual(self.attempt('user@example.com', 'secret'), (self.user, 1))
+        self.assertEqual(self.attempt('user@example.com', 'wrong'), (None, 1))
+        self.assertEqual(self.attempt('nobody@example.com', 'secret'), (None, 1))
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.attempt('user@example.com', 'secret'), (None, 1))
+
+    def test_outdated_hash_is_replaced_on_login(self):
+        hasher = PBKDF2PasswordHasher()
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            password=hasher.encode('secret', hasher.salt(), iterations=1000)
+        )
+        self.assertEqual(EmailBackend().authenticate(None, username='user@example.com', password='wrong'), None)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+        self.assertIsNotNone(EmailBackend().authenticate(None, username='user@example.com', password='secret'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('md5$'))
+        self.assertTrue(self.user.check_password('secret'))
+
+    def test_debug_log_has_outcome_but_no_credentials(self):
+        with self.assertLogs('tasks.auth', 'DEBUG') as logs:
+            EmailBackend().authenticate(None, username='user@example.com', password='wrong')
+        self.assertEqual(logs.records[0].auth_outcome, 'bad_password')
+        self.assertEqual(logs.records[0].auth_user_id, self.user.pk)
+        self.assertNotIn('wrong', logs.output[0])
+        self.assertNotIn('user@example.com', logs.output[0])
+
+    def test_login_benchmark(self):
+        report = run_login_benchmark(iterations=2, warmup=0)
+        self.assertEqual(report['hasher'], 'md5')
+        self.assertEqual(
+            [result['scenario'] for result in report['results']], ['success', 'bad_password', 'unknown_user']
+        )
+        self.assertTrue(all(result['logins_per_second'] > 0 for result in report['results']))
+        # The benchmark user is rolled back
+        self.assertFalse(benchmark_users().exists())
 
-# Create your tests here.
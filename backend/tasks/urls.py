@@ -2,8 +2,9 @@ from django.urls import path
 from .views import (
     CustomTokenObtainPairView, DashboardStatsView, RecentTasksView, ActiveProjectsView,
     UserListView, UserDetailView, ProjectListView, ProjectDetailView,
-    TaskListView, TaskDetailView, KanbanBoardView, AvailableUsersView,
-    NotificationListView, MarkNotificationReadView,
+    TaskListView, TaskDetailView, TaskMoveView, TaskBulkCreateView, KanbanBoardView, AvailableUsersView,
+    NotificationListView, UnreadNotificationCountView, MarkNotificationReadView,
+    BulkMarkNotificationsReadView, BulkDismissNotificationsView, SearchView, MetricsView,
     ForgotPasswordView, VerifyResetCodeView, ChangePasswordView
 )
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -34,8 +35,19 @@ urlpatterns = [
     # Task Management
     path('tasks/', TaskListView.as_view(), name='task_list'),
     path('tasks/<int:pk>/', TaskDetailView.as_view(), name='task_detail'),
+    path('tasks/<int:pk>/move/', TaskMoveView.as_view(), name='task_move'),
+    path('tasks/bulk/', TaskBulkCreateView.as_view(), name='task_bulk_create'),
     
     # Notifications
     path('notifications/', NotificationListView.as_view(), name='notification_list'),
+    path('notifications/unread-count/', UnreadNotificationCountView.as_view(), name='unread_notification_count'),
+    path('notifications/read/', BulkMarkNotificationsReadView.as_view(), name='bulk_read_notifications'),
+    path('notifications/dismiss/', BulkDismissNotificationsView.as_view(), name='bulk_dismiss_notifications'),
     path('notifications/<int:notification_id>/read/', MarkNotificationReadView.as_view(), name='mark_notification_read'),
-]
\ No newline at end of file
+    
+    # Search
+    path('search/', SearchView.as_view(), name='search'),
+    
+    # Monitoring
+    path('metrics', MetricsView.as_view(), name='metrics'),
+]
@@ -2,25 +2,39 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Q
 from datetime import timedelta
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.http import HttpResponse
 from django.conf import settings
 import bcrypt
 
 from .models import (
     CustomUser, Project, Task, ProjectAssignment, TaskAssignment, 
-    TaskComment, ActivityLog, Notification, PasswordResetCode
+    TaskComment, Notification, PasswordResetCode, SearchEntry
 )
 from .serializers import (
     EmailTokenObtainPairSerializer, UserSerializer, UserCreateSerializer,
     ProjectSerializer, ProjectCreateSerializer, TaskSerializer, 
     TaskCreateSerializer, TaskUpdateSerializer, NotificationSerializer,
-    ActivityLogSerializer, AvailableUserSerializer
+    ActivityLogSerializer, AvailableUserSerializer, KanbanTaskSerializer,
+    TaskMoveSerializer, NotificationSelectionSerializer
+)
+from .kanban import get_board_tasks, bucket_tasks_by_status, move_task
+from .access import visible_projects, visible_tasks
+from .pagination import KeysetPagination
+from .bulk import MAX_BULK_TASKS, bulk_create_tasks
+from .metrics import REGISTRY
+from .activity import log_activity
+from .outbox import enqueue_email
+from .search import search
+from .conditional import (
+    active_projects_state, conditional_get, dashboard_stats_state, project_state,
+    recent_tasks_state, task_list_state
 )
 
 User = get_user_model()
@@ -48,131 +62,37 @@ class LoginView(APIView):
 class DashboardStatsView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(dashboard_stats_state)
     def get(self, request):
-        user = request.user
-        
-        # Base stats that will be customized by role
-        stats = {}
-        
-        if user.role == 'ADMIN':
-            stats = {
-                'total_users': User.objects.count(),
-                'active_projects': Project.objects.filter(status='ACTIVE').count(),
-                'total_tasks': Task.objects.count(),
-                'completed_tasks': Task.objects.filter(status='DONE').count(),
-                'system_issues': ActivityLog.objects.filter(
-                    action__icontains='error',
-                    created_at__gte=timezone.now() - timedelta(days=7)
-                ).count()
-            }
-        
-        elif user.role == 'MANAGER':
-            user_projects = Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user)
-            ).distinct()
-            
-            stats = {
-                'managed_projects': user_projects.count(),
-                'active_projects': user_projects.filter(status='ACTIVE').count(),
-                'team_tasks': Task.objects.filter(project__in=user_projects).count(),
-                'completed_tasks': Task.objects.filter(
-                    project__in=user_projects, 
-                    status='DONE'
-                ).count(),
-                'overdue_tasks': Task.objects.filter(
-                    project__in=user_projects,
-                    due_date__lt=timezone.now(),
-                    status__in=['TODO', 'IN_PROGRESS']
-                ).count()
-            }
-        
-        elif user.role == 'COLLABORATOR':
-            user_tasks = Task.objects.filter(assigned_to=user)
-            
-            stats = {
-                'my_tasks': user_tasks.count(),
-                'completed_tasks': user_tasks.filter(status='DONE').count(),
-                'in_progress': user_tasks.filter(status='IN_PROGRESS').count(),
-                'pending_tasks': user_tasks.filter(status='TODO').count(),
-                'overdue_tasks': user_tasks.filter(
-                    due_date__lt=timezone.now(),
-                    status__in=['TODO', 'IN_PROGRESS']
-                ).count()
-            }
-        
-        elif user.role == 'CLIENT':
-            client_projects = Project.objects.filter(client=user)
-            
-            stats = {
-                'my_projects': client_projects.count(),
-                'active_projects': client_projects.filter(status='ACTIVE').count(),
-                'completed_projects': client_projects.filter(status='COMPLETED').count(),
-                'total_tasks': Task.objects.filter(project__in=client_projects).count(),
-                'pending_review': Task.objects.filter(
-                    project__in=client_projects,
-                    status='IN_REVIEW'
-                ).count()
-            }
-        
-        return Response({'stats': stats})
+        # Each role's numbers come from a single query and are cached per user;
+        # dashboard_stats_state has fetched them already
+        return Response({'stats': self.stats})
 
 class RecentTasksView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(recent_tasks_state)
     def get(self, request):
-        user = request.user
-        
-        if user.role == 'ADMIN':
-            tasks = Task.objects.all()[:10]
-        elif user.role == 'MANAGER':
-            user_projects = Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user)
-            ).distinct()
-            tasks = Task.objects.filter(project__in=user_projects)[:10]
-        elif user.role == 'COLLABORATOR':
-            tasks = Task.objects.filter(assigned_to=user)[:10]
-        elif user.role == 'CLIENT':
-            client_projects = Project.objects.filter(client=user)
-            tasks = Task.objects.filter(project__in=client_projects)[:10]
-        else:
-            tasks = Task.objects.none()
-        
-        serializer = TaskSerializer(tasks, many=True)
+        tasks = TaskSerializer.optimize_queryset(visible_tasks(request.user), request)[:10]
+        serializer = TaskSerializer(tasks, many=True, context={'request': request})
         return Response({'tasks': serializer.data})
 
 class ActiveProjectsView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(active_projects_state)
     def get(self, request):
-        user = request.user
-        
-        if user.role == 'ADMIN':
-            projects = Project.objects.filter(status='ACTIVE')[:5]
-        elif user.role == 'MANAGER':
-            projects = Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user),
-                status='ACTIVE'
-            ).distinct()[:5]
-        elif user.role == 'COLLABORATOR':
-            projects = Project.objects.filter(
-                assigned_users=user,
-                status='ACTIVE'
-            )[:5]
-        elif user.role == 'CLIENT':
-            projects = Project.objects.filter(
-                client=user,
-                status='ACTIVE'
-            )[:5]
-        else:
-            projects = Project.objects.none()
-        
-        serializer = ProjectSerializer(projects, many=True)
+        projects = visible_projects(request.user).filter(status='ACTIVE').with_task_counters()
+        projects = ProjectSerializer.optimize_queryset(projects, request)[:5]
+        serializer = ProjectSerializer(projects, many=True, context={'request': request})
         return Response({'projects': serializer.data})
 
 # User Management Views (Admin only)
 class UserListView(generics.ListCreateAPIView):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-date_joined']
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -182,7 +102,8 @@ class UserListView(generics.ListCreateAPIView):
     def get_queryset(self):
         if self.request.user.role != 'ADMIN':
             return User.objects.none()
-        return User.objects.all()
+        # project_count reads the annotation instead of counting per user
+        return User.objects.with_workload()
 
 class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
@@ -192,11 +113,14 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         if self.request.user.role != 'ADMIN':
             return User.objects.none()
-        return User.objects.all()
+        # project_count reads the annotation instead of counting per user
+        return User.objects.with_workload()
 
 # Project Management Views
 class ProjectListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at']
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -204,47 +128,51 @@ class ProjectListView(generics.ListCreateAPIView):
         return ProjectSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'ADMIN':
-            return Project.objects.all()
-        elif user.role == 'MANAGER':
-            return Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user)
-            ).distinct()
-        elif user.role == 'COLLABORATOR':
-            return Project.objects.filter(assigned_users=user)
-        elif user.role == 'CLIENT':
-            return Project.objects.filter(client=user)
-        else:
-            return Project.objects.none()
+        queryset = visible_projects(self.request.user).with_task_counters()
+        if self.request.method == 'GET':
+            queryset = ProjectSerializer.optimize_queryset(queryset, self.request)
+        return queryset
     
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        project = serializer.save(created_by=self.request.user)
+        log_activity(
+            self.request.user, 'PROJECT_CREATED', f'Created project "{project.name}"',
+            project=project, request=self.request
+        )
 
 class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'ADMIN':
-            return Project.objects.all()
-        elif user.role == 'MANAGER':
-            return Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user)
-            ).distinct()
-        elif user.role in ['COLLABORATOR', 'CLIENT']:
-            return Project.objects.filter(
-                Q(assigned_users=user) | Q(client=user)
-            ).distinct()
-        else:
-            return Project.objects.none()
+        queryset = visible_projects(self.request.user).with_task_counters()
+        if self.request.method == 'GET':
+            queryset = ProjectSerializer.optimize_queryset(queryset, self.request)
+        return queryset
+    
+    @conditional_get(project_state)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
+    def perform_update(self, serializer):
+        project = serializer.save()
+        log_activity(
+            self.request.user, 'PROJECT_UPDATED', f'Updated project "{project.name}"',
+            project=project, request=self.request
+        )
+    
+    def perform_destroy(self, instance):
+        log_activity(
+            self.request.user, 'PROJECT_DELETED', f'Deleted project "{instance.name}"',
+            request=self.request
+        )
+        instance.delete()
 
 # Task Management Views
 class TaskListView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['position', '-created_at']
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -252,31 +180,26 @@ class TaskListView(generics.ListCreateAPIView):
         return TaskSerializer
     
     def get_queryset(self):
-        user = self.request.user
         project_id = self.request.query_params.get('project_id')
-        
-        if user.role == 'ADMIN':
-            queryset = Task.objects.all()
-        elif user.role == 'MANAGER':
-            user_projects = Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user)
-            ).distinct()
-            queryset = Task.objects.filter(project__in=user_projects)
-        elif user.role == 'COLLABORATOR':
-            queryset = Task.objects.filter(assigned_to=user)
-        elif user.role == 'CLIENT':
-            client_projects = Project.objects.filter(client=user)
-            queryset = Task.objects.filter(project__in=client_projects)
-        else:
-            queryset = Task.objects.none()
+        queryset = visible_tasks(self.request.user)
         
         if project_id:
             queryset = queryset.filter(project_id=project_id)
         
+        if self.request.method == 'GET':
+            queryset = TaskSerializer.optimize_queryset(queryset, self.request)
         return queryset
     
+    @conditional_get(task_list_state)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        task = serializer.save(created_by=self.request.user)
+        log_activity(
+            self.request.user, 'TASK_CREATED', f'Created task "{task.title}"',
+            project=task.project_id, task=task, request=self.request
+        )
 
 class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
@@ -287,57 +210,124 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
         return TaskSerializer
     
     def get_queryset(self):
-        user = self.request.user
+        queryset = visible_tasks(self.request.user)
+        if self.request.method == 'GET':
+            queryset = TaskSerializer.optimize_queryset(queryset, self.request)
+        return queryset
+    
+    def perform_update(self, serializer):
+        task = serializer.save(actor=self.request.user)
+        log_activity(
+            self.request.user, 'TASK_UPDATED', f'Updated task "{task.title}"',
+            project=task.project_id, task=task, request=self.request
+        )
+    
+    def perform_destroy(self, instance):
+        log_activity(
+            self.request.user, 'TASK_DELETED', f'Deleted task "{instance.title}"',
+            project=instance.project_id, request=self.request
+        )
+        instance.delete()
+
+class TaskMoveView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, pk):
+        try:
+            task = visible_tasks(request.user).get(pk=pk)
+        except Task.DoesNotExist:
+            return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        serializer = TaskMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target_status = serializer.validated_data['status']
+        
+        # Neighbours must already be cards of the target column
+        neighbours = {}
+        for field in ['after_id', 'before_id']:
+            neighbour_id = serializer.validated_data.get(field)
+            if neighbour_id is None:
+                continue
+            neighbour = Task.objects.filter(
+                id=neighbour_id, project_id=task.project_id, status=target_status
+            ).exclude(id=task.id).only('id', 'position', 'created_at').first()
+            if neighbour is None:
+                return Response(
+                    {field: ['Not a card of the target column.']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            neighbours[field] = neighbour
         
-        if user.role == 'ADMIN':
-            return Task.objects.all()
-        elif user.role == 'MANAGER':
-            user_projects = Project.objects.filter(
-                Q(created_by=user) | Q(assigned_users=user)
-            ).distinct()
-            return Task.objects.filter(project__in=user_projects)
-        elif user.role == 'COLLABORATOR':
-            return Task.objects.filter(assigned_to=user)
-        elif user.role == 'CLIENT':
-            client_projects = Project.objects.filter(client=user)
-            return Task.objects.filter(project__in=client_projects)
+        task, rebalanced = move_task(
+            task, target_status,
+            after=neighbours.get('after_id'),
+            before=neighbours.get('before_id'),
+            actor=request.user
+        )
+        log_activity(
+            request.user, 'TASK_MOVED', f'Moved task "{task.title}" to {task.status}',
+            project=task.project_id, task=task, request=request
+        )
+        return Response({
+            'id': task.id,
+            'status': task.status,
+            'position': task.position,
+            'completed_at': task.completed_at,
+            'rebalanced': rebalanced,
+        })
+
+class TaskBulkCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        # Accept a bare list of tasks or {"tasks": [...], "atomic": true}
+        payload = request.data
+        atomic = False
+        if isinstance(payload, dict):
+            atomic = str(payload.get('atomic', '')).lower() in ('1', 'true')
+            payload = payload.get('tasks')
+        if not isinstance(payload, list) or not payload:
+            return Response({'error': 'Expected a non-empty list of tasks'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(payload) > MAX_BULK_TASKS:
+            return Response(
+                {'error': f'At most {MAX_BULK_TASKS} tasks per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        created, errors = bulk_create_tasks(request.user, payload, atomic=atomic)
+        if created:
+            log_activity(request.user, 'TASKS_BULK_CREATED', f'Created {len(created)} tasks', request=request)
+        
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
         else:
-            return Task.objects.none()
+            response_status = status.HTTP_201_CREATED
+        return Response({'created': created, 'errors': errors}, status=response_status)
 
 # Kanban Board View
 class KanbanBoardView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(project_state)
     def get(self, request, project_id):
-        user = request.user
-        
         # Check if user has access to this project
         try:
-            if user.role == 'ADMIN':
-                project = Project.objects.get(id=project_id)
-            elif user.role == 'MANAGER':
-                project = Project.objects.get(
-                    Q(id=project_id) & 
-                    (Q(created_by=user) | Q(assigned_users=user))
-                )
-            elif user.role in ['COLLABORATOR', 'CLIENT']:
-                project = Project.objects.get(
-                    Q(id=project_id) & 
-                    (Q(assigned_users=user) | Q(client=user))
-                )
+            project = ProjectSerializer.optimize_queryset(
+                visible_projects(request.user).with_task_counters()
+            ).get(id=project_id)
         except Project.DoesNotExist:
             return Response({'error': 'Project not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Get tasks organized by status
-        tasks = Task.objects.filter(project=project)
+        # Load the whole board once and organize it by status in memory
+        columns = bucket_tasks_by_status(get_board_tasks(project))
         
         kanban_data = {
             'project': ProjectSerializer(project).data,
             'columns': {
-                'TODO': TaskSerializer(tasks.filter(status='TODO'), many=True).data,
-                'IN_PROGRESS': TaskSerializer(tasks.filter(status='IN_PROGRESS'), many=True).data,
-                'IN_REVIEW': TaskSerializer(tasks.filter(status='IN_REVIEW'), many=True).data,
-                'DONE': TaskSerializer(tasks.filter(status='DONE'), many=True).data,
+                column: KanbanTaskSerializer(tasks, many=True).data
+                for column, tasks in columns.items()
             }
         }
         
@@ -346,62 +336,157 @@ class KanbanBoardView(APIView):
 # Available Users for Assignment
 class AvailableUsersView(APIView):
     permission_classes = [IsAuthenticated]
+    default_page_size = 50
+    max_page_size = 200
     
     def get(self, request):
         user = request.user
         project_id = request.query_params.get('project_id')
+        search = request.query_params.get('search', '').strip()
         
         if user.role not in ['ADMIN', 'MANAGER']:
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get users that can be assigned to projects
-        available_users = User.objects.filter(
-            role__in=['MANAGER', 'COLLABORATOR']
-        )
-        
-        # Filter users who haven't exceeded their project limit
-        filtered_users = []
-        for u in available_users:
-            if u.can_be_assigned_to_project():
-                filtered_users.append(u)
-        
         # If checking for task assignment, also check task limits
+        project = None
         if project_id:
-            try:
-                project = Project.objects.get(id=project_id)
-                task_filtered_users = []
-                for u in filtered_users:
-                    if u.can_be_assigned_to_task_in_project(project):
-                        task_filtered_users.append(u)
-                filtered_users = task_filtered_users
-            except Project.DoesNotExist:
-                pass
+            project = Project.objects.filter(id=project_id).first()
+        
+        # Project and task limits are evaluated in SQL
+        available_users = User.objects.available_for_assignment(project)
+        
+        # Prefix search on name/email
+        if search:
+            available_users = available_users.filter(
+                Q(first_name__istartswith=search) |
+                Q(last_name__istartswith=search) |
+                Q(email__istartswith=search)
+            )
         
-        serializer = AvailableUserSerializer(filtered_users, many=True)
-        return Response({'users': serializer.data})
+        available_users = available_users.order_by('first_name', 'last_name', 'id')
+        # Existing callers get the whole list; paging is opt-in with ?page= or ?page_size=
+        if 'page' not in request.query_params and 'page_size' not in request.query_params:
+            serializer = AvailableUserSerializer(available_users, many=True)
+            return Response({'users': serializer.data})
+        
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(
+                max(int(request.query_params.get('page_size', self.default_page_size)), 1),
+                self.max_page_size
+            )
+        except ValueError:
+            return Response({'error': 'Invalid page'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Fetch one extra row to know whether a next page exists, without a COUNT
+        offset = (page - 1) * page_size
+        users = list(available_users[offset:offset + page_size + 1])
+        has_next = len(users) > page_size
+        
+        serializer = AvailableUserSerializer(users[:page_size], many=True)
+        return Response({
+            'users': serializer.data,
+            'page': page,
+            'next_page': page + 1 if has_next else None,
+        })
 
 # Notifications
 class NotificationListView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at']
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.filter(user=self.request.user).select_related('project', 'task')
+
+class UnreadNotificationCountView(APIView):
+    permission_classes = [IsAuthenticated]
+    # The badge shows "999+" beyond this, so no count scans more index entries
+    max_count = 999
+    
+    def get(self, request):
+        # Served by the partial index on unread notifications
+        unread = Notification.objects.filter(user=request.user, is_read=False).order_by()
+        count = unread[:self.max_count + 1].count()
+        return Response({
+            'unread_count': min(count, self.max_count),
+            'capped': count > self.max_count,
+        })
 
 class MarkNotificationReadView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request, notification_id):
+        # One UPDATE of the flag instead of loading and re-saving every column
+        updated = Notification.objects.filter(id=notification_id, user=request.user).update(is_read=True)
+        if not updated:
+            return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'message': 'Notification marked as read'})
+
+class NotificationBulkActionView(APIView):
+    """Base for actions on a selection of the user's notifications in a single statement"""
+    permission_classes = [IsAuthenticated]
+    
+    def get_notifications(self, request):
+        serializer = NotificationSelectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        selection = serializer.validated_data
+        
+        notifications = Notification.objects.filter(user=request.user)
+        if 'ids' in selection:
+            notifications = notifications.filter(id__in=selection['ids'])
+        if 'before' in selection:
+            notifications = notifications.filter(created_at__lt=selection['before'])
+        if 'notification_type' in selection:
+            notifications = notifications.filter(notification_type=selection['notification_type'])
+        if 'project' in selection:
+            notifications = notifications.filter(project_id=selection['project'])
+        return notifications
+
+class BulkMarkNotificationsReadView(NotificationBulkActionView):
+    def post(self, request):
+        # Only unread rows are written, and they leave the unread partial index
+        updated = self.get_notifications(request).filter(is_read=False).update(is_read=True)
+        return Response({'updated': updated})
+
+class BulkDismissNotificationsView(NotificationBulkActionView):
+    def post(self, request):
+        # Notifications have no dependents or delete signals, so this is one DELETE
+        deleted, _ = self.get_notifications(request).delete()
+        return Response({'deleted': deleted})
+
+# Search
+class SearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_page_size = 20
+    max_page_size = 100
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        kind = request.query_params.get('type') or None
+        
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if kind is not None and kind not in dict(SearchEntry.KIND_CHOICES):
+            return Response({'error': 'Invalid type'}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
-            notification = Notification.objects.get(
-                id=notification_id,
-                user=request.user
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(
+                max(int(request.query_params.get('page_size', self.default_page_size)), 1),
+                self.max_page_size
             )
-            notification.is_read = True
-            notification.save()
-            return Response({'message': 'Notification marked as read'})
-        except Notification.DoesNotExist:
-            return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError:
+            return Response({'error': 'Invalid page'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Ranked and filtered to what the user may see in the database; one extra row tells if there is more
+        results = search(request.user, query, kind=kind, offset=(page - 1) * page_size, limit=page_size + 1)
+        return Response({
+            'results': results[:page_size],
+            'page': page,
+            'next_page': page + 1 if len(results) > page_size else None,
+        })
 
 # Password Reset Views (keep existing ones)
 class ForgotPasswordView(APIView):
@@ -415,14 +500,17 @@ class ForgotPasswordView(APIView):
         except User.DoesNotExist:
             return Response({'message': 'If an account with that email exists, a code has been sent.'})
 
-        # Invalidate old codes
-        PasswordResetCode.objects.filter(user=user).update(is_used=True)
-        reset_code = PasswordResetCode.objects.create(user=user)
-        
-        # Send code via email
-        subject = 'Password Reset Code'
-        message = f"Hi,\n\nYour password reset code is: {reset_code.code}\n\nThis code will expire in 10 minutes."
-        send_mail(subject, message, settings.EMAIL_HOST_USER, [email], fail_silently=False)
+        # The new code and its email are written together, so a failed enqueue
+        # leaves the old codes usable rather than a code nobody was sent
+        with transaction.atomic():
+            # Invalidate old codes
+            PasswordResetCode.objects.filter(user=user).update(is_used=True)
+            reset_code = PasswordResetCode.objects.create(user=user)
+
+            # Queue the code for the outbox worker instead of waiting on SMTP
+            subject = 'Password Reset Code'
+            message = f"Hi,\n\nYour password reset code is: {reset_code.code}\n\nThis code will expire in 10 minutes."
+            enqueue_email(subject, message, [email], from_email=settings.EMAIL_HOST_USER)
         
         return Response({'message': 'If an account with that email exists, a code has been sent.'})
 
@@ -485,4 +573,12 @@ class ChangePasswordView(APIView):
         reset_code.is_used = True
         reset_code.save()
 
-        return Response({'message': 'Password reset successful'})
\ No newline at end of file
+        return Response({'message': 'Password reset successful'})
+
+# Monitoring
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        # Prometheus text exposition format
+        return HttpResponse(REGISTRY.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')